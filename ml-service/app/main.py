@@ -13,8 +13,14 @@ from dotenv import load_dotenv
 from datetime import datetime
 from pydantic import BaseModel
 
-from app.services.ocr_services import ocr_image
-from app.services.ai_services import refine_receipt
+from app.services.ocr_services import ocr_image, get_ocr_pool
+from app.services.ocr_pool import OCRPoolBusy
+from app.services.ai_services import extract_receipt
+from app.services.debug_artifacts import debug_sink
+from app.services.fast_reject import fast_quality_check
+from app.services.photo_selection import larger_photo_size, select_photo_size
+from app.services.progress import ProgressMessage
+from app.services.receipt_cache import fingerprint_image, receipt_cache, with_fresh_receipt_id
 
 load_dotenv()
 
@@ -50,70 +56,127 @@ class DataRequest(BaseModel):
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text('Hello! Send me a receipt image and I will extract the text for you.')
 
+QUALITY_ISSUE_MESSAGES = {
+    "blurry": "image is blurry",
+    "too_dark": "image is too dark",
+    "too_bright": "image is too bright",
+    "low_contrast": "image has low contrast",
+    "receipt_too_small": "receipt fills less than 30% of the frame",
+}
+
+async def reply_unreadable(progress: ProgressMessage, quality_issues: list[str] | None):
+    quality_warning = ""
+    if quality_issues:
+        reasons = ", ".join(QUALITY_ISSUE_MESSAGES.get(i, i) for i in quality_issues)
+        quality_warning = f" ({reasons})"
+    await progress.finish(
+        f'Sorry, could not read any text from the image{quality_warning}. '
+        'Please try again with a clearer, well-lit photo.'
+    )
+
+def format_partial(partial: dict) -> str:
+    """Progress text from the fields the LLM has produced so far."""
+    lines = ["Refining extracted data..."]
+    store = (partial.get("merchant_name") or {}).get("value")
+    date = (partial.get("date") or {}).get("value")
+    if store:
+        lines.append(f"🏪 {store}" + (f" · {date}" if date else ""))
+    items = partial.get("items", [])
+    if items:
+        last = (items[-1].get("name") or {}).get("value", "")
+        lines.append(f"🛒 {len(items)} item{'s' if len(items) != 1 else ''} so far — {last}")
+    return "\n".join(lines)
+
+async def download_photo(photo) -> bytearray:
+    # Download straight into memory — decoded with cv2.imdecode, no temp file
+    photo_file = await photo.get_file()
+    return await photo_file.download_as_bytearray()
+
 async def handle_receipt_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text('Processing your receipt image...')
     start_time = time.time()
+    # One status message, edited in the background — no awaited round trip per stage
+    progress = ProgressMessage(update.message)
+    progress.update('Processing your receipt image...')
 
-    photo_file = await update.message.photo[-1].get_file()
-    file_path = f"temp_receipt_{photo_file.file_id}.jpg"
-    await photo_file.download_to_drive(file_path)
+    photos = update.message.photo
+    # Cache key stays the largest rendition's id; download the smallest sufficient one
+    largest = photos[-1]
+    photo = select_photo_size(photos)
 
     try:
-        await update.message.reply_text('Performing OCR on the image...')
-        ocr_result = await ocr_image(file_path)
+        # Resent/forwarded photo → same file_unique_id, answer before downloading
+        cached = await receipt_cache.lookup(file_unique_id=largest.file_unique_id)
+
+        if cached is None:
+            logger.info(f"Downloading {photo.width}x{photo.height} rendition (largest {largest.width}x{largest.height})")
+            image_bytes = await download_photo(photo)
+            fingerprint = await asyncio.to_thread(fingerprint_image, image_bytes)
+            cached = await receipt_cache.lookup(fingerprint=fingerprint)
+
+        if cached is not None:
+            ocr_result = cached.ocr_result
+            cache_hash = cached.hash
+        else:
+            # Thumbnail check (few ms) — hopeless photos never reach the OCR pool
+            verdict = await asyncio.to_thread(fast_quality_check, image_bytes, (photo.width, photo.height))
+            if not verdict.usable:
+                await reply_unreadable(progress, verdict.issues)
+                return
+
+            progress.update('Performing OCR on the image...')
+            ocr_result = await ocr_image(image_bytes)
+
+            # Unsure result from a reduced rendition → retry once at a larger one
+            larger = larger_photo_size(photos, photo, ocr_result.boxes)
+            if larger is not None:
+                logger.info(f"Low OCR confidence at {photo.width}x{photo.height} — retrying at {larger.width}x{larger.height}")
+                retry_result = await ocr_image(await download_photo(larger))
+                if retry_result.boxes.mean_confidence() > ocr_result.boxes.mean_confidence():
+                    ocr_result = retry_result
+
+            cache_hash = None
+            if ocr_result.boxes:
+                cache_hash = await receipt_cache.store(fingerprint, ocr_result, file_unique_id=largest.file_unique_id)
 
         if not ocr_result.boxes:
-            quality_warning = ""
-            if ocr_result.quality_issues:
-                issue_map = {
-                    "blurry": "image is blurry",
-                    "too_dark": "image is too dark",
-                    "too_bright": "image is too bright",
-                    "low_contrast": "image has low contrast",
-                    "receipt_too_small": "receipt fills less than 30% of the frame",
-                }
-                reasons = ", ".join(issue_map.get(i, i) for i in ocr_result.quality_issues)
-                quality_warning = f" ({reasons})"
-            await update.message.reply_text(
-                f'Sorry, could not read any text from the image{quality_warning}. '
-                'Please try again with a clearer, well-lit photo.'
+            await reply_unreadable(progress, ocr_result.quality_issues)
+        elif cached is not None and cached.refined:
+            logger.info("Serving receipt from cache — skipping OCR and LLM")
+            await background_refine(
+                update, ocr_result, start_time,
+                refined_data=with_fresh_receipt_id(cached.refined), progress=progress,
             )
         else:
-            await update.message.reply_text("Refining extracted data...")
-            await background_refine(update, ocr_result, file_path, start_time)
+            progress.update("Refining extracted data...")
+            await background_refine(update, ocr_result, start_time, cache_hash=cache_hash, progress=progress)
     
+    except OCRPoolBusy:
+        logger.warning("OCR pool saturated — asking user to retry")
+        await progress.finish('The server is busy right now. Please send the receipt again in a minute.')
+
     except Exception as e:
         logger.error(f"Error processing receipt image: {e}")
-        await update.message.reply_text('Sorry, an error occurred while processing your receipt image.')
+        await progress.finish('Sorry, an error occurred while processing your receipt image.')
 
     
-async def background_refine(update, ocr_result, file_path, start_time):
-    ocr_boxes=[
-        {
-            "text": b.text, 
-            "confidence": b.confidence, 
-            "x": b.x, 
-            "y": b.y,
-            "width": b.width,
-            "height": b.height
-        }
-        for b in ocr_result.boxes
-    ]
-    
-    refined_data = await refine_receipt(
-        raw_text=ocr_result.raw_text,
-        ocr_boxes=ocr_boxes,
-        # img_height=img_height
-    )
+async def background_refine(update, ocr_result, start_time, cache_hash=None, refined_data=None, progress=None):
+    progress = progress or ProgressMessage(update.message)
+    if refined_data is None:
+        refined_data = await extract_receipt(
+            raw_text=ocr_result.raw_text,
+            ocr_boxes=ocr_result.boxes,
+            on_partial=lambda partial: progress.update(format_partial(partial)),
+            # img_height=img_height
+        )
+        if refined_data and refined_data.get("receipt_data"):
+            await receipt_cache.attach_refined(cache_hash, refined_data)
 
     if not refined_data:
-        await update.message.reply_text('Sorry, I could not refine the receipt data. Please try again.')
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        await progress.finish('Sorry, I could not refine the receipt data. Please try again.')
         return
     
     if refined_data.get("status") == "FAILED":
-        await update.message.reply_text(refined_data.get("message", 'Failed to process receipt'))
+        await progress.finish(refined_data.get("message", 'Failed to process receipt'))
         return
     
     receipt_data = refined_data.get("receipt_data", {})
@@ -237,14 +300,11 @@ async def background_refine(update, ocr_result, file_path, start_time):
             caption += f"⚠️ *Needs review:* {flagged}\n"
 
     try:
-        await update.message.reply_text(caption)
+        await progress.finish(caption)
 
     except Exception as e:
         if not receipt_data:
             await update.message.reply_text("Make sure the image is clear")
-    
-    if os.path.exists(file_path):
-        os.remove(file_path)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -256,6 +316,10 @@ async def lifespan(app: FastAPI):
     ocr_app.add_handler(CommandHandler("start", start_command))
     ocr_app.add_handler(MessageHandler(filters.PHOTO, handle_receipt_photo))
 
+    # Warm the OCR workers before accepting updates
+    ocr_pool = get_ocr_pool()
+    await ocr_pool.start()
+
     await ocr_app.initialize()
     await ocr_app.start()
     
@@ -276,6 +340,8 @@ async def lifespan(app: FastAPI):
     # await ocr_app.updater.stop()
     await ocr_app.stop()
     await ocr_app.shutdown()
+    await ocr_pool.close()
+    debug_sink.flush()
 
 
 app = FastAPI(lifespan=lifespan)
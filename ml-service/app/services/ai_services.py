@@ -1,128 +1,64 @@
 import asyncio
+import copy
+import hashlib
+import inspect
 import json
 import logging
 import uuid
 import os
 import re
+import time
+import numpy as np
+from typing import Callable
 from ollama import AsyncClient
 from datetime import datetime
+from app.services.line_grouping import (
+    box_arrays,
+    center_tolerance,
+    reconstruct_lines_by_center,
+)
+from app.services.cache import build_cache
+from app.services.ocr_boxes import OCRBoxes
+from app.services import prompt_compressor
+from app.services.prompt_compressor import (
+    LLM_PROMPT_MODE,
+    LLM_PROMPT_TOKEN_BUDGET,
+    PromptStats,
+    compact_whitespace,
+    compress_ocr_input,
+    estimate_tokens,
+    find_zone_boundaries,
+    record_prompt_stats,
+)
+from app.services.json_stream import ObjectStream
+from app.services.merchant_templates import apply_template, template_stats, template_store
+from app.services.rule_extractor import RULE_EXTRACTOR, parse_minimarket, rule_stats
 from app.services.validation import (
+    HEADER_FIELDS,
+    ReceiptScorer,
     is_valid_ocr_text,
-    determine_receipt_status,
 )
 
 logger = logging.getLogger(__name__)
 
 custom_client = AsyncClient(host="https://ollama.com", timeout=120)
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-oss:120b-cloud")
+# Stream the response and score fields/items as they complete
+LLM_STREAM = os.getenv("LLM_STREAM", "true").lower() in {"1", "true", "yes"}
+LLM_OPTIONS = {
+    "temperature": 0.25,
+    "top_k": 35,
+    "top_p": 0.8,
+}
 
-def get_dynamic_tolerance(boxes: list[dict]) -> int:
-    if len(boxes) < 2:
-        return 15
-    
-    heights = [b["height"] for b in boxes if b.get("height", 0) > 5]
-    if not heights:
-        return 15
-    
-    median_height = sorted(heights)[len(heights) // 2]
-    # Estimasi row spacing dari gap vertikal antar boxes
-    sorted_by_y = sorted(boxes, key=lambda b: b["y"])
-    gaps = []
-    for i in range(1, min(10, len(sorted_by_y))):
-        gap = sorted_by_y[i]["y"] - sorted_by_y[i-1]["y"]
-        if gap > 2:  # filter overlap noise
-            gaps.append(gap)
-    
-    if len(gaps) < 3:
-        return int(median_height * 0.45)
-
-    sorted_gaps = sorted(gaps)
-    cutoff_idx = int(len(sorted_gaps) * 0.70)
-    candidate_gaps = sorted_gaps[:cutoff_idx]
-
-    if len(candidate_gaps) < 2:
-        return int(median_height * 0.45)
-
-    # Cari jump terbesar antara consecutive values
-    max_jump = 0
-    boundary = candidate_gaps[-1]  # fallback: nilai terbesar di candidates
-
-    for i in range(1, len(candidate_gaps)):
-        jump = candidate_gaps[i] - candidate_gaps[i-1]
-        if jump > max_jump:
-            max_jump = jump
-            # Threshold = midpoint antara dua sisi jump
-            boundary = (candidate_gaps[i] + candidate_gaps[i-1]) / 2
-
-    # Kalau jump-nya kecil banget (< 3px), gap distribution terlalu uniform
-    # → fallback ke height-based
-    if max_jump < 3:
-        return int(median_height * 0.45)
-
-    # Tolerance = sedikit di bawah boundary yang ketemu
-    # Buffer 20% supaya ada room untuk slight misalignment
-    tolerance = int(boundary * 0.8)
-
-    # Safety bounds: jangan terlalu kecil atau terlalu besar
-    min_tolerance = int(median_height * 0.2)   # floor: 20% box height
-    max_tolerance = int(median_height * 0.6)   # ceiling: 60% box height
-
-    return max(min_tolerance, min(tolerance, max_tolerance))
-
-    # if gaps:
-    #     median_gap = sorted(gaps)[len(gaps) // 2]
-    #     # Tolerance = 40% dari row spacing, tapi capped di 50% box height
-    #     return int(min(median_gap * 0.45, median_height * 0.5))
-    # return int(median_height * 0.45)
-
-def reconstruct_lines(boxes: list[dict], y_tolerance: int = None) -> str:
-    if y_tolerance is None:
-        y_tolerance = get_dynamic_tolerance(boxes)
-
-    if not boxes:
-        return ""
-
-    lines = []
-    used = set()
-    sorted_boxes = sorted(boxes, key=lambda b: b["y"])
-
-    for i, anchor in enumerate(sorted_boxes):
-        if i in used:
-            continue
-
-        line_boxes = [anchor]
-        used.add(i)
-
-        # ← KEY FIX: pakai center y dari ANCHOR, bukan dari growing group
-        anchor_cy = anchor["y"] + anchor.get("height", 20) / 2
-
-        for j, other in enumerate(sorted_boxes):
-            if j in used:
-                continue
-
-            other_cy = other["y"] + other.get("height", 20) / 2
-
-            # Simple center-to-center distance dari anchor — no expansion
-            if abs(anchor_cy - other_cy) <= y_tolerance:
-                line_boxes.append(other)
-                used.add(j)
-
-        line_boxes.sort(key=lambda b: b["x"])
-
-        parts = []
-        for k, lb in enumerate(line_boxes):
-            if k == 0:
-                parts.append(lb["text"])
-                continue
-            prev = line_boxes[k - 1]
-            gap = lb["x"] - (prev["x"] + prev.get("width", 50))
-            if gap > 30:
-                parts.append("  |  " + lb["text"])
-            else:
-                parts.append(" " + lb["text"])
+def get_dynamic_tolerance(boxes: OCRBoxes) -> int:
+    # Estimasi row spacing dari gap vertikal antar boxes (lihat line_grouping.center_tolerance)
+    _, y, _, heights, _ = box_arrays(boxes)
+    return center_tolerance(y, heights)
 
-        lines.append("".join(parts))
-
-    return "\n".join(lines)
+def reconstruct_lines(boxes: OCRBoxes, y_tolerance: int = None) -> str:
+    # Center-Y grouping dari ANCHOR (no expansion), via the shared sweep engine
+    return reconstruct_lines_by_center(boxes, y_tolerance)
 
 
 def fix_fragmented_numbers(text: str) -> str:
@@ -254,39 +190,6 @@ def fix_fragmented_numbers(text: str) -> str:
 #         footer_start_y or max_y * 0.75
 #     )
 
-def find_zone_boundaries(boxes: list[dict]) -> tuple[float, float]:
-    item_start_y = None
-    footer_start_y = None
-    
-    # Hanya date pattern yang trigger item start — lebih specific
-    DATE_PATTERN = re.compile(r'\d{2}[./]\d{2}[./]\d{2,4}')
-    
-    # Total keywords = akhir item zone
-    TOTAL_LANDMARKS = {"total", "tunai", "jumlah uang", "kembali"}
-    
-    # Footer = setelah payment summary
-    FOOTER_LANDMARKS = {"terima", "kasih", "layanan", "konsumen", "telp", "sms", "klikin", "kontak"}
-    
-    sorted_boxes = sorted(boxes, key=lambda b: b["y"])
-    
-    for box in sorted_boxes:
-        text_lower = box["text"].lower()
-        
-        # Item zone start = date line (transaction header)
-        if item_start_y is None:
-            if DATE_PATTERN.search(box["text"]):
-                item_start_y = box["y"]
-        
-        # Footer start
-        if footer_start_y is None:
-            if any(kw in text_lower for kw in FOOTER_LANDMARKS):
-                footer_start_y = box["y"]
-    
-    max_y = max(b["y"] for b in boxes) if boxes else 1000
-    return (
-        item_start_y or max_y * 0.25,
-        footer_start_y or max_y * 0.80
-    )
 
 def merge_spaced_numbers(text: str) -> str:
     """
@@ -296,25 +199,24 @@ def merge_spaced_numbers(text: str) -> str:
     """
     return re.sub(r'(\d{1,2})\s+(\d{3})(?!\d)', r'\1\2', text)
 
-def build_llm_input_with_coords(ocr_boxes: list[dict]) -> str:
+def _llm_candidates(ocr_boxes: OCRBoxes) -> OCRBoxes:
+    """Boxes worth showing the LLM: confidence ≥ 0.6 and more than one character."""
+    ocr_boxes = OCRBoxes.coerce(ocr_boxes)
+    long_enough = np.fromiter((len(t.strip()) > 1 for t in ocr_boxes.texts), dtype=bool, count=len(ocr_boxes))
+    return ocr_boxes[(ocr_boxes.confidences >= 0.6) & long_enough]
+
+def build_llm_input_with_coords(ocr_boxes: OCRBoxes) -> str:
     """
     Kirim boxes dengan koordinat x,y ke LLM.
     LLM jauh lebih baik dalam spatial reasoning 
     daripada rule-based reconstruct_lines.
     """
-    filtered = [
-        b for b in ocr_boxes
-        if b.get("confidence", 0) >= 0.6
-        and len(b.get("text", "").strip()) > 1
-    ]
+    filtered = _llm_candidates(ocr_boxes)
+    coords = filtered.coords.astype(int).tolist()
 
     lines = []
-    for b in filtered:
-        x    = int(b["x"])
-        y    = int(b["y"])
-        w    = int(b.get("width", 0))
-        text = b["text"].strip()
-        lines.append(f"[{x},{y},{w}] {text}")
+    for (x, y, w, _), text in zip(coords, filtered.texts):
+        lines.append(f"[{x},{y},{w}] {text.strip()}")
 
     return "\n".join(lines)
 
@@ -351,23 +253,14 @@ def build_llm_input_with_coords(ocr_boxes: list[dict]) -> str:
 
 #     return f"=== Header === \n{header_text}\n\n === Body === \n{body_text}\n\n === Raw Coordinate ===\n{raw_coords}"
 
-def build_llm_input(ocr_boxes: list[dict]) -> str:
-    filtered = [
-        b for b in ocr_boxes
-        if b.get("confidence", 0) >= 0.6
-        and len(b.get("text", "").strip()) > 1
-    ]
-    
+def build_llm_input(ocr_boxes: OCRBoxes) -> str:
     # Sort top→bottom
-    filtered.sort(key=lambda b: (b["y"], b["x"]))
+    filtered = _llm_candidates(ocr_boxes).sorted()
+    coords = filtered.coords.astype(int).tolist()
     
     lines = []
-    for b in filtered:
-        x    = int(b["x"])
-        y    = int(b["y"])
-        w    = int(b.get("width", 0))
-        text = b["text"].strip()
-        lines.append(f"[x={x} y={y} w={w}] {text}")
+    for (x, y, w, _), text in zip(coords, filtered.texts):
+        lines.append(f"[x={x} y={y} w={w}] {text.strip()}")
     
     return "\n".join(lines)
 
@@ -489,6 +382,14 @@ def get_category_prompt(items_text: str) -> str:
         Jika item tidak cocok dengan kategori manapun → gunakan "Others".
         JANGAN buat kategori baru di luar daftar di atas."""
 
+def guess_category(name: str) -> str:
+    """Category for one item name from CATEGORY_KEYWORDS (whole-word match), else "Others"."""
+    name_lower = name.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(re.search(rf"\b{re.escape(kw)}\b", name_lower) for kw in keywords):
+            return category
+    return "Others"
+
 async def get_current_time():
     now = datetime.now()
     return now.strftime("%H:%M")
@@ -497,47 +398,8 @@ async def get_current_date():
     now = datetime.now()
     return now.strftime("%Y-%m-%d")
 
-# ── Main LLM function ──────────────────────────────────────────────────────────
-async def refine_receipt(raw_text: str, ocr_boxes: list = None):
-    """
-    ocr_boxes: list of {"text": str, "confidence": float, "x": float, "y": float}
-               from OCRResult.boxes — used for real confidence scoring
-    """
-    is_valid, reason = is_valid_ocr_text(raw_text)
-    if not is_valid:
-        return {
-            "error": "ocr_failed",
-            "status": "FAILED",
-            "message": reason
-        }
-
-    receipt_id = str(uuid.uuid4())
-    category_section = get_category_prompt(raw_text)
-
-    # Build spatially-aware input for LLM if boxes available
-    # if ocr_boxes:
-    #     structured_input = json.dumps([
-    #         {"text": b["text"], "y": round(b["y"]), "x": round(b["x"])}
-    #         for b in ocr_boxes
-    #     ], ensure_ascii=False)
-    #     input_section = f"DATA OCR (terurut atas→bawah, kiri→kanan):\n{structured_input}"
-    # else:
-    #     # Fallback to raw text if boxes not provided
-    #     input_section = f"DATA OCR:\n{raw_text}"
-
-    if ocr_boxes:
-        structured = build_llm_input(ocr_boxes)
-        input_section = (
-            f"{structured}\n\n"
-            f"=== FULL RECONSTRUCTED TEXT (all lines, no filtering) ===\n"
-            f"{raw_text}"
-        )
-
-        print(input_section)
-    else:
-        input_section = f"=== FULL RECONSTRUCTED TEXT ===\n{raw_text}"
-
-
+def build_prompt(input_section: str, category_section: str, receipt_id: str) -> str:
+    """Extraction prompt around the OCR section, with the code indentation stripped."""
     prompt = f"""
         Kamu adalah sistem ekstraksi data struk belanja Indonesia.
 
@@ -669,6 +531,224 @@ async def refine_receipt(raw_text: str, ocr_boxes: list = None):
 
         Output JSON saja, tanpa penjelasan.
     """
+    return compact_whitespace(prompt)
+
+
+# ── LLM response cache ─────────────────────────────────────────────────────────
+# Second level behind receipt_cache: a different photo of the same receipt (or
+# a re-crop) gives a new image hash but nearly the same OCR text. Keyed by
+# the normalised text + PROMPT_VERSION; the value is the parsed LLM JSON.
+llm_cache = build_cache("LLM_CACHE", table="llm_cache", default_backend="sqlite")
+_llm_cache_hits = 0
+_llm_cache_misses = 0
+
+_THOUSANDS = re.compile(r'(?<=\d)[.,](?=\d{3}(?!\d))')
+
+
+def normalize_ocr_text(raw_text: str) -> str:
+    """
+    OCR text reduced to what the extraction depends on: case-folded, column
+    separators and repeated whitespace collapsed, numbers canonicalised
+    ("24. .000", "24.000", "24,000" and "24 000" all → "24000").
+    """
+    text = merge_spaced_numbers(fix_fragmented_numbers(raw_text))
+    text = _THOUSANDS.sub("", text).casefold().replace("|", " ")
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def ocr_fingerprint(raw_text: str) -> str:
+    normalized = normalize_ocr_text(raw_text)
+    return hashlib.sha256(f"{PROMPT_VERSION}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def _prompt_sources() -> str:
+    """
+    Everything the prompt is built from: the instruction template, the
+    category section and its keyword/example tables, and the OCR-section
+    formatting. Source text, never a rendered prompt — the rendered text
+    embeds function reprs (memory addresses) and changes on every restart.
+    """
+    return "\n".join([
+        inspect.getsource(build_prompt),
+        inspect.getsource(get_category_prompt),
+        json.dumps([CATEGORY_KEYWORDS, CATEGORY_EXAMPLES, VALID_CATEGORIES], sort_keys=True, ensure_ascii=False),
+        inspect.getsource(prompt_compressor),
+        inspect.getsource(build_llm_input),
+        inspect.getsource(_llm_candidates),
+    ])
+
+
+# Any change to the instructions, model or OCR-section format invalidates cached answers
+PROMPT_VERSION = os.getenv("LLM_PROMPT_VERSION") or hashlib.sha256(
+    f"{LLM_MODEL}|{LLM_PROMPT_MODE}|{_prompt_sources()}".encode("utf-8")
+).hexdigest()[:12]
+
+
+async def cached_extraction(key: str) -> dict | None:
+    global _llm_cache_hits, _llm_cache_misses
+    if llm_cache is None:
+        return None
+    response_data = await asyncio.to_thread(llm_cache.get, key)
+    if response_data is None:
+        _llm_cache_misses += 1
+        return None
+    _llm_cache_hits += 1
+    logger.info(f"LLM cache hit ({_llm_cache_hits} hits / {_llm_cache_misses} misses)")
+    return copy.deepcopy(response_data)
+
+
+async def store_extraction(key: str, result: dict) -> None:
+    """Cache a scored result's LLM answer — VERIFIED ones only, so a bad answer isn't replayed."""
+    if llm_cache is None or result.get("status") != "VERIFIED":
+        return
+    stored = copy.deepcopy({k: v for k, v in result["receipt_data"].items() if k != "receipt_id"})
+    try:
+        await asyncio.to_thread(llm_cache.set, key, stored)
+    except Exception as e:      # a cache write must never fail the receipt
+        logger.warning(f"LLM cache store failed: {e}")
+
+
+def scored_result(response_data: dict, ocr_boxes: OCRBoxes, scorer: ReceiptScorer | None = None) -> dict:
+    """
+    refine_receipt's result: the LLM fields scored with RapidOCR's real
+    confidences. `scorer` may already hold fields scored during streaming.
+    """
+    scoring = (scorer or ReceiptScorer(ocr_boxes)).finish(response_data)
+    return {
+        "receipt_data": response_data,
+        "status": scoring["status"],
+        "field_results": scoring["field_results"],
+        "low_confidence_fields": scoring["low_confidence_fields"],
+        "requires_review": scoring["requires_review"],
+    }
+
+
+async def generate_extraction(
+    prompt: str,
+    scorer: ReceiptScorer,
+    on_partial: Callable[[dict], None] | None = None,
+) -> str:
+    """
+    Run the LLM and return the raw JSON text. In streaming mode header
+    fields and finished items are scored on `scorer` while later ones are
+    still generating, and `on_partial` gets the fields received so far
+    (merchant_name / date / time / total_amount and "items") after every
+    chunk that completed one.
+    """
+    if not LLM_STREAM:
+        response = await custom_client.generate(
+            model=LLM_MODEL, prompt=prompt, format="json", options=LLM_OPTIONS,
+        )
+        return response['response']
+
+    started = time.perf_counter()
+    first_partial = None
+    parser = ObjectStream(array_keys={"items"})
+    partial: dict = {"items": []}
+    chunks = []
+    stream = await custom_client.generate(
+        model=LLM_MODEL, prompt=prompt, format="json", options=LLM_OPTIONS, stream=True,
+    )
+    async for part in stream:
+        chunk = part['response']
+        chunks.append(chunk)
+        if parser is None or not chunk:
+            continue
+        try:
+            events = parser.feed(chunk)
+        except ValueError as e:
+            # Not a well-formed object — stop parsing early, the final json.loads decides
+            logger.warning(f"Incremental JSON parse stopped: {e}")
+            parser = None
+            continue
+
+        completed = False
+        for event in events:
+            if event.index is not None and isinstance(event.value, dict):
+                scorer.add_item(event.index, event.value)
+                partial["items"].append(event.value)
+                completed = True
+            elif event.key in HEADER_FIELDS and isinstance(event.value, dict):
+                scorer.add_field(event.key, event.value)
+                partial[event.key] = event.value
+                completed = True
+        if completed:
+            first_partial = first_partial or time.perf_counter() - started
+            if on_partial is not None:
+                on_partial(partial)
+
+    if first_partial is not None:
+        logger.info(
+            f"LLM stream: first field after {first_partial:.1f}s, done after "
+            f"{time.perf_counter() - started:.1f}s ({len(partial['items'])} items scored while generating)"
+        )
+    return "".join(chunks)
+
+
+# ── Main LLM function ──────────────────────────────────────────────────────────
+async def refine_receipt(
+    raw_text: str,
+    ocr_boxes: OCRBoxes = None,
+    on_partial: Callable[[dict], None] | None = None,
+):
+    """
+    ocr_boxes:  OCRResult.boxes (array-backed OCRBoxes) — used for the LLM
+                input and for real confidence scoring
+    on_partial: called with the fields extracted so far while the LLM
+                response streams in (see generate_extraction)
+    """
+    is_valid, reason = is_valid_ocr_text(raw_text)
+    if not is_valid:
+        return {
+            "error": "ocr_failed",
+            "status": "FAILED",
+            "message": reason
+        }
+
+    receipt_id = str(uuid.uuid4())
+    cache_key = ocr_fingerprint(raw_text)
+    cached = await cached_extraction(cache_key)
+    if cached is not None:
+        # Same receipt text as an earlier upload — new receipt_id, scored against this photo's boxes
+        cached["receipt_id"] = receipt_id
+        return scored_result(cached, ocr_boxes)
+
+    category_section = get_category_prompt(raw_text)
+
+    # Build spatially-aware input for LLM if boxes available
+    # if ocr_boxes:
+    #     structured_input = json.dumps([
+    #         {"text": b["text"], "y": round(b["y"]), "x": round(b["x"])}
+    #         for b in ocr_boxes
+    #     ], ensure_ascii=False)
+    #     input_section = f"DATA OCR (terurut atas→bawah, kiri→kanan):\n{structured_input}"
+    # else:
+    #     # Fallback to raw text if boxes not provided
+    #     input_section = f"DATA OCR:\n{raw_text}"
+
+    if LLM_PROMPT_MODE == "legacy" and ocr_boxes:
+        structured = build_llm_input(ocr_boxes)
+        input_section = (
+            f"{structured}\n\n"
+            f"=== FULL RECONSTRUCTED TEXT (all lines, no filtering) ===\n"
+            f"{raw_text}"
+        )
+        stats = PromptStats(mode="legacy", raw_tokens=estimate_tokens(raw_text), ocr_tokens=estimate_tokens(input_section))
+    else:
+        # Whatever the instructions leave of the budget goes to the OCR section
+        overhead = estimate_tokens(build_prompt("", category_section, receipt_id))
+        input_section, stats = compress_ocr_input(raw_text, ocr_boxes, LLM_PROMPT_TOKEN_BUDGET - overhead)
+
+    prompt = build_prompt(input_section, category_section, receipt_id)
+    stats.prompt_tokens = estimate_tokens(prompt)
+    stats.over_budget = stats.prompt_tokens > stats.budget
+    print(input_section)
+    logger.info(f"Receipt {receipt_id}: {stats.summary()}")
+    if stats.over_budget:
+        logger.warning(f"Prompt for receipt {receipt_id} is over budget even with header/footer trimmed")
+
+
 
     # prompt = f"""
     # Kamu adalah sistem AI ekstraksi data profesional. Gunakan contoh format berikut untuk memproses data baru.
@@ -790,42 +870,69 @@ async def refine_receipt(raw_text: str, ocr_boxes: list = None):
     try:
         logger.info(f"Sending to LLM for receipt: {receipt_id}")
 
-        response = await custom_client.generate(
-            model="gpt-oss:120b-cloud",
-            prompt=prompt,
-            format="json",
-            options={
-                "temperature": 0.25,
-                "top_k": 35,
-                "top_p": 0.8,
-            }
-        )
+        scorer = ReceiptScorer(ocr_boxes)
+        response_text = await generate_extraction(prompt, scorer, on_partial)
 
         try:
-            response_data = json.loads(response['response'])
+            response_data = json.loads(response_text)
             response_data['receipt_id'] = receipt_id
 
             # ── Use REAL confidence from RapidOCR, not LLM ────────────────
-            boxes_for_scoring = ocr_boxes or []
-            scoring = determine_receipt_status(response_data, boxes_for_scoring)
+            result = scored_result(response_data, ocr_boxes, scorer)
+            await store_extraction(cache_key, result)
+            record_prompt_stats(receipt_id, stats, result["status"])
             print(f"response data: {response_data}")
 
-            # logger.info(f"Receipt {receipt_id} status: {scoring['status']}")
+            # logger.info(f"Receipt {receipt_id} status: {result['status']}")
             # logger.debug(f"LLM input section:\n{input_section}")
             # print(f"response_data: {response_data}")
 
-            return {
-                "receipt_data": response_data,
-                "status": scoring["status"],
-                "field_results": scoring["field_results"],
-                "low_confidence_fields": scoring["low_confidence_fields"],
-                "requires_review": scoring["requires_review"],
-            }
+            return result
 
         except json.JSONDecodeError as e:
             logger.error(f"JSON parse failed for receipt {receipt_id}: {e}")
+            record_prompt_stats(receipt_id, stats, "parse_failed")
             return {"error": "parse_failed", "receipt_id": receipt_id}
 
     except Exception as e:
         logger.error(f"LLM failed for receipt {receipt_id}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+# ── Entry point: deterministic fast paths, LLM fallback ────────────────────────
+async def extract_receipt(
+    raw_text: str,
+    ocr_boxes: OCRBoxes = None,
+    on_partial: Callable[[dict], None] | None = None,
+):
+    """
+    Receipts from a merchant with a learned layout template, and minimarket
+    slips, are read deterministically when their numbers reconcile;
+    everything else goes through refine_receipt. Same result shape either
+    way, scored against the OCR boxes. LLM results scored VERIFIED teach
+    the merchant's template.
+    """
+    if template_store is not None and ocr_boxes:
+        template = template_store.match(ocr_boxes)
+        if template is not None:
+            receipt_data, reason = apply_template(template, ocr_boxes, categorize=guess_category)
+            template_stats.record(receipt_data is not None, f"{template.merchant}: {reason}")
+            if receipt_data is not None:
+                receipt_data["receipt_id"] = str(uuid.uuid4())
+                return scored_result(receipt_data, ocr_boxes)
+
+    if RULE_EXTRACTOR and raw_text:
+        lines = reconstruct_lines(ocr_boxes) if ocr_boxes else raw_text
+        receipt_data, reason = parse_minimarket(lines, categorize=guess_category)
+        rule_stats.record(receipt_data is not None, reason)
+        if receipt_data is not None:
+            receipt_data["receipt_id"] = str(uuid.uuid4())
+            return scored_result(receipt_data, ocr_boxes)
+
+    result = await refine_receipt(raw_text, ocr_boxes, on_partial)
+    if template_store is not None and ocr_boxes and result and result.get("status") == "VERIFIED":
+        try:
+            template_store.learn(result["receipt_data"], ocr_boxes)
+        except Exception as e:      # learning is best-effort, never fails the receipt
+            logger.warning(f"Merchant template update failed: {e}")
+    return result
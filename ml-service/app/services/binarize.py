@@ -0,0 +1,86 @@
+"""
+Fast binarisation path for thermal-paper receipts.
+
+Indomaret / Alfamart slips are black text on near-white, low-saturation
+paper. For those, fastNlMeansDenoising + CLAHE spends most of the
+preprocessing time cleaning up an image a local threshold separates
+cleanly anyway. Sauvola thresholding
+
+    T(x, y) = m(x, y) · (1 + k · (s(x, y) / R − 1))
+
+with local mean m and std s over a window, computed from integral images
+(sum and sum of squares) so the cost is O(pixels) regardless of window
+size, replaces both steps when the frame looks like thermal paper.
+"""
+import os
+
+import cv2
+import numpy as np
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_THERMAL_BINARIZE = os.getenv("OCR_THERMAL_BINARIZE", "auto")    # auto | always | off
+OCR_SAUVOLA_K = float(os.getenv("OCR_SAUVOLA_K", "0.2"))
+OCR_SAUVOLA_WINDOW = int(os.getenv("OCR_SAUVOLA_WINDOW", "0"))       # 0 → ~2× text height
+
+# Thermal-paper heuristics (on the cropped, inversion-fixed frame)
+THERMAL_MIN_PAPER = 170         # 90th-percentile gray — paper must be near-white
+THERMAL_MAX_SATURATION = 40     # mean HSV saturation — thermal paper is colourless
+THERMAL_INK_RANGE = (0.01, 0.35)
+
+_SAUVOLA_R = 128.0              # dynamic range of the std for 8-bit images
+
+
+def _window_sums(table: np.ndarray, window: int, h: int, w: int) -> np.ndarray:
+    """Sum over each pixel's window from an integral image of the padded frame."""
+    return (
+        table[window:window + h, window:window + w]
+        - table[:h, window:window + w]
+        - table[window:window + h, :w]
+        + table[:h, :w]
+    )
+
+
+def sauvola_threshold(gray: np.ndarray, window: int, k: float = OCR_SAUVOLA_K) -> np.ndarray:
+    """Per-pixel Sauvola threshold (float32) via integral images."""
+    window = max(3, window | 1)
+    half = window // 2
+    padded = cv2.copyMakeBorder(gray, half, half, half, half, cv2.BORDER_REFLECT)
+    total, squares = cv2.integral2(padded, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+    h, w = gray.shape
+    area = float(window * window)
+    mean = _window_sums(total, window, h, w) / area
+    variance = np.maximum(_window_sums(squares, window, h, w) / area - mean * mean, 0.0)
+    return (mean * (1.0 + k * (np.sqrt(variance) / _SAUVOLA_R - 1.0))).astype(np.float32)
+
+
+def sauvola_binarize(gray: np.ndarray, text_height: int = 32, window: int = OCR_SAUVOLA_WINDOW) -> np.ndarray:
+    """Black text on white (uint8 0/255)."""
+    window = window or 2 * max(8, text_height) + 1
+    threshold = sauvola_threshold(gray, window)
+    return np.where(gray > threshold, 255, 0).astype(np.uint8)
+
+
+def looks_like_thermal(gray: np.ndarray, color: np.ndarray | None = None) -> bool:
+    """Near-white, colourless paper with a modest amount of dark ink."""
+    step = max(1, max(gray.shape) // 400)    # statistics on a ~400px subsample
+    sample = gray[::step, ::step]
+    paper = float(np.percentile(sample, 90))
+    if paper < THERMAL_MIN_PAPER:
+        return False
+    ink = float(np.mean(sample < paper * 0.6))
+    if not THERMAL_INK_RANGE[0] <= ink <= THERMAL_INK_RANGE[1]:
+        return False
+    if color is not None and color.ndim == 3:
+        hsv = cv2.cvtColor(color[::step, ::step], cv2.COLOR_BGR2HSV)
+        if float(hsv[..., 1].mean()) > THERMAL_MAX_SATURATION:
+            return False
+    return True
+
+
+def use_thermal_path(gray: np.ndarray, color: np.ndarray | None = None, mode: str = OCR_THERMAL_BINARIZE) -> bool:
+    if mode == "always":
+        return True
+    if mode == "off":
+        return False
+    return looks_like_thermal(gray, color)
@@ -0,0 +1,171 @@
+"""
+Small key/value caches with size + TTL eviction and pluggable backends.
+
+    memory  — in-process LRU (OrderedDict), lost on restart
+    sqlite  — on-disk store that survives restarts, LRU by last access
+
+Values must be JSON-serialisable. Backends are thread-safe so they can be
+shared between the event loop and OCR worker threads; callers on the event
+loop go through asyncio.to_thread, since the sqlite backend blocks on disk.
+
+On-disk files live in DATA_DIR (default: ~/.local/share/ml-service), never
+in the working directory, and are only opened on first use.
+"""
+import os
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+DATA_DIR = os.getenv("DATA_DIR") or os.path.join(
+    os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), "ml-service"
+)
+
+
+def data_path(name: str) -> str:
+    """Path of `name` inside DATA_DIR."""
+    return os.path.join(DATA_DIR, name)
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Any | None: ...
+    def set(self, key: str, value: Any) -> None: ...
+    def delete(self, key: str) -> None: ...
+    def __len__(self) -> int: ...
+
+
+class MemoryLRUCache:
+    def __init__(self, max_entries: int = 1000, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 10000, ttl: float | None = None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use (callers hold self._lock), so importing a module never touches the disk
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed_at)")
+            self._db = conn
+        return self._db
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if self.ttl and now - stored_at > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+def build_cache(
+    prefix: str,
+    table: str,
+    default_backend: str = "memory",
+    default_max_entries: int = 1000,
+    default_ttl: float = 7 * 24 * 3600,
+) -> CacheBackend | None:
+    """
+    Build a cache from `<prefix>_BACKEND` (memory | sqlite | off),
+    `<prefix>_PATH` (default DATA_DIR/cache.sqlite3), `<prefix>_MAX_ENTRIES`
+    and `<prefix>_TTL` (seconds, 0 = none).
+    """
+    backend = os.getenv(f"{prefix}_BACKEND", default_backend).lower()
+    max_entries = int(os.getenv(f"{prefix}_MAX_ENTRIES", str(default_max_entries)))
+    ttl = float(os.getenv(f"{prefix}_TTL", str(default_ttl))) or None
+
+    if backend in {"off", "none", "disabled"}:
+        return None
+    if backend == "sqlite":
+        path = os.getenv(f"{prefix}_PATH") or data_path("cache.sqlite3")
+        logger.info(f"{prefix}: sqlite cache at {path} (max {max_entries}, ttl {ttl})")
+        return SQLiteCache(path, table=table, max_entries=max_entries, ttl=ttl)
+    if backend != "memory":
+        logger.warning(f"{prefix}_BACKEND={backend!r} unknown — using memory")
+    return MemoryLRUCache(max_entries=max_entries, ttl=ttl)
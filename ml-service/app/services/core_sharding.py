@@ -0,0 +1,152 @@
+"""
+Core-aware sharding of the machine's CPUs across concurrent OCR sessions.
+
+With intra_op_num_threads = -1 every ONNX session spins up one thread per
+core, so N receipts in flight means N × cores busy threads fighting over
+the same cores. Instead the cores are split across K sessions
+(K × threads ≈ cores), where K follows the observed request concurrency:
+a quiet bot gives one receipt all cores, a busy one gives each of K
+concurrent receipts its own slice.
+
+The plan is re-evaluated at most every OCR_SHARD_REPLAN_INTERVAL seconds
+from the peak concurrency seen over the last OCR_SHARD_WINDOW seconds.
+Workers pick up a new plan when they are next recycled (see OCRWorkerPool).
+With OCR_CPU_PIN each worker is also pinned to its own core slice.
+"""
+import os
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_CORE_SHARDING = os.getenv("OCR_CORE_SHARDING", "true").lower() in {"1", "true", "yes"}
+OCR_CPU_PIN = os.getenv("OCR_CPU_PIN", "false").lower() in {"1", "true", "yes"}
+OCR_SHARD_WINDOW = float(os.getenv("OCR_SHARD_WINDOW", "300"))
+OCR_SHARD_REPLAN_INTERVAL = float(os.getenv("OCR_SHARD_REPLAN_INTERVAL", "30"))
+
+
+def available_cores() -> list[int]:
+    """CPU ids this process may run on (respects cgroup/taskset affinity)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_current_thread(cpus: list[int]) -> None:
+    """
+    Restrict the calling thread (Linux) to `cpus`. Threads it creates later —
+    e.g. ONNX Runtime's intra-op pool during session creation — inherit it.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        logger.warning(f"Could not pin OCR worker to cores {cpus}: {e}")
+
+
+@dataclass(frozen=True)
+class ShardPlan:
+    sessions: int   # K concurrent OCR sessions the cores are split across
+    threads: int    # intra-op threads per session
+
+    def cpus_for(self, slot: int, cores: list[int]) -> list[int]:
+        """Core slice for worker `slot`; slots beyond K wrap onto earlier slices."""
+        start = (slot % self.sessions) * self.threads
+        return [cores[(start + i) % len(cores)] for i in range(self.threads)]
+
+
+def plan_shards(cores: int, concurrency: int, max_sessions: int) -> ShardPlan:
+    sessions = max(1, min(concurrency, max_sessions, cores))
+    return ShardPlan(sessions, max(1, cores // sessions))
+
+
+class ConcurrencyTracker:
+    """Peak number of in-flight jobs per time bucket, over a sliding window."""
+
+    def __init__(self, window: float = OCR_SHARD_WINDOW, bucket: float = 10.0):
+        self.window = window
+        self.bucket = bucket
+        self.in_flight = 0
+        self._peaks: deque[list[float]] = deque()   # [bucket_start, peak]
+
+    def _record(self, now: float) -> None:
+        start = now - now % self.bucket
+        if not self._peaks or self._peaks[-1][0] != start:
+            self._peaks.append([start, self.in_flight])
+        else:
+            self._peaks[-1][1] = max(self._peaks[-1][1], self.in_flight)
+        while self._peaks and self._peaks[0][0] < now - self.window:
+            self._peaks.popleft()
+
+    def enter(self) -> None:
+        self.in_flight += 1
+        self._record(time.monotonic())
+
+    def exit(self) -> None:
+        self.in_flight -= 1
+
+    def observed(self) -> int | None:
+        """Peak concurrency over the window, or None before any traffic."""
+        if not self._peaks:
+            return None
+        self._record(time.monotonic())
+        return int(max(peak for _, peak in self._peaks))
+
+
+class CoreSharder:
+    """
+    Chooses the ShardPlan for new/recycled pool workers from observed
+    concurrency. Until traffic is seen it assumes the pool will be full.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        cores: list[int] | None = None,
+        pin: bool = OCR_CPU_PIN,
+        window: float = OCR_SHARD_WINDOW,
+        replan_interval: float = OCR_SHARD_REPLAN_INTERVAL,
+    ):
+        self.cores = cores or available_cores()
+        self.max_sessions = max(1, max_sessions)
+        self.pin = pin
+        self.replan_interval = replan_interval
+        self.tracker = ConcurrencyTracker(window)
+        self._plan = plan_shards(len(self.cores), self.max_sessions, self.max_sessions)
+        self._planned_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls, max_sessions: int) -> "CoreSharder | None":
+        return cls(max_sessions) if OCR_CORE_SHARDING else None
+
+    def job_started(self) -> None:
+        self.tracker.enter()
+
+    def job_finished(self) -> None:
+        self.tracker.exit()
+
+    @property
+    def plan(self) -> ShardPlan:
+        now = time.monotonic()
+        if now - self._planned_at >= self.replan_interval:
+            self._planned_at = now
+            observed = self.tracker.observed()
+            if observed:
+                plan = plan_shards(len(self.cores), observed, self.max_sessions)
+                if plan != self._plan:
+                    logger.info(
+                        f"OCR core sharding: peak concurrency {observed} → "
+                        f"{plan.sessions} sessions × {plan.threads} threads "
+                        f"(was {self._plan.sessions} × {self._plan.threads})"
+                    )
+                    self._plan = plan
+        return self._plan
+
+    def worker_init_args(self, plan: ShardPlan, slot: int) -> tuple:
+        """Arguments for the pool initializer: (threads, cpus-to-pin or None)."""
+        cpus = plan.cpus_for(slot, self.cores) if self.pin else None
+        return plan.threads, cpus
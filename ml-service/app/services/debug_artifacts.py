@@ -0,0 +1,136 @@
+import os
+import queue
+import random
+import logging
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ── Config (off by default — debug JPEGs cost real encode time) ───────────────
+DEBUG_ARTIFACTS_ENABLED = os.getenv("OCR_DEBUG_ARTIFACTS", "false").lower() in {"1", "true", "yes"}
+DEBUG_ARTIFACTS_SAMPLE_PCT = float(os.getenv("OCR_DEBUG_SAMPLE_PCT", "100"))
+DEBUG_ARTIFACTS_DIR = os.getenv("OCR_DEBUG_DIR", "debug_artifacts")
+DEBUG_ARTIFACTS_QUEUE_SIZE = int(os.getenv("OCR_DEBUG_QUEUE_SIZE", "64"))
+
+
+class _NullDebugSession:
+    """Returned when a request is not sampled — every call is a no-op."""
+    __slots__ = ()
+    enabled = False
+    directory = None
+
+    def save(self, name: str, img: np.ndarray) -> None:
+        return None
+
+
+NULL_DEBUG_SESSION = _NullDebugSession()
+
+
+class DebugSession:
+    """
+    Intermediates for ONE receipt, written under their own directory so
+    concurrent requests never overwrite each other.
+    Files are numbered in pipeline order: 01_original.jpg, 02_perspective.jpg, ...
+    """
+    __slots__ = ("directory", "_sink", "_counter")
+    enabled = True
+
+    def __init__(self, directory: Path, sink: "DebugArtifactSink"):
+        self.directory = directory
+        self._sink = sink
+        self._counter = 0
+
+    def save(self, name: str, img: np.ndarray) -> None:
+        if img is None:
+            return
+        self._counter += 1
+        # Arrays are queued by reference — pipeline stages never modify
+        # their input in place, so no copy is needed on the hot path.
+        self._sink.enqueue(self.directory / f"{self._counter:02d}_{name}.jpg", img)
+
+
+class DebugArtifactSink:
+    """
+    Samples N% of requests and JPEG-encodes their intermediates on a
+    background writer thread. The OCR hot path only pays for a queue put;
+    when the queue is full the artifact is dropped instead of blocking.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_pct: float = 100.0,
+        base_dir: str | Path = "debug_artifacts",
+        max_queue: int = 64,
+    ):
+        self.enabled = enabled
+        self.sample_pct = max(0.0, min(sample_pct, 100.0))
+        self.base_dir = Path(base_dir)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._writer: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "DebugArtifactSink":
+        return cls(
+            enabled=DEBUG_ARTIFACTS_ENABLED,
+            sample_pct=DEBUG_ARTIFACTS_SAMPLE_PCT,
+            base_dir=DEBUG_ARTIFACTS_DIR,
+            max_queue=DEBUG_ARTIFACTS_QUEUE_SIZE,
+        )
+
+    def session(self, label: str | None = None) -> DebugSession | _NullDebugSession:
+        if not self.enabled or random.random() * 100 >= self.sample_pct:
+            return NULL_DEBUG_SESSION
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}_{label or uuid.uuid4().hex[:8]}"
+        self._ensure_writer()
+        return DebugSession(self.base_dir / name, self)
+
+    def enqueue(self, path: Path, img: np.ndarray) -> None:
+        try:
+            self._queue.put_nowait((path, img))
+        except queue.Full:
+            self.dropped += 1
+            logger.debug(f"Debug artifact queue full — dropping {path.name}")
+
+    def flush(self) -> None:
+        """Block until every queued artifact has been written (shutdown only)."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="ocr-debug-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            path, img = self._queue.get()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                cv2.imwrite(str(path), img)
+            except Exception as e:
+                logger.warning(f"Failed to write debug artifact {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+debug_sink = DebugArtifactSink.from_env()
+
+
+def start_debug_session(label: str | None = None) -> DebugSession | _NullDebugSession:
+    return debug_sink.session(label)
@@ -0,0 +1,143 @@
+"""
+Named RapidOCR engine profiles (inference backend, threads, memory arena,
+model variant), selected with OCR_ENGINE_PROFILE and layered on top of
+default_rapidocr.yaml as RapidOCR `params` overrides.
+
+Built-in profiles are below; more can be declared in a YAML file pointed to
+by OCR_ENGINE_PROFILES_FILE:
+
+    my-int8:
+      backend: onnxruntime
+      intra_threads: 2
+      det_model_path: models/det_int8.onnx
+      rec_model_path: models/rec_int8.onnx
+
+Compare them on the local CPU with `python -m benchmarks.calibrate_engine`.
+"""
+import os
+import importlib.util
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+
+import yaml
+from rapidocr import EngineType, LangDet, LangRec, ModelType, OCRVersion
+
+logger = logging.getLogger(__name__)
+
+OCR_ENGINE_PROFILE = os.getenv("OCR_ENGINE_PROFILE", "default")
+OCR_ENGINE_PROFILES_FILE = os.getenv("OCR_ENGINE_PROFILES_FILE")
+# Overrides the profile's intra-op thread count when set (0 = keep profile value)
+OCR_ENGINE_THREADS = int(os.getenv("OCR_ENGINE_THREADS", "0"))
+
+# Python package each backend needs at runtime
+_BACKEND_MODULES = {"onnxruntime": "onnxruntime", "openvino": "openvino"}
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    name: str
+    backend: str = "onnxruntime"          # onnxruntime | openvino
+    intra_threads: int = -1               # -1 = backend default (all cores)
+    inter_threads: int = -1
+    mem_arena: bool = False               # onnxruntime enable_cpu_mem_arena
+    ocr_version: str | None = None        # "PP-OCRv4" | "PP-OCRv5"; None = yaml
+    model_type: str | None = None         # "mobile" | "server"; None = yaml
+    det_lang: str | None = None
+    rec_lang: str | None = None
+    det_model_path: str | None = None     # e.g. an INT8-quantised export
+    rec_model_path: str | None = None
+    extra: dict = field(default_factory=dict)   # raw RapidOCR params, applied last
+
+    @property
+    def available(self) -> bool:
+        module = _BACKEND_MODULES.get(self.backend)
+        return module is not None and importlib.util.find_spec(module) is not None
+
+    def with_threads(self, intra_threads: int) -> "EngineProfile":
+        values = {f.name: getattr(self, f.name) for f in fields(self)}
+        values.update(name=f"{self.name}@{intra_threads}t", intra_threads=intra_threads)
+        return EngineProfile(**values)
+
+    def to_params(self) -> dict:
+        """RapidOCR `params` dict (dotted config keys, enums where RapidOCR requires them)."""
+        engine = EngineType(self.backend)
+        params = {f"{task}.engine_type": engine for task in ("Det", "Cls", "Rec")}
+
+        if engine is EngineType.ONNXRUNTIME:
+            params["EngineConfig.onnxruntime.intra_op_num_threads"] = self.intra_threads
+            params["EngineConfig.onnxruntime.inter_op_num_threads"] = self.inter_threads
+            params["EngineConfig.onnxruntime.enable_cpu_mem_arena"] = self.mem_arena
+        elif engine is EngineType.OPENVINO:
+            params["EngineConfig.openvino.inference_num_threads"] = self.intra_threads
+
+        for task in ("Det", "Rec"):
+            if self.ocr_version:
+                params[f"{task}.ocr_version"] = OCRVersion(self.ocr_version)
+            if self.model_type:
+                params[f"{task}.model_type"] = ModelType(self.model_type)
+        if self.det_lang:
+            params["Det.lang_type"] = LangDet(self.det_lang)
+        if self.rec_lang:
+            params["Rec.lang_type"] = LangRec(self.rec_lang)
+        if self.det_model_path:
+            params["Det.model_path"] = self.det_model_path
+        if self.rec_model_path:
+            params["Rec.model_path"] = self.rec_model_path
+
+        params.update(self.extra)
+        return params
+
+
+BUILTIN_PROFILES = {
+    p.name: p
+    for p in [
+        # What default_rapidocr.yaml has always run: ORT, all cores, no arena, v4 mobile
+        EngineProfile("default"),
+        EngineProfile("ort-arena", mem_arena=True),
+        EngineProfile("ort-single", intra_threads=1, inter_threads=1, mem_arena=True),
+        EngineProfile("openvino", backend="openvino"),
+        # PP-OCRv5 ships det only as "ch" (covers latin script)
+        EngineProfile("v5-mobile", ocr_version="PP-OCRv5", model_type="mobile", det_lang="ch", rec_lang="en"),
+        # Server weights exist only for the "ch" models (their dictionary includes latin)
+        EngineProfile("v4-server", ocr_version="PP-OCRv4", model_type="server", det_lang="ch", rec_lang="ch"),
+    ]
+}
+
+
+def load_profiles(path: str | None = OCR_ENGINE_PROFILES_FILE) -> dict[str, EngineProfile]:
+    """Built-in profiles plus any declared in the YAML file at `path`."""
+    profiles = dict(BUILTIN_PROFILES)
+    if not path:
+        return profiles
+    with open(path, encoding="utf-8") as f:
+        declared = yaml.safe_load(f) or {}
+    for name, options in declared.items():
+        profiles[name] = EngineProfile(name=name, **(options or {}))
+    return profiles
+
+
+def get_profile(name: str = OCR_ENGINE_PROFILE, threads: int = OCR_ENGINE_THREADS) -> EngineProfile:
+    profiles = load_profiles()
+    profile = profiles.get(name)
+    if profile is None:
+        logger.warning(f"Unknown OCR_ENGINE_PROFILE={name!r} (have {', '.join(profiles)}) — using default")
+        profile = profiles["default"]
+    if not profile.available:
+        logger.warning(f"Engine profile {profile.name!r} needs {profile.backend}, which is not installed — using default")
+        profile = profiles["default"]
+    if threads:
+        profile = profile.with_threads(threads)
+    return profile
+
+
+@contextmanager
+def preserve_call_flags(engine):
+    """RapidOCR keeps per-call use_det/use_cls/use_rec on the instance — restore them after."""
+    saved = tuple(getattr(engine, name, None) for name in ("use_det", "use_cls", "use_rec"))
+    try:
+        yield
+    finally:
+        for name, value in zip(("use_det", "use_cls", "use_rec"), saved):
+            if value is not None:
+                setattr(engine, name, value)
@@ -0,0 +1,136 @@
+"""
+Fast rejection of hopeless photos before they reach the OCR worker pool.
+
+The same checks as assess_image_quality run on a small grayscale thumbnail
+(JPEG decoded at 1/2–1/8 scale, then capped at OCR_REJECT_THUMB_SIDE px),
+which takes a few milliseconds instead of the full perspective → denoise →
+CLAHE → deskew → RapidOCR pipeline. Only images that are unusable by a wide
+margin are rejected; borderline ones still go through OCR.
+
+Policy (OCR_FAST_REJECT):
+    severe  — reject on severe blur / darkness / glare / flatness (default)
+    log     — compute and log the verdict, always try OCR anyway
+    off     — skip the check entirely
+"""
+import os
+import logging
+import time
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from app.services.image_analysis import ImageAnalysis
+from app.services.ocr_services import ImageSource, assess_image_quality, load_image
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_FAST_REJECT = os.getenv("OCR_FAST_REJECT", "severe").lower()
+# Thumbnail long side — thresholds below are calibrated at this size
+OCR_REJECT_THUMB_SIDE = int(os.getenv("OCR_REJECT_THUMB_SIDE", "512"))
+# Laplacian variance on the thumbnail; a 1280px photo blurred by σ≈5px scores ~15
+OCR_REJECT_MIN_BLUR = float(os.getenv("OCR_REJECT_MIN_BLUR", "25"))
+OCR_REJECT_MIN_BRIGHTNESS = float(os.getenv("OCR_REJECT_MIN_BRIGHTNESS", "40"))
+OCR_REJECT_MAX_BRIGHTNESS = float(os.getenv("OCR_REJECT_MAX_BRIGHTNESS", "245"))
+OCR_REJECT_MIN_CONTRAST = float(os.getenv("OCR_REJECT_MIN_CONTRAST", "12"))
+
+_REDUCED_DECODES = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+    (1, cv2.IMREAD_GRAYSCALE),
+)
+
+
+@dataclass
+class QualityVerdict:
+    usable: bool
+    issues: list[str] = field(default_factory=list)   # severe issues (same names as assess_image_quality)
+    quality: dict | None = None                       # assess_image_quality() of the thumbnail
+    elapsed_ms: float = 0.0
+
+
+def _decode_thumbnail(data: bytes | bytearray | memoryview, size_hint: tuple[int, int] | None) -> np.ndarray | None:
+    """
+    Decode at the coarsest JPEG scale that still covers the thumbnail size.
+    `size_hint` (width, height — e.g. Telegram's PhotoSize) avoids a probe decode.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if size_hint and all(size_hint):
+        long_side = max(size_hint)
+        probe = None
+    else:
+        probe = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if probe is None:
+            return None
+        long_side = max(probe.shape) * 8
+
+    for factor, flag in _REDUCED_DECODES:
+        if long_side / factor >= OCR_REJECT_THUMB_SIDE or factor == 1:
+            if factor == 8 and probe is not None:
+                return probe
+            return cv2.imdecode(buf, flag)
+    return None
+
+
+def make_thumbnail(source: ImageSource, size_hint: tuple[int, int] | None = None) -> np.ndarray | None:
+    """Grayscale thumbnail, long side ≤ OCR_REJECT_THUMB_SIDE."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        gray = _decode_thumbnail(source, size_hint)
+    else:
+        img = load_image(source)
+        gray = None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if gray is None:
+        return None
+
+    scale = OCR_REJECT_THUMB_SIDE / max(gray.shape)
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def severe_issues(quality: dict) -> list[str]:
+    issues = []
+    if quality["blur_score"] < OCR_REJECT_MIN_BLUR:
+        issues.append("blurry")
+    if quality["brightness"] < OCR_REJECT_MIN_BRIGHTNESS:
+        issues.append("too_dark")
+    if quality["brightness"] > OCR_REJECT_MAX_BRIGHTNESS:
+        issues.append("too_bright")
+    if quality["contrast"] < OCR_REJECT_MIN_CONTRAST:
+        issues.append("low_contrast")
+    return issues
+
+
+def fast_quality_check(
+    source: ImageSource,
+    size_hint: tuple[int, int] | None = None,
+    policy: str = OCR_FAST_REJECT,
+) -> QualityVerdict:
+    """
+    Thumbnail quality verdict in a few ms. `usable=False` only when the
+    policy is "severe" and the thumbnail fails a severe threshold; images
+    that can't be decoded are left for the full pipeline to report.
+    """
+    if policy == "off":
+        return QualityVerdict(usable=True)
+
+    start = time.perf_counter()
+    thumb = make_thumbnail(source, size_hint)
+    if thumb is None:
+        return QualityVerdict(usable=True)
+
+    quality = assess_image_quality(thumb, analysis=ImageAnalysis.from_gray(thumb))
+    issues = severe_issues(quality)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    usable = not issues or policy != "severe"
+    if issues:
+        action = "rejecting" if not usable else "trying anyway"
+        logger.info(
+            f"Fast reject: {', '.join(issues)} on {thumb.shape[1]}x{thumb.shape[0]} thumbnail "
+            f"(blur {quality['blur_score']:.0f}, brightness {quality['brightness']:.0f}, "
+            f"contrast {quality['contrast']:.0f}) in {elapsed_ms:.1f}ms — {action}"
+        )
+    return QualityVerdict(usable=usable, issues=issues, quality=quality, elapsed_ms=elapsed_ms)
@@ -0,0 +1,117 @@
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+
+class ImageAnalysis:
+    """
+    Lazily evaluated, memoised per-image features shared by every stage of
+    the OCR pipeline (quality check, perspective correction, crop).
+
+    Each property is computed on first access and cached, so gray →
+    blurred → edges / threshold → contours runs once per frame no matter
+    how many stages ask for it. Use `for_image()` when a stage may or may
+    not have produced a new frame, and `crop()` to derive the analysis of
+    a sub-region without re-running cvtColor.
+    """
+
+    def __init__(self, img: np.ndarray):
+        self.img = img
+
+    @classmethod
+    def of(cls, img: np.ndarray, analysis: "ImageAnalysis | None" = None) -> "ImageAnalysis":
+        if analysis is not None and analysis.img is img:
+            return analysis
+        return cls(img)
+
+    @classmethod
+    def from_gray(cls, gray: np.ndarray) -> "ImageAnalysis":
+        """Analysis of an image that is already single-channel (e.g. a reduced decode)."""
+        analysis = cls(gray)
+        analysis.gray = gray
+        return analysis
+
+    def for_image(self, img: np.ndarray) -> "ImageAnalysis":
+        """Reuse this analysis if `img` is the same frame, else start fresh."""
+        return ImageAnalysis.of(img, self)
+
+    def crop(self, x: int, y: int, w: int, h: int) -> "ImageAnalysis":
+        """Analysis of img[y:y+h, x:x+w] — grayscale is sliced, not recomputed."""
+        child = ImageAnalysis(self.img[y:y + h, x:x + w])
+        if "gray" in self.__dict__:
+            child.gray = self.gray[y:y + h, x:x + w]
+        return child
+
+    # ── Pixel-level intermediates ─────────────────────────────────────────────
+    @cached_property
+    def gray(self) -> np.ndarray:
+        return cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def blurred(self) -> np.ndarray:
+        return cv2.GaussianBlur(self.gray, (5, 5), 0)
+
+    @cached_property
+    def edges(self) -> np.ndarray:
+        return cv2.Canny(self.blurred, 50, 150)
+
+    @cached_property
+    def threshold(self) -> np.ndarray:
+        # Threshold — pisahin struk putih dari background gelap
+        _, thresh = cv2.threshold(self.blurred, 127, 255, cv2.THRESH_BINARY)
+        return thresh
+
+    # ── Contours ──────────────────────────────────────────────────────────────
+    @cached_property
+    def edge_contours(self) -> tuple:
+        contours, _ = cv2.findContours(self.edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    @cached_property
+    def threshold_contours(self) -> tuple:
+        contours, _ = cv2.findContours(self.threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    @cached_property
+    def largest_edge_contour(self) -> np.ndarray | None:
+        if not self.edge_contours:
+            return None
+        return max(self.edge_contours, key=cv2.contourArea)
+
+    @cached_property
+    def largest_threshold_contour(self) -> np.ndarray | None:
+        if not self.threshold_contours:
+            return None
+        return max(self.threshold_contours, key=cv2.contourArea)
+
+    # ── Scalar quality features ───────────────────────────────────────────────
+    @property
+    def area(self) -> int:
+        return self.img.shape[0] * self.img.shape[1]
+
+    @cached_property
+    def blur_score(self) -> float:
+        return float(cv2.Laplacian(self.gray, cv2.CV_64F).var())
+
+    @cached_property
+    def _mean_std(self) -> tuple[float, float]:
+        # One pass for both — same values as np.mean / np.std (population std)
+        mean, std = cv2.meanStdDev(self.gray)
+        return float(mean[0][0]), float(std[0][0])
+
+    @property
+    def brightness(self) -> float:
+        return self._mean_std[0]
+
+    @property
+    def contrast(self) -> float:
+        return self._mean_std[1]
+
+    @cached_property
+    def receipt_ratio(self) -> float:
+        """Rasio area contour terbesar (harusnya struk) vs total foto, 0.0 - 1.0"""
+        largest = self.largest_threshold_contour
+        if largest is None:
+            return 0.0
+        return cv2.contourArea(largest) / self.area
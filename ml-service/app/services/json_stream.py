@@ -0,0 +1,123 @@
+"""
+Incremental parser for a streamed JSON object.
+
+Ollama's streaming mode hands the response over a few tokens at a time.
+ObjectStream is fed those chunks and reports each top-level member as soon
+as its value is complete, plus each element of the arrays named in
+`array_keys` as soon as that element is complete — so the receipt header
+and the first items can be scored while later items are still generating.
+
+Only the bracket/string structure is tracked while scanning; every complete
+value is handed to json.loads, so values come out exactly as the final
+json.loads of the whole response would give them.
+"""
+import json
+from typing import Any, Iterable, NamedTuple
+
+
+class StreamEvent(NamedTuple):
+    key: str
+    index: int | None       # position in an `array_keys` array; None for a whole member
+    value: Any
+
+
+class ObjectStream:
+    def __init__(self, array_keys: Iterable[str] = ()):
+        self.array_keys = set(array_keys)
+        self._text = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key: str | None = None
+        self._key_start: int | None = None
+        self._value_start: int | None = None     # top-level member value
+        self._element_start: int | None = None   # element of a streamed array
+        self._element_index = 0
+        self.done = False
+
+    def _streaming_array(self) -> bool:
+        return len(self._stack) == 2 and self._stack[-1] == "[" and self._key in self.array_keys
+
+    def _member(self, end: int) -> StreamEvent:
+        value = json.loads(self._text[self._value_start:end])
+        self._value_start = None
+        return StreamEvent(self._key, None, value)
+
+    def _element(self, end: int) -> StreamEvent:
+        value = json.loads(self._text[self._element_start:end])
+        self._element_start = None
+        self._element_index += 1
+        return StreamEvent(self._key, self._element_index - 1, value)
+
+    def feed(self, chunk: str) -> list[StreamEvent]:
+        """Consume `chunk`; return the values it completed. Malformed JSON raises ValueError."""
+        self._text += chunk
+        events = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            c = text[i]
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = None
+                        self._expect_key = False
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if depth == 1 and self._expect_key:
+                    self._key_start = i
+                else:
+                    self._mark_value_start(i, depth)
+            elif c in "{[":
+                self._mark_value_start(i, depth)
+                self._stack.append(c)
+                if depth == 0:
+                    self._expect_key = True
+                elif self._streaming_array():
+                    self._element_index = 0
+            elif c in "}]":
+                if not self._stack:
+                    raise ValueError(f"Unbalanced '{c}' at {i}")
+                if depth == 2 and self._element_start is not None:
+                    events.append(self._element(i))         # trailing scalar element
+                if depth == 1 and self._value_start is not None:
+                    events.append(self._member(i))          # trailing scalar member
+                self._stack.pop()
+                depth -= 1
+                if depth == 2 and self._element_start is not None and self._streaming_array():
+                    events.append(self._element(i + 1))
+                elif depth == 1 and self._value_start is not None:
+                    events.append(self._member(i + 1))
+                elif depth == 0:
+                    self.done = True
+            elif c == ",":
+                if depth == 1:
+                    if self._value_start is not None:
+                        events.append(self._member(i))
+                    self._expect_key = True
+                elif depth == 2 and self._element_start is not None and self._streaming_array():
+                    events.append(self._element(i))
+            elif not c.isspace() and c != ":":
+                self._mark_value_start(i, depth)     # number / true / false / null
+
+        self._pos = len(text)
+        return events
+
+    def _mark_value_start(self, i: int, depth: int) -> None:
+        if depth == 1 and not self._expect_key and self._value_start is None:
+            self._value_start = i
+        elif self._streaming_array() and self._element_start is None:
+            self._element_start = i
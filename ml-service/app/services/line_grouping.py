@@ -0,0 +1,277 @@
+"""
+Shared line-reconstruction engine for OCR boxes.
+
+Two grouping strategies are used across the service:
+  - overlap (ocr_services): a box joins the current line when its vertical
+    overlap with the line's span is > 30 % of the smaller height; columns are
+    split on a per-line dynamic gap threshold.
+  - center  (ai_services):  a box joins the anchor's line when its center-Y is
+    within `y_tolerance` of the anchor's center-Y; columns split on gaps > 30px.
+
+Both used to compare every box with every other box (O(n²) and worse). Here
+boxes are sorted once and each line only scans the neighbourhood that can
+still match: a sweep with an "unused" linked list for overlap grouping and a
+bisect window over sorted center-Y for center grouping — O(n log n) for
+receipt-like layouts, with output identical to the old loops.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from app.services.ocr_boxes import OCRBoxes
+
+COLUMN_SEPARATOR = "  |  "
+
+
+# ── Input normalisation ────────────────────────────────────────────────────────
+def box_arrays(boxes, texts: Sequence[str] | None = None):
+    """
+    Normalise boxes into (x, y, width, height, texts) with NumPy float arrays.
+
+    Accepts OCRBoxes (column views, no copy), OCRBox-like objects
+    (attributes), dicts (keys; missing width/height become NaN so each
+    strategy can apply its own default), or an (N, 4) array of
+    [x, y, width, height] plus `texts`.
+    """
+    if isinstance(boxes, OCRBoxes):
+        return boxes.x, boxes.y, boxes.width, boxes.height, boxes.texts
+    if isinstance(boxes, np.ndarray):
+        coords = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        return coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3], list(texts or [])
+
+    boxes = list(boxes)
+    n = len(boxes)
+    x = np.empty(n)
+    y = np.empty(n)
+    w = np.empty(n)
+    h = np.empty(n)
+    out_texts = []
+    for i, b in enumerate(boxes):
+        if isinstance(b, dict):
+            x[i] = b["x"]
+            y[i] = b["y"]
+            w[i] = b.get("width", np.nan)
+            h[i] = b.get("height", np.nan)
+            out_texts.append(b["text"])
+        else:
+            x[i] = b.x
+            y[i] = b.y
+            w[i] = b.width
+            h[i] = b.height
+            out_texts.append(b.text)
+    return x, y, w, h, out_texts
+
+
+def _upper_median(values: np.ndarray) -> float:
+    """Same as sorted(values)[len // 2] — the convention used across the repo."""
+    return float(np.partition(values, len(values) // 2)[len(values) // 2])
+
+
+# ── Tolerances / thresholds (vectorised) ───────────────────────────────────────
+def overlap_tolerance(heights: np.ndarray) -> int:
+    """60 % of the median box height (boxes ≤ 5px ignored), fallback 15."""
+    if len(heights) < 2:
+        return 15
+    valid = heights[heights > 5]
+    if valid.size == 0:
+        return 15
+    return int(_upper_median(valid) * 0.6)
+
+
+def center_tolerance(y: np.ndarray, heights: np.ndarray) -> int:
+    """
+    Row-spacing based tolerance for center grouping: find the largest jump in
+    the small-gap part of the first rows' y-gap distribution, clamp to
+    20 %–60 % of the median box height.
+    """
+    if len(y) < 2:
+        return 15
+    valid = heights[heights > 5]
+    if valid.size == 0:
+        return 15
+    median_height = _upper_median(valid)
+
+    first_rows = y[np.argsort(y, kind="stable")[:10]]
+    gaps = np.diff(first_rows)
+    gaps = gaps[gaps > 2]
+    if gaps.size < 3:
+        return int(median_height * 0.45)
+
+    candidate_gaps = np.sort(gaps)[: int(gaps.size * 0.70)]
+    if candidate_gaps.size < 2:
+        return int(median_height * 0.45)
+
+    jumps = np.diff(candidate_gaps)
+    k = int(np.argmax(jumps))
+    if jumps[k] < 3:
+        return int(median_height * 0.45)
+    boundary = (candidate_gaps[k + 1] + candidate_gaps[k]) / 2
+
+    tolerance = int(boundary * 0.8)
+    min_tolerance = int(median_height * 0.2)
+    max_tolerance = int(median_height * 0.6)
+    return max(min_tolerance, min(tolerance, max_tolerance))
+
+
+def column_gap_threshold(x_sorted: np.ndarray, w_sorted: np.ndarray) -> float:
+    """2x the median positive gap between x-sorted tokens of one line, fallback 30."""
+    if len(x_sorted) < 3:
+        return 30
+    gaps = x_sorted[1:] - (x_sorted[:-1] + w_sorted[:-1])
+    gaps = gaps[gaps > 0]
+    if gaps.size == 0:
+        return 30
+    return _upper_median(gaps) * 2.0
+
+
+# ── Grouping ───────────────────────────────────────────────────────────────────
+def group_lines_by_overlap(y: np.ndarray, h: np.ndarray) -> list[list[int]]:
+    """
+    Sweep top→bottom. Each line starts at the first unused box; later unused
+    boxes join while their top is above the line's (growing) bottom and the
+    overlap exceeds 30 % of the smaller height. Once a box starts below the
+    line's bottom nothing after it can overlap, so the scan stops there.
+    """
+    n = len(y)
+    if n == 0:
+        return []
+
+    order = np.argsort(y, kind="stable").tolist()
+    tops = y[order].tolist()
+    bottoms = (y + h)[order].tolist()
+
+    # Doubly-linked list of unused positions; 0 = head, n + 1 = tail sentinels
+    nxt = list(range(1, n + 2))
+    prv = list(range(-1, n + 1))
+
+    def unlink(p: int) -> None:
+        nxt[prv[p]] = nxt[p]
+        prv[nxt[p]] = prv[p]
+
+    tail = n + 1
+    lines = []
+    while nxt[0] != tail:
+        anchor = nxt[0]
+        unlink(anchor)
+        a = anchor - 1
+        line = [order[a]]
+        line_top = tops[a]
+        line_bottom = bottoms[a]
+
+        p = nxt[0]
+        while p != tail:
+            k = p - 1
+            other_top = tops[k]
+            if other_top >= line_bottom:
+                break
+            other_bottom = bottoms[k]
+            overlap = min(line_bottom, other_bottom) - max(line_top, other_top)
+            min_height = min(line_bottom - line_top, other_bottom - other_top)
+            following = nxt[p]
+            if min_height > 0 and overlap / min_height > 0.3:
+                line.append(order[k])
+                line_bottom = max(line_bottom, other_bottom)
+                unlink(p)
+            p = following
+        lines.append(line)
+
+    return lines
+
+
+def group_lines_by_center(y: np.ndarray, h: np.ndarray, y_tolerance: float) -> list[list[int]]:
+    """
+    Anchors are taken top→bottom (by y); each claims every unused box whose
+    center-Y is within `y_tolerance` of the anchor's center. Candidates come
+    from a bisect window over sorted center-Y instead of a full scan.
+    """
+    n = len(y)
+    if n == 0:
+        return []
+
+    cy = y + h / 2
+    order_y = np.argsort(y, kind="stable").tolist()
+    rank = [0] * n
+    for r, i in enumerate(order_y):
+        rank[i] = r
+
+    order_c = np.argsort(cy, kind="stable").tolist()
+    sorted_cy = cy[order_c].tolist()
+    cy = cy.tolist()
+    used = [False] * n
+
+    lines = []
+    for anchor in order_y:
+        if used[anchor]:
+            continue
+        used[anchor] = True
+        anchor_cy = cy[anchor]
+
+        # Window is widened by 1px, then the exact |Δcy| <= tol test decides
+        lo = bisect_left(sorted_cy, anchor_cy - y_tolerance - 1)
+        hi = bisect_right(sorted_cy, anchor_cy + y_tolerance + 1)
+        members = []
+        for pos in range(lo, hi):
+            j = order_c[pos]
+            if not used[j] and abs(anchor_cy - cy[j]) <= y_tolerance:
+                used[j] = True
+                members.append(j)
+
+        members.sort(key=rank.__getitem__)  # same order the y-ordered scan found them
+        lines.append([anchor] + members)
+
+    return lines
+
+
+# ── Rendering ──────────────────────────────────────────────────────────────────
+def render_lines(
+    lines: Iterable[list[int]],
+    x: np.ndarray,
+    w: np.ndarray,
+    texts: Sequence[str],
+    gap_threshold: float | None = None,
+) -> str:
+    """
+    Join each line's tokens left→right, inserting "  |  " on column gaps.
+    `gap_threshold=None` uses the per-line dynamic column_gap_threshold.
+    """
+    xs = x.tolist()
+    ws = w.tolist()
+    out = []
+    for line in lines:
+        line = sorted(line, key=xs.__getitem__)
+        if gap_threshold is None:
+            threshold = column_gap_threshold(x[line], w[line])
+        else:
+            threshold = gap_threshold
+
+        parts = [texts[line[0]]]
+        for prev, cur in zip(line, line[1:]):
+            gap = xs[cur] - (xs[prev] + ws[prev])
+            parts.append(COLUMN_SEPARATOR + texts[cur] if gap > threshold else " " + texts[cur])
+        out.append("".join(parts))
+
+    return "\n".join(out)
+
+
+def reconstruct_lines_by_overlap(boxes, texts: Sequence[str] | None = None) -> str:
+    x, y, w, h, texts = box_arrays(boxes, texts)
+    if len(texts) == 0:
+        return ""
+    return render_lines(group_lines_by_overlap(y, h), x, w, texts)
+
+
+def reconstruct_lines_by_center(
+    boxes,
+    y_tolerance: float | None = None,
+    texts: Sequence[str] | None = None,
+) -> str:
+    x, y, w, h, texts = box_arrays(boxes, texts)
+    if len(texts) == 0:
+        return ""
+    if y_tolerance is None:
+        y_tolerance = center_tolerance(y, h)
+    # Defaults the center strategy always used for boxes without size info
+    h = np.where(np.isnan(h), 20.0, h)
+    w = np.where(np.isnan(w), 50.0, w)
+    return render_lines(group_lines_by_center(y, h, y_tolerance), x, w, texts, gap_threshold=30)
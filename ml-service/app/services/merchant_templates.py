@@ -0,0 +1,329 @@
+"""
+Per-merchant layout templates learned from VERIFIED receipts.
+
+Every slip from one store is printed from the same layout, so once the LLM
+has read a few of them correctly the layout can be reused. From each
+receipt determine_receipt_status marks VERIFIED, the template records:
+
+  - header / footer landmarks: words of the first and last boxes
+  - column x-positions (fraction of the text width) of qty, price and total,
+    measured on the boxes holding the verified item values
+  - the date line pattern (separators, year digits, text before the time)
+  - the label of the total line ("TOTAL BELANJA", "Grand Total", ...)
+
+Templates live in a local SQLite file keyed by merchant name. match_template
+recognises the merchant from the first TEMPLATE_HEADER_BOXES boxes: enough
+of its landmarks must be there, the merchant name itself (or a landmark no
+other template has) must be among them — NPWP / TELP / JL / TOTAL are on
+every slip — and the runner-up template must score clearly lower. The
+template then renders each item row as "NAME QTY PRICE TOTAL" by column
+position and rule_extractor.parse_layout reads it deterministically, with
+the same reconcile checks as the minimarket fast path. A receipt that
+doesn't reconcile falls back to the LLM.
+"""
+import os
+import re
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from app.services.cache import data_path
+from app.services.line_grouping import group_lines_by_overlap
+from app.services.ocr_boxes import OCRBoxes
+from app.services.rule_extractor import AMOUNT, DATE, TIME, RuleStats, parse_amount, parse_layout
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+MERCHANT_TEMPLATES = os.getenv("MERCHANT_TEMPLATES", "true").lower() in {"1", "true", "yes"}
+MERCHANT_TEMPLATES_PATH = os.getenv("MERCHANT_TEMPLATES_PATH") or data_path("merchant_templates.sqlite3")
+TEMPLATE_MIN_SAMPLES = int(os.getenv("TEMPLATE_MIN_SAMPLES", "2"))       # verified receipts before use
+TEMPLATE_HEADER_BOXES = int(os.getenv("TEMPLATE_HEADER_BOXES", "5"))
+TEMPLATE_MATCH_THRESHOLD = float(os.getenv("TEMPLATE_MATCH_THRESHOLD", "0.6"))  # share of landmarks present
+TEMPLATE_MATCH_MARGIN = float(os.getenv("TEMPLATE_MATCH_MARGIN", "0.2"))        # lead over the runner-up
+
+_COLUMN_TOLERANCE = 0.06     # fraction of the text width
+_COLUMNS = ("qty", "price", "total")
+_WORD = re.compile(r"[A-Za-z]{3,}")
+# Printed on most slips regardless of store — never enough to tell merchants apart
+_GENERIC_TOKENS = {
+    "NPWP", "TELP", "TLP", "PHONE", "JLN", "JALAN", "RAYA", "KOTA", "KEC", "KEL", "RUKO", "BLOK",
+    "TGL", "TANGGAL", "JAM", "KASIR", "STRUK", "NOTA", "TOTAL", "BELANJA", "ITEM", "QTY", "HARGA",
+    "TUNAI", "KEMBALI", "PPN", "DPP", "TERIMA", "KASIH", "TBK", "CABANG", "STORE", "TOKO",
+}
+
+template_stats = RuleStats("Merchant templates")
+
+
+@dataclass
+class MerchantTemplate:
+    merchant: str
+    samples: int = 0
+    header_tokens: dict[str, int] = field(default_factory=dict)   # token → receipts it was seen in
+    footer_tokens: dict[str, int] = field(default_factory=dict)
+    columns: dict[str, float] = field(default_factory=dict)       # qty / price / total → relative x
+    date_pattern: str | None = None
+    total_label: str | None = None
+
+    def landmarks(self, tokens: dict[str, int] | None = None) -> set[str]:
+        """Tokens seen on at least half of the learned receipts."""
+        tokens = self.header_tokens if tokens is None else tokens
+        return {t for t, n in tokens.items() if n * 2 >= self.samples}
+
+    def merge(self, other: "MerchantTemplate") -> None:
+        """Fold one receipt's observation into the template (columns: running mean)."""
+        for name, x in other.columns.items():
+            seen = self.columns.get(name)
+            self.columns[name] = x if seen is None else (seen * self.samples + x) / (self.samples + 1)
+        self.header_tokens = dict(Counter(self.header_tokens) + Counter(other.header_tokens))
+        self.footer_tokens = dict(Counter(self.footer_tokens) + Counter(other.footer_tokens))
+        self.date_pattern = other.date_pattern or self.date_pattern
+        self.total_label = other.total_label or self.total_label
+        self.samples += 1
+
+    def identity(self) -> set[str]:
+        """Words of the merchant name plus the header landmarks, minus boilerplate."""
+        return (set(_tokens([self.merchant])) | self.landmarks()) - _GENERIC_TOKENS
+
+    def total_line(self) -> re.Pattern | None:
+        if not self.total_label:
+            return None
+        label = r"\s+".join(re.escape(word) for word in self.total_label.split())
+        return re.compile(rf"^{label}\s*:?\s*(?:rp\.?)?\s*(?P<amount>{AMOUNT})$", re.IGNORECASE)
+
+
+# ── Layout helpers ─────────────────────────────────────────────────────────────
+@dataclass
+class _Row:
+    centers: list[float]        # relative x-center per box, left→right
+    texts: list[str]
+
+    @property
+    def flat(self) -> str:
+        return " ".join(" ".join(self.texts).replace("|", " ").split())
+
+
+def _rows(boxes: OCRBoxes) -> list[_Row]:
+    x, y, w, h = boxes.x, boxes.y, boxes.width, boxes.height
+    left = float(x.min())
+    span = max(float((x + w).max()) - left, 1.0)
+    centers = ((x + w / 2 - left) / span).tolist()
+    rows = []
+    for line in group_lines_by_overlap(y, h):
+        line = sorted(line, key=centers.__getitem__)
+        rows.append(_Row([centers[i] for i in line], [boxes.texts[i].strip() for i in line]))
+    return rows
+
+
+def _tokens(texts: list[str]) -> dict[str, int]:
+    return {token: 1 for text in texts for token in _WORD.findall(text.upper())}
+
+
+def _edge_texts(boxes: OCRBoxes, count: int, last: bool = False) -> list[str]:
+    order = np.argsort(boxes.y, kind="stable").tolist()
+    picked = order[-count:] if last else order[:count]
+    return [boxes.texts[i] for i in picked]
+
+
+def _qty_value(text: str) -> int | None:
+    digits = re.sub(r"(?i)\s*(?:pcs|x)\s*", "", text)
+    return int(digits) if re.fullmatch(r"-?\d{1,3}", digits) else None
+
+
+def normalize_merchant(name: str) -> str:
+    return " ".join(str(name).upper().split())
+
+
+# ── Learning ───────────────────────────────────────────────────────────────────
+def _learn_columns(rows: list[_Row], items: list[dict]) -> dict[str, float]:
+    found: dict[str, list[float]] = {name: [] for name in _COLUMNS}
+    for item in items:
+        values = {name: (item.get(key) or {}).get("value") for name, key in
+                  (("qty", "qty"), ("price", "price"), ("total", "total_price"))}
+        for row in rows:
+            amounts = [parse_amount(t) for t in row.texts]
+            if values["total"] not in amounts:
+                continue
+            total_at = len(amounts) - 1 - amounts[::-1].index(values["total"])   # rightmost
+            found["total"].append(row.centers[total_at])
+            price_at = next((i for i in range(total_at - 1, -1, -1) if amounts[i] == values["price"]), None)
+            if price_at is not None:
+                found["price"].append(row.centers[price_at])
+                qty_at = next((i for i in range(price_at - 1, -1, -1) if _qty_value(row.texts[i]) == values["qty"]), None)
+                if qty_at is not None:
+                    found["qty"].append(row.centers[qty_at])
+            break
+    return {name: float(np.median(xs)) for name, xs in found.items() if xs}
+
+
+def _learn_date_pattern(rows: list[_Row], iso_date: str | None) -> str | None:
+    if not iso_date:
+        return None
+    for row in rows:
+        line = row.flat
+        for m in DATE.finditer(line):
+            day, month, year = m.group(1), m.group(2), m.group(3)
+            year_full = int(year) + (2000 if len(year) == 2 else 0)
+            if f"{year_full:04d}-{month}-{day}" != iso_date:
+                continue
+            seps = re.findall(r"[./-]", m.group(0))
+            pattern = rf"(?<!\d)(\d{{2}}){re.escape(seps[0])}(\d{{2}}){re.escape(seps[1])}(\d{{{len(year)}}})(?!\d)"
+            t = TIME.search(line, m.end())
+            gap = line[m.end():t.start()].strip() if t else None
+            if t and len(gap) <= 6 and not re.search(r"\d", gap):
+                pattern += rf"\s*{re.escape(gap)}\s*([01]\d|2[0-3])[:.]([0-5]\d)"
+            return pattern
+    return None
+
+
+def _learn_total_label(rows: list[_Row], total: int | None) -> str | None:
+    if not total:
+        return None
+    for row in reversed(rows):
+        if total in (parse_amount(t) for t in row.texts):
+            label = re.sub(rf"\s*:?\s*(?:rp\.?)?\s*(?:{AMOUNT})$", "", row.flat, flags=re.IGNORECASE).strip(" :")
+            if _WORD.search(label) and len(label) <= 24:
+                return label
+    return None
+
+
+def observe(receipt_data: dict, boxes: OCRBoxes) -> MerchantTemplate | None:
+    """One verified receipt's contribution to its merchant's template."""
+    merchant = normalize_merchant((receipt_data.get("merchant_name") or {}).get("value") or "")
+    if not merchant or not boxes:
+        return None
+    rows = _rows(boxes)
+    return MerchantTemplate(
+        merchant=merchant,
+        header_tokens=_tokens(_edge_texts(boxes, TEMPLATE_HEADER_BOXES)),
+        footer_tokens=_tokens(_edge_texts(boxes, TEMPLATE_HEADER_BOXES, last=True)),
+        columns=_learn_columns(rows, receipt_data.get("items") or []),
+        date_pattern=_learn_date_pattern(rows, (receipt_data.get("date") or {}).get("value")),
+        total_label=_learn_total_label(rows, (receipt_data.get("total_amount") or {}).get("value")),
+    )
+
+
+# ── Applying ───────────────────────────────────────────────────────────────────
+def _render_row(row: _Row, columns: dict[str, float]) -> str:
+    """Item rows as "NAME QTY PRICE TOTAL" by column position; other rows as flat text."""
+    if len(columns) < len(_COLUMNS):
+        return row.flat
+    picked: dict[str, int] = {}
+    for name, x in columns.items():
+        near = [i for i, c in enumerate(row.centers) if abs(c - x) <= _COLUMN_TOLERANCE]
+        if len(near) == 1:
+            picked[name] = near[0]
+    if len(picked) < len(_COLUMNS):
+        return row.flat
+
+    qty = _qty_value(row.texts[picked["qty"]])
+    price = parse_amount(row.texts[picked["price"]])
+    total = parse_amount(row.texts[picked["total"]])
+    name_edge = min(columns.values()) - _COLUMN_TOLERANCE
+    name = " ".join(t for c, t in zip(row.centers, row.texts) if c < name_edge)
+    if qty is None or price is None or total is None or not name:
+        return row.flat
+    return f"{name} {qty} {price} {total}"
+
+
+def apply_template(
+    template: MerchantTemplate,
+    boxes: OCRBoxes,
+    categorize: Callable[[str], str] = lambda name: "Others",
+) -> tuple[dict | None, str]:
+    lines = [line for line in (_render_row(row, template.columns) for row in _rows(boxes)) if line]
+    date_pattern = re.compile(template.date_pattern) if template.date_pattern else None
+    total_line = template.total_line()
+    if total_line is None:
+        return parse_layout(lines, template.merchant, categorize, date_pattern)
+    return parse_layout(lines, template.merchant, categorize, date_pattern, total_line)
+
+
+# ── Store ──────────────────────────────────────────────────────────────────────
+class TemplateStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS merchant_templates ("
+            "merchant TEXT PRIMARY KEY, template TEXT NOT NULL, "
+            "samples INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._templates = {
+            merchant: MerchantTemplate(**json.loads(payload))
+            for merchant, payload in self._conn.execute("SELECT merchant, template FROM merchant_templates")
+        }
+        logger.info(f"Merchant templates: {len(self._templates)} loaded from {path}")
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def learn(self, receipt_data: dict, boxes: OCRBoxes) -> None:
+        observation = observe(receipt_data, OCRBoxes.coerce(boxes))
+        if observation is None:
+            return
+        with self._lock:
+            template = self._templates.setdefault(observation.merchant, MerchantTemplate(observation.merchant))
+            template.merge(observation)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO merchant_templates (merchant, template, samples, updated_at) VALUES (?, ?, ?, ?)",
+                (template.merchant, json.dumps(asdict(template), ensure_ascii=False), template.samples, time.time()),
+            )
+        logger.info(f"Merchant template '{template.merchant}' updated ({template.samples} verified receipts)")
+
+    def match(self, boxes: OCRBoxes) -> MerchantTemplate | None:
+        """
+        Template whose header landmarks best cover the first boxes, if good
+        enough, identified by name or a distinctive landmark, and clearly
+        ahead of the runner-up.
+        """
+        if not self._templates or not boxes:
+            return None
+        header = _edge_texts(boxes, TEMPLATE_HEADER_BOXES)
+        tokens = set(_tokens(header))
+        header_text = normalize_merchant(" ".join(header))
+        candidates = [
+            t for t in self._templates.values()
+            if t.samples >= TEMPLATE_MIN_SAMPLES and len(t.landmarks()) >= 2
+        ]
+
+        scored = []
+        for template in candidates:
+            landmarks = template.landmarks()
+            scored.append((len(landmarks & tokens) / len(landmarks), template))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        if not scored or scored[0][0] < TEMPLATE_MATCH_THRESHOLD:
+            return None
+        score, best = scored[0]
+        if len(scored) > 1 and score - scored[1][0] < TEMPLATE_MATCH_MARGIN:
+            return None
+
+        if best.merchant in header_text:
+            return best
+        shared = set().union(*(t.identity() for t in candidates if t is not best))
+        if (best.identity() - shared) & tokens:
+            return best
+        return None
+
+def build_template_store() -> TemplateStore | None:
+    if not MERCHANT_TEMPLATES:
+        return None
+    try:
+        return TemplateStore(MERCHANT_TEMPLATES_PATH)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Merchant templates disabled — cannot open {MERCHANT_TEMPLATES_PATH}: {e}")
+        return None
+
+
+template_store = build_template_store()
@@ -0,0 +1,218 @@
+"""
+Array-backed storage for OCR boxes.
+
+A receipt produces a few hundred boxes and every stage after RapidOCR
+(scaling, tile merge, line grouping, LLM input, confidence matching) works
+on whole columns of them. OCRBoxes keeps them as:
+
+    coords       float64 (N, 4)  — x, y, width, height
+    confidences  float64 (N,)
+    texts        list[str]
+
+Iterating yields OCRBox views (two slots: owner + index) that read and
+write straight through to the arrays — no per-box dataclass or dict copies.
+"""
+from typing import Iterable, Iterator
+
+import numpy as np
+
+_X, _Y, _W, _H = range(4)
+
+
+class OCRBox:
+    """Lightweight view of one row of an OCRBoxes collection."""
+    __slots__ = ("_boxes", "_index")
+
+    def __init__(self, boxes: "OCRBoxes", index: int):
+        self._boxes = boxes
+        self._index = index
+
+    @property
+    def text(self) -> str:
+        return self._boxes.texts[self._index]
+
+    @property
+    def confidence(self) -> float:
+        return float(self._boxes.confidences[self._index])
+
+    def _coord(self, column: int) -> float:
+        return float(self._boxes.coords[self._index, column])
+
+    def _set_coord(self, column: int, value: float) -> None:
+        self._boxes.coords[self._index, column] = value
+
+    x = property(lambda self: self._coord(_X), lambda self, v: self._set_coord(_X, v))
+    y = property(lambda self: self._coord(_Y), lambda self, v: self._set_coord(_Y, v))
+    width = property(lambda self: self._coord(_W), lambda self, v: self._set_coord(_W, v))
+    height = property(lambda self: self._coord(_H), lambda self, v: self._set_coord(_H, v))
+
+    def to_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "confidence": self.confidence,
+            "x": self.x,
+            "y": self.y,
+            "width": self.width,
+            "height": self.height,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"OCRBox(text={self.text!r}, confidence={self.confidence:.3f}, "
+            f"x={self.x:.0f}, y={self.y:.0f}, width={self.width:.0f}, height={self.height:.0f})"
+        )
+
+
+class OCRBoxes:
+    __slots__ = ("coords", "confidences", "texts")
+
+    def __init__(self, coords: np.ndarray, confidences: np.ndarray, texts: list[str]):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+        self.texts = list(texts)
+        if not (len(self.coords) == len(self.confidences) == len(self.texts)):
+            raise ValueError(
+                f"OCRBoxes length mismatch: {len(self.coords)} coords, "
+                f"{len(self.confidences)} confidences, {len(self.texts)} texts"
+            )
+
+    # ── Construction ───────────────────────────────────────────────────────────
+    @classmethod
+    def empty(cls) -> "OCRBoxes":
+        return cls(np.empty((0, 4)), np.empty(0), [])
+
+    @classmethod
+    def from_quads(cls, quads, texts: Iterable[str], scores: Iterable[float]) -> "OCRBoxes":
+        """
+        Axis-aligned boxes from RapidOCR's (N, 4, 2) corner array, one
+        min/max reduction for the whole batch, sorted top→bottom, left→right.
+        """
+        quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+        mins = quads.min(axis=1)
+        maxs = quads.max(axis=1)
+        coords = np.concatenate([mins, maxs - mins], axis=1)
+        boxes = cls(coords, np.fromiter(scores, dtype=np.float64), list(texts))
+        return boxes.sorted()
+
+    @classmethod
+    def from_records(cls, records: Iterable) -> "OCRBoxes":
+        """From dicts (text/confidence/x/y/width/height keys) or box-like objects."""
+        records = list(records)
+        coords = np.zeros((len(records), 4))
+        confidences = np.zeros(len(records))
+        texts = []
+        for i, r in enumerate(records):
+            if isinstance(r, dict):
+                coords[i] = (r["x"], r["y"], r.get("width", 0), r.get("height", 0))
+                confidences[i] = r.get("confidence", 0)
+                texts.append(r["text"])
+            else:
+                coords[i] = (r.x, r.y, r.width, r.height)
+                confidences[i] = r.confidence
+                texts.append(r.text)
+        return cls(coords, confidences, texts)
+
+    @classmethod
+    def coerce(cls, boxes) -> "OCRBoxes":
+        """Pass OCRBoxes through untouched; build one from anything else (None → empty)."""
+        if isinstance(boxes, OCRBoxes):
+            return boxes
+        if not boxes:
+            return cls.empty()
+        return cls.from_records(boxes)
+
+    @classmethod
+    def concat(cls, parts: Iterable["OCRBoxes"]) -> "OCRBoxes":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        return cls(
+            np.concatenate([p.coords for p in parts]),
+            np.concatenate([p.confidences for p in parts]),
+            [t for p in parts for t in p.texts],
+        )
+
+    # ── Serialisation (columnar, JSON-friendly) ────────────────────────────────
+    def to_dict(self) -> dict:
+        return {
+            "texts": self.texts,
+            "confidences": self.confidences.tolist(),
+            "coords": self.coords.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "OCRBoxes":
+        if isinstance(data, list):  # older list-of-dicts entries
+            return cls.from_records(data)
+        return cls(data["coords"], data["confidences"], data["texts"])
+
+    def to_records(self) -> list[dict]:
+        return [box.to_dict() for box in self]
+
+    # ── Column views ───────────────────────────────────────────────────────────
+    @property
+    def x(self) -> np.ndarray:
+        return self.coords[:, _X]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.coords[:, _Y]
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.coords[:, _W]
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.coords[:, _H]
+
+    # ── Sequence protocol ──────────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self) -> Iterator[OCRBox]:
+        return (OCRBox(self, i) for i in range(len(self.texts)))
+
+    def __getitem__(self, key):
+        """Int → OCRBox view; slice / index array / boolean mask → OCRBoxes subset."""
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(key)
+            return OCRBox(self, int(key))
+        if isinstance(key, slice):
+            return OCRBoxes(self.coords[key], self.confidences[key], self.texts[key])
+        idx = np.asarray(key)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        return OCRBoxes(self.coords[idx], self.confidences[idx], [self.texts[i] for i in idx.tolist()])
+
+    def __repr__(self) -> str:
+        preview = ", ".join(repr(t) for t in self.texts[:5])
+        more = f", … +{len(self) - 5}" if len(self) > 5 else ""
+        return f"OCRBoxes(n={len(self)}: {preview}{more})"
+
+    # ── Operations ─────────────────────────────────────────────────────────────
+    def sorted(self) -> "OCRBoxes":
+        """Top→bottom, then left→right (same key as the old (b.y, b.x) sort)."""
+        if len(self) < 2:
+            return self
+        return self[np.lexsort((self.x, self.y))]
+
+    def scale(self, factor: float) -> "OCRBoxes":
+        """Multiply geometry in place (e.g. working resolution → original)."""
+        if factor != 1.0:
+            self.coords *= factor
+        return self
+
+    def shift(self, dx: float = 0.0, dy: float = 0.0) -> "OCRBoxes":
+        """Translate in place (e.g. tile coordinates → full-image coordinates)."""
+        if dx:
+            self.coords[:, _X] += dx
+        if dy:
+            self.coords[:, _Y] += dy
+        return self
+
+    def mean_confidence(self) -> float:
+        return float(self.confidences.mean()) if len(self) else 0.0
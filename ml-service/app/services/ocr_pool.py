@@ -0,0 +1,456 @@
+import os
+import asyncio
+import logging
+import multiprocessing as mp
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+from app.services.core_sharding import CoreSharder, ShardPlan
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+# thread: cheap, but a timed-out job can't be stopped (see _ThreadWorker); process: real kills
+OCR_POOL_MODE = os.getenv("OCR_POOL_MODE", "thread")            # thread | process
+# Each worker holds its own ONNX sessions (~100MB+), so default to at most 4
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "0")) or min(os.cpu_count() or 1, 4)
+OCR_POOL_QUEUE_SIZE = int(os.getenv("OCR_POOL_QUEUE_SIZE", "32"))
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "90"))
+OCR_WORKER_MAX_JOBS = int(os.getenv("OCR_WORKER_MAX_JOBS", "200"))
+OCR_RESPAWN_ATTEMPTS = int(os.getenv("OCR_RESPAWN_ATTEMPTS", "5"))
+OCR_RESPAWN_BACKOFF = float(os.getenv("OCR_RESPAWN_BACKOFF", "1.0"))   # seconds, doubled per failed attempt
+# How long a replacement waits for a timed-out thread to return before starting anyway (0 = 2× job timeout)
+OCR_RUNAWAY_GRACE = float(os.getenv("OCR_RUNAWAY_GRACE", "0"))
+_RESPAWN_BACKOFF_MAX = 30.0
+
+
+class OCRPoolBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full (backpressure)."""
+
+
+class OCRPoolUnavailable(OCRPoolBusy):
+    """Raised when no worker is alive and no replacement could be started."""
+
+
+class OCRJobTimeout(TimeoutError):
+    """Raised when a job exceeds its timeout; the worker running it is replaced."""
+
+
+# ── Workers ────────────────────────────────────────────────────────────────────
+class _ThreadWorker:
+    """
+    One dedicated thread with its own engine (engines are thread-local).
+
+    Limitation: a thread cannot be killed. A timed-out job is abandoned and
+    keeps its cores busy until it returns on its own; the caller gets
+    OCRJobTimeout right away, but the pool holds the worker's core slot and
+    starts its replacement only once the runaway job has finished (or after
+    the pool's runaway grace period). Use process mode where a runaway job
+    must really stop.
+    """
+    kind = "thread"
+
+    def __init__(self, worker_id: int, initializer: Callable | None, init_args: tuple = ()):
+        self.worker_id = worker_id
+        self.jobs_done = 0
+        self.plan: ShardPlan | None = None
+        self.slot = 0
+        self._initializer = initializer
+        self._init_args = init_args
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ocr-worker-{worker_id}")
+        self._job: Future | None = None
+
+    async def start(self) -> None:
+        if self._initializer is not None:
+            await asyncio.wrap_future(self._executor.submit(self._initializer, *self._init_args))
+
+    async def run(self, fn: Callable, args: tuple, timeout: float) -> Any:
+        self._job = self._executor.submit(fn, *args)
+        return await asyncio.wait_for(asyncio.wrap_future(self._job), timeout)
+
+    async def kill(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def stopped(self, timeout: float | None) -> bool:
+        """Wait for the last job to return; False if it is still running after `timeout`."""
+        if self._job is None or self._job.done():
+            return True
+        done, _ = await asyncio.to_thread(wait, [self._job], timeout)
+        return bool(done)
+
+    def on_stopped(self, callback: Callable[[], None]) -> None:
+        """Call `callback` (from the worker thread) once the last job has returned."""
+        if self._job is None:
+            callback()
+        else:
+            self._job.add_done_callback(lambda _: callback())
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def _process_worker_main(conn, initializer: Callable | None, init_args: tuple = ()) -> None:
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        if initializer is not None:
+            initializer(*init_args)
+        conn.send(("ready", None))
+    except Exception as e:
+        conn.send(("error", e))
+        return
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args = job
+        try:
+            conn.send(("ok", fn(*args)))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                # Exception itself not picklable — ship its message instead
+                conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _ProcessWorker:
+    """
+    One spawned process with its own engine / ONNX session. Timeouts and
+    cancellation terminate the process, so a runaway job really stops.
+    """
+    kind = "process"
+
+    def __init__(self, worker_id: int, initializer: Callable | None, init_args: tuple = ()):
+        self.worker_id = worker_id
+        self.jobs_done = 0
+        self.plan: ShardPlan | None = None
+        self.slot = 0
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_process_worker_main,
+            args=(child_conn, initializer, init_args),
+            name=f"ocr-worker-{worker_id}",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+    def _recv(self, timeout: float | None):
+        if not self._conn.poll(timeout):
+            raise OCRJobTimeout(f"OCR worker {self.worker_id} timed out after {timeout}s")
+        status, payload = self._conn.recv()
+        if status == "error":
+            raise payload
+        return payload
+
+    async def start(self) -> None:
+        # Model load can be slow on first boot — wait without a job timeout
+        await asyncio.to_thread(self._recv, None)
+
+    def _call(self, fn: Callable, args: tuple, timeout: float):
+        # Pickling the job (a whole image) and the pipe write stay off the event loop
+        self._conn.send((fn, args))
+        return self._recv(timeout)
+
+    async def run(self, fn: Callable, args: tuple, timeout: float) -> Any:
+        return await asyncio.to_thread(self._call, fn, args, timeout)
+
+    async def kill(self) -> None:
+        if self._process.is_alive():
+            self._process.kill()
+        await asyncio.to_thread(self._process.join, 5)
+        self._conn.close()
+
+    async def stopped(self, timeout: float | None) -> bool:
+        await asyncio.to_thread(self._process.join, timeout)
+        return not self._process.is_alive()
+
+    def on_stopped(self, callback: Callable[[], None]) -> None:
+        # Only reached if the process outlived kill() + join — its cores are as good as free
+        callback()
+
+    async def close(self) -> None:
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        await asyncio.to_thread(self._process.join, 10)
+        if self._process.is_alive():
+            self._process.kill()
+        self._conn.close()
+
+
+# ── Pool ───────────────────────────────────────────────────────────────────────
+class OCRWorkerPool:
+    """
+    Fixed-size pool of OCR workers, each with its own warmed engine.
+
+    - `size` workers, thread- or process-based (`mode`)
+    - at most `queue_size` jobs wait for a free worker; beyond that
+      `run()` raises OCRPoolBusy immediately instead of piling up
+    - per-job timeout; process workers are killed and respawned on timeout,
+      thread workers can't be killed — their replacement waits for the
+      runaway job to return (at most `runaway_grace`), so repeated
+      timeouts don't pile extra engines onto busy cores
+    - a failed respawn is retried with backoff; once no worker is left and
+      none can be started, waiting and new jobs get OCRPoolUnavailable
+    - each worker is recycled after `max_jobs` jobs to contain memory growth
+    - with a `sharder`, each worker's engine gets a core budget
+      (`initializer(threads, cpus)`) sized to observed concurrency; workers
+      whose budget is out of date are recycled when they next go idle
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        size: int = 1,
+        queue_size: int = 32,
+        job_timeout: float = 90.0,
+        max_jobs: int = 200,
+        initializer: Callable | None = None,
+        sharder: CoreSharder | None = None,
+        runaway_grace: float | None = None,
+    ):
+        if mode not in {"thread", "process"}:
+            raise ValueError(f"Unknown OCR pool mode: {mode}")
+        self.mode = mode
+        self.size = max(1, size)
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.max_jobs = max_jobs
+        self.initializer = initializer
+        self.sharder = sharder
+        self.runaway_grace = runaway_grace or 2 * job_timeout
+
+        self._idle: asyncio.Queue | None = None
+        self._waiting = 0
+        self._next_id = 0
+        self._workers: set = set()
+        self._slots: set[int] = set()   # core-slice slots held by live/starting workers
+        self._replacements: set[asyncio.Task] = set()
+        self._respawning = 0
+        self._start_lock: asyncio.Lock | None = None
+        self._started = False
+
+    @classmethod
+    def from_env(cls, initializer: Callable | None = None) -> "OCRWorkerPool":
+        return cls(
+            mode=OCR_POOL_MODE,
+            size=OCR_POOL_SIZE,
+            queue_size=OCR_POOL_QUEUE_SIZE,
+            job_timeout=OCR_JOB_TIMEOUT,
+            max_jobs=OCR_WORKER_MAX_JOBS,
+            initializer=initializer,
+            sharder=CoreSharder.from_env(max_sessions=OCR_POOL_SIZE),
+            runaway_grace=OCR_RUNAWAY_GRACE or None,
+        )
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def idle(self) -> int:
+        """Workers free to take a job right now."""
+        if self._idle is None or not self._workers:
+            return 0
+        return self._idle.qsize()
+
+    @property
+    def alive(self) -> int:
+        """Workers up (busy or idle); below `size` while replacements are starting."""
+        return len(self._workers)
+
+    def _take_slot(self) -> int:
+        slot = next(i for i in range(len(self._slots) + 1) if i not in self._slots)
+        self._slots.add(slot)
+        return slot
+
+    def _new_worker(self):
+        self._next_id += 1
+        worker_cls = _ProcessWorker if self.mode == "process" else _ThreadWorker
+        if self.sharder is None:
+            return worker_cls(self._next_id, self.initializer)
+
+        plan = self.sharder.plan
+        slot = self._take_slot()
+        worker = worker_cls(self._next_id, self.initializer, self.sharder.worker_init_args(plan, slot))
+        worker.plan = plan
+        worker.slot = slot
+        return worker
+
+    async def _spawn(self) -> None:
+        worker = self._new_worker()
+        try:
+            await worker.start()
+        except Exception as e:
+            logger.error(f"OCR worker {worker.worker_id} failed to start: {e}")
+            await worker.kill()
+            self._slots.discard(worker.slot)
+            raise
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    async def start(self) -> None:
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            self._idle = asyncio.Queue()
+            started = time.perf_counter()
+            await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+            self._started = True
+            logger.info(
+                f"OCR pool ready: {self.size} {self.mode} workers warmed "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+
+    def _background(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+
+    def _replace(self, worker) -> None:
+        """Retire `worker` and spawn its replacement in the background."""
+        self._workers.discard(worker)
+        self._respawning += 1
+        self._background(self._respawn(worker))
+
+    async def _retire(self, worker) -> None:
+        """Release `worker`'s core slot once it has really stopped running."""
+        if await worker.stopped(self.runaway_grace):
+            self._slots.discard(worker.slot)
+            return
+        logger.error(
+            f"OCR worker {worker.worker_id} still busy {self.runaway_grace:.0f}s after its job was abandoned — "
+            f"starting its replacement anyway; cores are oversubscribed until it returns"
+        )
+        loop = asyncio.get_running_loop()
+
+        def release() -> None:
+            try:
+                loop.call_soon_threadsafe(self._slots.discard, worker.slot)
+            except RuntimeError:
+                pass        # loop already closed
+
+        # The slot stays taken meanwhile, so the replacement gets its own core slice
+        worker.on_stopped(release)
+
+    async def _respawn(self, retired=None) -> None:
+        delay = OCR_RESPAWN_BACKOFF
+        try:
+            if retired is not None:
+                await self._retire(retired)
+            for attempt in range(1, OCR_RESPAWN_ATTEMPTS + 1):
+                try:
+                    await self._spawn()
+                    return
+                except Exception:
+                    if attempt == OCR_RESPAWN_ATTEMPTS:
+                        logger.error(
+                            f"Giving up on OCR worker replacement after {attempt} attempts — "
+                            f"{self.alive}/{self.size} workers alive"
+                        )
+                        return
+                    logger.warning(f"Retrying OCR worker replacement in {delay:g}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, _RESPAWN_BACKOFF_MAX)
+        finally:
+            self._respawning -= 1
+            if self._dead():
+                # Nobody will ever put a worker on the queue — wake the waiters up
+                for _ in range(self._waiting):
+                    self._idle.put_nowait(None)
+
+    def _dead(self) -> bool:
+        return self._started and not self._workers and not self._respawning
+
+    async def run(self, fn: Callable, *args, timeout: float | None = None) -> Any:
+        """
+        Run `fn(*args)` on a free worker. `fn` must be a module-level function
+        (it is pickled by reference in process mode).
+        """
+        if not self._started:
+            await self.start()
+
+        if self._dead():
+            # Try again in the background so the pool can recover for later jobs
+            self._respawning += 1
+            self._background(self._respawn())
+            raise OCRPoolUnavailable("No OCR worker is alive")
+        if self._idle.empty() and self._waiting >= self.queue_size:
+            raise OCRPoolBusy(f"OCR pool saturated ({self._waiting} jobs waiting)")
+
+        if self.sharder is not None:
+            self.sharder.job_started()
+        try:
+            return await self._run_on_worker(fn, args, timeout)
+        finally:
+            if self.sharder is not None:
+                self.sharder.job_finished()
+
+    async def _run_on_worker(self, fn: Callable, args: tuple, timeout: float | None) -> Any:
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+            while worker is None and not self._dead():
+                worker = await self._idle.get()     # stale wake-up from an earlier outage
+        finally:
+            self._waiting -= 1
+        if worker is None:
+            raise OCRPoolUnavailable("No OCR worker is alive")
+
+        timeout = timeout or self.job_timeout
+        try:
+            result = await worker.run(fn, args, timeout)
+        except (asyncio.TimeoutError, OCRJobTimeout, asyncio.CancelledError) as e:
+            # Timed out or the caller gave up — stop the job for real
+            logger.warning(f"OCR worker {worker.worker_id} ({worker.kind}) killed: {type(e).__name__}")
+            self._background(worker.kill())
+            self._replace(worker)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise OCRJobTimeout(f"OCR job exceeded {timeout}s") from e
+        except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+            logger.error(f"OCR worker {worker.worker_id} died: {e}")
+            self._background(worker.kill())
+            self._replace(worker)
+            raise
+        except Exception:
+            # Job raised normally — the worker itself is still healthy
+            self._release(worker)
+            raise
+
+        self._release(worker)
+        return result
+
+    def _release(self, worker) -> None:
+        worker.jobs_done += 1
+        if self.max_jobs and worker.jobs_done >= self.max_jobs:
+            logger.info(f"Recycling OCR worker {worker.worker_id} after {worker.jobs_done} jobs")
+        elif self.sharder is not None and worker.plan != self.sharder.plan:
+            plan = self.sharder.plan
+            logger.info(
+                f"Recycling OCR worker {worker.worker_id} for new core budget "
+                f"({plan.sessions} sessions × {plan.threads} threads)"
+            )
+        else:
+            self._idle.put_nowait(worker)
+            return
+        self._background(worker.close())
+        self._replace(worker)
+
+    async def close(self) -> None:
+        for task in list(self._replacements):
+            task.cancel()
+        await asyncio.gather(*(w.close() for w in list(self._workers)), return_exceptions=True)
+        self._workers.clear()
+        self._slots.clear()
+        self._started = False
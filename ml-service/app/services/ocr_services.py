@@ -3,47 +3,168 @@ import numpy as np
 from rapidocr import RapidOCR
 import asyncio
 import logging
+import threading
+import time
 from dataclasses import dataclass
+from pathlib import Path
+from app.services.debug_artifacts import NULL_DEBUG_SESSION, start_debug_session
+from app.services.binarize import sauvola_binarize, use_thermal_path
+from app.services.core_sharding import pin_current_thread
+from app.services.engine_profiles import OCR_ENGINE_THREADS, EngineProfile, get_profile
+from app.services.image_analysis import ImageAnalysis
+from app.services.ocr_boxes import OCRBox, OCRBoxes
+from app.services.ocr_pool import OCRPoolBusy, OCRWorkerPool
+from app.services.orientation import OCR_ORIENTATION, detect_page_rotation, rotate_page
+from app.services.preprocess_model import preprocess_model
+from app.services.rerecognition import rerecognize_low_confidence
+from app.services.resolution import OCR_TARGET_TEXT_HEIGHT, normalize_resolution
+from app.services.skew import estimate_skew_angle
+from app.services.tiling import merge_tile_boxes, needs_tiling, plan_tiles
+from app.services.variant_race import (
+    OCR_VARIANT_RACE,
+    VARIANTS,
+    VariantScore,
+    is_decisive,
+    pick_winner,
+    record_outcome,
+    score_variant,
+)
+from app.services.line_grouping import (
+    box_arrays,
+    column_gap_threshold,
+    overlap_tolerance,
+    reconstruct_lines_by_overlap,
+)
 
 logger = logging.getLogger(__name__)
-engine = RapidOCR(config_path="default_rapidocr.yaml")
 
-@dataclass
-class OCRBox:
-    text: str
-    confidence: float
-    x: float
-    y: float
-    width: float
-    height: float
+RAPIDOCR_CONFIG_PATH = "default_rapidocr.yaml"
+
+# One engine per worker thread/process — ONNX sessions are not shared
+# between concurrent OCR jobs. Built lazily so importing this module in a
+# pool worker (or the bot process) doesn't load models until needed.
+_engine_local = threading.local()
+
+
+def build_engine(profile: EngineProfile | None = None) -> RapidOCR:
+    """RapidOCR from default_rapidocr.yaml plus the engine profile's overrides (OCR_ENGINE_PROFILE)."""
+    profile = profile or get_profile()
+    logger.info(f"Loading RapidOCR engine profile {profile.name!r} ({profile.backend})")
+    return RapidOCR(config_path=RAPIDOCR_CONFIG_PATH, params=profile.to_params())
+
+
+def get_engine() -> RapidOCR:
+    engine = getattr(_engine_local, "engine", None)
+    if engine is None:
+        engine = build_engine()
+        _engine_local.engine = engine
+    return engine
+
+
+def warm_engine(threads: int = 0, cpus: list[int] | None = None) -> None:
+    """
+    Load this worker's engine and run one tiny inference to warm the session.
+
+    `threads` / `cpus` are the worker's core budget from the pool's
+    CoreSharder (intra-op threads, cores to pin to); an explicit
+    OCR_ENGINE_THREADS always wins over the sharded thread count.
+    """
+    if cpus:
+        pin_current_thread(cpus)
+    if threads and not OCR_ENGINE_THREADS:
+        _engine_local.engine = build_engine(get_profile(threads=threads))
+    blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+    cv2.putText(blank, "WARMUP 123", (8, 44), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    get_engine()(blank)
+
+
+_ocr_pool: OCRWorkerPool | None = None
+
+
+def get_ocr_pool() -> OCRWorkerPool:
+    """Process-wide OCR worker pool, configured from OCR_POOL_* env vars."""
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = OCRWorkerPool.from_env(initializer=warm_engine)
+    return _ocr_pool
 
 @dataclass
 class OCRResult:
-    boxes: list[OCRBox]
+    boxes: OCRBoxes
     raw_text: str
     quality_issues: list[str] | None = None
-
-    def has_field_candidate(self, min_confidence: float = 0.0) -> list[OCRBox]:
-        return [b for b in self.boxes if b.confidence >= min_confidence]
+    timings: dict[str, float] | None = None   # per-stage seconds, for logs/benchmarks
+    quality: dict[str, float] | None = None   # blur/brightness/contrast metrics of the input
+
+    def has_field_candidate(self, min_confidence: float = 0.0) -> OCRBoxes:
+        return self.boxes[self.boxes.confidences >= min_confidence]
+
+    def to_dict(self) -> dict:
+        """JSON-friendly form (used by the receipt cache)."""
+        return {
+            "boxes": self.boxes.to_dict(),
+            "raw_text": self.raw_text,
+            "quality_issues": self.quality_issues,
+            "timings": self.timings,
+            "quality": self.quality,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "OCRResult":
+        return cls(
+            boxes=OCRBoxes.from_dict(data.get("boxes", [])),
+            raw_text=data.get("raw_text", ""),
+            quality_issues=data.get("quality_issues"),
+            timings=data.get("timings"),
+            quality=data.get("quality"),
+        )
     
 
-def correct_perspective(img):
+ImageSource = str | Path | bytes | bytearray | memoryview | np.ndarray
+
+
+def load_image(source: ImageSource) -> np.ndarray | None:
+    """
+    Decode an image from a file path, raw encoded bytes (JPEG/PNG straight
+    from the Telegram download) or an already-decoded NumPy array.
+    Returns a BGR array, or None kalau gambar gak bisa dibaca.
+    """
+    if isinstance(source, np.ndarray):
+        if source.ndim == 2:
+            return cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+        if source.ndim == 3 and source.shape[2] == 4:
+            return cv2.cvtColor(source, cv2.COLOR_BGRA2BGR)
+        return source
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(source, dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    return cv2.imread(str(source))
+
+
+def describe_source(source: ImageSource) -> str:
+    """Short label for log lines — never dump the whole buffer."""
+    if isinstance(source, np.ndarray):
+        return f"<array {source.shape}>"
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<{len(source)} bytes>"
+    return str(source)
+
+
+def correct_perspective(img, analysis: ImageAnalysis | None = None):
     """
     Detect dan koreksi struk yang melengkung/miring.
+    Pass `analysis` to reuse gray/blur/edges/contours computed by earlier stages.
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    edged = cv2.Canny(blurred, 50, 150)
-    
-    contours, _ = cv2.findContours(
-        edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-    )
-    
-    if not contours:
+    analysis = ImageAnalysis.of(img, analysis)
+    largest = analysis.largest_edge_contour
+
+    if largest is None:
         return img
     
-    largest = max(contours, key=cv2.contourArea)
-    
     # Approximate polygon
     peri = cv2.arcLength(largest, True)
     approx = cv2.approxPolyDP(largest, 0.02 * peri, True)
@@ -122,48 +243,26 @@ def order_points(pts):
     
     return rect
 
-def get_receipt_area_ratio(img) -> float:
+def get_receipt_area_ratio(img, analysis: ImageAnalysis | None = None) -> float:
     """
     Hitung rasio area struk vs total foto.
     Return float 0.0 - 1.0
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Blur dulu buat reduce noise
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    
-    # Threshold — pisahin struk putih dari background gelap
-    _, thresh = cv2.threshold(blurred, 127, 255, cv2.THRESH_BINARY)
-    
-    # Find contours
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    if not contours:
-        return 0.0
-    
-    # Ambil contour terbesar — harusnya struk
-    largest = max(contours, key=cv2.contourArea)
-    receipt_area = cv2.contourArea(largest)
-    
-    # Total area foto
-    total_area = img.shape[0] * img.shape[1]
-    
-    ratio = receipt_area / total_area
+    ratio = ImageAnalysis.of(img, analysis).receipt_ratio
     print(f"ratio: {ratio}")
     return ratio
 
-def assess_image_quality(img) -> dict:
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite("assessImage.jpg", gray)
-    print(f"gray: {gray}")
-    
-    blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+def assess_image_quality(img, debug=NULL_DEBUG_SESSION, analysis: ImageAnalysis | None = None) -> dict:
+    analysis = ImageAnalysis.of(img, analysis)
+    debug.save("assess_gray", analysis.gray)
+
+    blur_score = analysis.blur_score
     print(f"blur_score: {blur_score}")
-    brightness = np.mean(gray)
+    brightness = analysis.brightness
     print(f"brightness: {brightness}")
-    contrast = np.std(gray)
+    contrast = analysis.contrast
     print(f"contrast: {contrast}")
-    receipt_ratio = get_receipt_area_ratio(img)
+    receipt_ratio = get_receipt_area_ratio(img, analysis)
     print(f"receipt ratio: {receipt_ratio}")
     
     issues = []
@@ -199,64 +298,48 @@ def check_and_fix_inversion(gray: np.ndarray) -> np.ndarray:
 
 def deskew(image: np.ndarray) -> np.ndarray:
     """Straighten tilted receipt"""
-    inverted = cv2.bitwise_not(image)
-    coords = np.column_stack(np.where(inverted > 0))
-
-    if len(coords) == 0:
-        return image
+    return deskew_with_matrix(image)[0]
 
-    angle = cv2.minAreaRect(coords)[-1]
-
-    if angle < -45:
-        angle = -(90 + angle)
-    else:
-        angle = -angle
+def deskew_with_matrix(image: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    deskew() that also returns the 2x3 rotation applied (None = left as is).
+    The angle comes from a projection-profile search on a downsampled
+    binary copy (see skew); only the final rotation touches full resolution.
+    """
+    angle = estimate_skew_angle(image)
 
     if abs(angle) < 0.5:
-        return image
+        return image, None
 
     (h, w) = image.shape[:2]
     center = (w // 2, h // 2)
     M = cv2.getRotationMatrix2D(center, angle, 1.0)
 
-    return cv2.warpAffine(
+    rotated = cv2.warpAffine(
         image, M, (w, h),
         flags=cv2.INTER_CUBIC,
         borderMode=cv2.BORDER_REPLICATE
     )
+    return rotated, M
 
 
-def crop_receipt(img):
+def find_receipt_bbox(img, analysis: ImageAnalysis | None = None) -> tuple[int, int, int, int] | None:
     """
-    Crop struk dari background.
-    Return cropped image, atau original kalau crop gagal.
+    Bounding box (x, y, w, h) struk dengan padding, atau None kalau
+    contour terbesar gak meyakinkan.
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    
-    # Threshold — struk putih vs background gelap
-    _, thresh = cv2.threshold(blurred, 127, 255, cv2.THRESH_BINARY)
-    
-    # Find contours
-    contours, _ = cv2.findContours(
-        thresh, 
-        cv2.RETR_EXTERNAL, 
-        cv2.CHAIN_APPROX_SIMPLE
-    )
-    
-    if not contours:
+    analysis = ImageAnalysis.of(img, analysis)
+    largest = analysis.largest_threshold_contour
+
+    if largest is None:
         logger.warning("No contours found — skipping crop")
-        return img
-    
-    # Ambil contour terbesar
-    largest = max(contours, key=cv2.contourArea)
-    
+        return None
+
     # Validasi — contour harus cukup besar (min 20% frame)
-    total_area = img.shape[0] * img.shape[1]
-    if cv2.contourArea(largest) < total_area * 0.2:
+    if cv2.contourArea(largest) < analysis.area * 0.2:
         logger.warning("Largest contour too small — skipping crop")
-        return img  # fallback ke original
-    
+        return None
+
     # Bounding box dengan padding
     x, y, w, h = cv2.boundingRect(largest)
     pad = 20
@@ -264,14 +347,25 @@ def crop_receipt(img):
     y = max(0, y - pad)
     w = min(img.shape[1] - x, w + 2 * pad)
     h = min(img.shape[0] - y, h + 2 * pad)
-    
+    return x, y, w, h
+
+
+def crop_receipt(img, analysis: ImageAnalysis | None = None):
+    """
+    Crop struk dari background.
+    Return cropped image, atau original kalau crop gagal.
+    """
+    bbox = find_receipt_bbox(img, analysis)
+    if bbox is None:
+        return img  # fallback ke original
+
+    x, y, w, h = bbox
     cropped = img[y:y+h, x:x+w]
     logger.info(f"Cropped receipt: {w}x{h} from {img.shape[1]}x{img.shape[0]}")
 
-    
     return cropped
 
-def _parse_ocr_result(result) -> list[OCRBox]:
+def _parse_ocr_result(result) -> OCRBoxes:
     """
     RapidOCR 3.6.0 returns RapidOCROutput dataclass.
     Access via result.boxes, result.txts, result.scores — NOT iterable directly.
@@ -281,29 +375,14 @@ def _parse_ocr_result(result) -> list[OCRBox]:
     result.scores → Tuple[float]               — confidence per box
     """
     if result is None:
-        return []
+        return OCRBoxes.empty()
 
     # Guard: if no boxes detected at all
     if result.boxes is None or result.txts is None or result.scores is None:
-        return []
-
-    boxes = []
-    for box, text, score in zip(result.boxes, result.txts, result.scores):
-        # box shape: [[x1,y1],[x2,y2],[x3,y3],[x4,y4]]
-        xs = [pt[0] for pt in box]
-        ys = [pt[1] for pt in box]
-
-        boxes.append(OCRBox(
-            text=text,
-            confidence=float(score),
-            x=float(min(xs)),
-            y=float(min(ys)),
-            width=float(max(xs) - min(xs)),
-            height=float(max(ys) - min(ys)),
-        ))
-
-    # Sort top→bottom, left→right
-    boxes.sort(key=lambda b: (b.y, b.x))
+        return OCRBoxes.empty()
+
+    # (N,4,2) corners → x/y/width/height in one min/max pass, sorted top→bottom, left→right
+    boxes = OCRBoxes.from_quads(result.boxes, result.txts, result.scores)
     print(f"boxes: {boxes}")
     return boxes
     
@@ -349,20 +428,10 @@ def _parse_ocr_result(result) -> list[OCRBox]:
 #         logger.error(f"OCR failed for image {image_path}: {e}")
 #         return ""
 
-def get_dynamic_tolerance(boxes: list[dict]) -> int:
-    if len(boxes) < 2:
-        return 15
-    
-    # Estimasi line height dari rata-rata height box
-    heights = [b.height for b in boxes if b.height > 5]
-    if not heights:
-        return 15
-    
-    median_height = sorted(heights)[len(heights) // 2]
-    
-    # Tolerance = 60% dari median line height
-    # Cukup untuk catch misalignment, tapi gak sampai gabung baris berbeda
-    return int(median_height * 0.6)
+def get_dynamic_tolerance(boxes: OCRBoxes) -> int:
+    # Estimasi line height dari median height box — 60% of it
+    _, _, _, heights, _ = box_arrays(boxes)
+    return overlap_tolerance(heights)
 
 def get_column_gap_threshold(line_boxes: list) -> float:
     """
@@ -371,96 +440,45 @@ def get_column_gap_threshold(line_boxes: list) -> float:
     - Small gaps: antar kata dalam kolom yang sama
     - Large gaps: antar kolom berbeda
     """
-    if len(line_boxes) < 3:
-        return 30  # fallback
-
-    gaps = []
-    sorted_line = sorted(line_boxes, key=lambda b: b.x)
-    for i in range(1, len(sorted_line)):
-        prev = sorted_line[i - 1]
-        curr = sorted_line[i]
-        gap = curr.x - (prev.x + prev.width)
-        if gap > 0:
-            gaps.append(gap)
-
-    if not gaps:
-        return 30
-
-    gaps.sort()
-    median_gap = gaps[len(gaps) // 2]
+    x, _, w, _, _ = box_arrays(line_boxes)
+    order = np.argsort(x, kind="stable")
+    return column_gap_threshold(x[order], w[order])
 
-    # Column separator = gap yang > 2x median
-    return median_gap * 2.0
-
-def reconstruct_lines(boxes: list[OCRBox], y_tolerance: int = None) -> str:
+def reconstruct_lines(boxes: OCRBoxes, y_tolerance: int = None) -> str:
     """
     Group OCRBoxes into lines using vertical-overlap detection (not center-Y
     proximity), then insert " | " where there is a large horizontal gap between
     tokens on the same line. This produces the same columnar format that the
     LLM prompt documents (NAME | QTY | PRICE | TOTAL).
+
+    Runs on the shared sweep-line engine in line_grouping; `y_tolerance` is
+    kept for API compatibility — overlap grouping doesn't need it.
     """
-    if y_tolerance is None:
-        y_tolerance = get_dynamic_tolerance(boxes)
+    return reconstruct_lines_by_overlap(boxes)
 
-    if not boxes:
-        return ""
-
-    lines = []
-    used = set()
-    sorted_boxes = sorted(boxes, key=lambda b: b.y)
-
-    for i, box in enumerate(sorted_boxes):
-        if i in used:
-            continue
-
-        line_boxes = [box]
-        used.add(i)
-
-        for j, other in enumerate(sorted_boxes):
-            if j in used:
-                continue
-
-            line_top    = min(b.y for b in line_boxes)
-            line_bottom = max(b.y + b.height for b in line_boxes)
-            other_top    = other.y
-            other_bottom = other.y + other.height
-
-            overlap = min(line_bottom, other_bottom) - max(line_top, other_top)
-            min_height = min(line_bottom - line_top, other_bottom - other_top)
-
-            # Overlap > 30 % of the smaller box = same line
-            if min_height > 0 and overlap / min_height > 0.3:
-                line_boxes.append(other)
-                used.add(j)
-        col_gap_threshold = get_column_gap_threshold(line_boxes)
-        # Sort tokens left → right within the line
-        line_boxes.sort(key=lambda b: b.x)
-
-        parts = []
-        for k, lb in enumerate(line_boxes):
-            if k == 0:
-                parts.append(lb.text)
-                continue
-            prev = line_boxes[k - 1]
-            gap = lb.x - (prev.x + prev.width)
-            # Gap > 40 px = different column → mark with " | "
-            # if gap > 40:
-            #     parts.append(" | " + lb.text)
-            # else:
-            #     parts.append(" " + lb.text)
-            parts.append("  |  " + lb.text if gap > col_gap_threshold else " " + lb.text)
-
-        lines.append("".join(parts))
-
-    return "\n".join(lines)
-
-def should_preprocess(img) -> bool:
+def scale_boxes(boxes: OCRBoxes, factor: float) -> OCRBoxes:
+    """Multiply box geometry by `factor` (e.g. map working-resolution boxes back to original)."""
+    return boxes.scale(factor)
+
+def should_preprocess(img, quality: dict | None = None) -> bool:
     """
     Decide apakah OpenCV preprocessing perlu dijalankan.
     Skip kalau gambar udah bagus.
+    Pass the `quality` dict from assess_image_quality to avoid computing it twice.
+
+    Uses the learned predictor when a model file is present
+    (OCR_PREPROCESS_MODEL, see preprocess_model), else the fixed thresholds.
     """
-    quality = assess_image_quality(img)
-    
+    if quality is None:
+        quality = assess_image_quality(img)
+
+    if preprocess_model is not None:
+        return preprocess_model.predict(quality)
+    return threshold_preprocess_rule(quality)
+
+
+def threshold_preprocess_rule(quality: dict) -> bool:
+    """The original hand-picked rule — fallback when no model is shipped."""
     # Kalau gambar udah bagus, skip preprocessing
     # RapidOCR internal pipeline lebih reliable untuk clean images
     if (quality["blur_score"] > 200 and 
@@ -470,123 +488,421 @@ def should_preprocess(img) -> bool:
     
     return True
 
-async def ocr_image(image_path: str) -> OCRResult:
+class StageTimer:
+    """Collects per-stage wall time (seconds) into a dict for OCRResult.timings."""
+
+    def __init__(self, timings: dict[str, float] | None = None):
+        self.timings = timings if timings is not None else {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+
+@dataclass
+class PreparedImage:
+    """Output of the preprocessing stages — what the engine will run on."""
+    image: np.ndarray
+    box_scale: float                # multiply engine boxes by this → original-ish coords
+    quality_issues: list[str]
+    timings: dict[str, float]
+    # Full-resolution frame (before normalisation/denoise) and the 2x3 affine
+    # mapping engine-box coords into it — used to re-read low-confidence boxes
+    source: np.ndarray | None = None
+    to_source: np.ndarray | None = None
+    quality: dict[str, float] | None = None
+    # Clockwise turn applied to make the page upright (see orient_page);
+    # None = undecided, recognition keeps the per-box angle classifier
+    page_rotation: int | None = None
+
+    @property
+    def use_cls(self) -> bool:
+        return self.page_rotation is None
+
+
+QUALITY_METRICS = ("blur_score", "brightness", "contrast", "receipt_ratio")
+
+
+def prepare_image(
+    image: ImageSource,
+    target_text_height: int = OCR_TARGET_TEXT_HEIGHT,
+    preprocess: bool | None = None,
+    thermal: bool | None = None,
+) -> PreparedImage | None:
     """
-    Returns structured OCRResult with per-box confidence scores.
-    Falls back to empty OCRResult on failure.
+    Stages 1-4 of the pipeline: quality check, then (if needed) perspective →
+    crop → gray → inversion fix → resolution normalisation → denoise → CLAHE →
+    deskew. Returns None when the image can't be decoded.
+
+    `preprocess` forces the raw (False) or preprocessed (True) path instead
+    of letting should_preprocess decide (used by variant racing). Frames
+    that look like thermal paper get Sauvola binarisation instead of
+    denoise + CLAHE (OCR_THERMAL_BINARIZE); `thermal` forces either chain.
+    """
+    timer = StageTimer()
+    img = load_image(image)
+    print(type(img))
+    if img is None:
+        logger.warning(f"Could not read image: {describe_source(image)}")
+        return None
+    debug = start_debug_session()
+    debug.save("original", img)
+
+    # ── Quality assessment (non-blocking) ──────────────────────────────────
+    analysis = ImageAnalysis(img)
+    quality = assess_image_quality(img, debug, analysis)
+    print(f"quality: {quality}")
+    quality_issues = quality["issues"] if not quality["is_acceptable"] else []
+    if quality_issues:
+        logger.warning(f"Image quality issues detected: {quality_issues} — attempting OCR anyway")
+    metrics = {key: float(quality[key]) for key in QUALITY_METRICS}
+    timer.mark("quality")
+
+    if preprocess is None:
+        preprocess = should_preprocess(img, quality)
+    if not preprocess:
+        logger.info("Skipping preprocessing")
+        timer.mark("preprocess")
+        return PreparedImage(
+            img, 1.0, quality_issues, timer.timings,
+            source=img, to_source=_scale_affine(1.0), quality=metrics,
+        )
+
+    logger.info("Applying OpenCV preprocessing")
+    img_corrected = correct_perspective(img, analysis)
+    debug.save("perspective", img_corrected)
+    # Same frame → reuse threshold/contours from the quality check
+    corrected_analysis = analysis.for_image(img_corrected)
+    bbox = find_receipt_bbox(img_corrected, corrected_analysis)
+    if bbox is not None:
+        img_crop = img_corrected[bbox[1]:bbox[1] + bbox[3], bbox[0]:bbox[0] + bbox[2]]
+        crop_analysis = corrected_analysis.crop(*bbox)
+    else:
+        img_crop = img_corrected
+        crop_analysis = corrected_analysis
+    debug.save("cropped_image", img_crop)
+    gray = crop_analysis.gray
+    debug.save("gray", gray)
+    gray = check_and_fix_inversion(gray)
+    debug.save("inversion_fixed", gray)
+    full_res = gray
+    if thermal is None:
+        thermal = use_thermal_path(gray, img_crop)
+    # Shrink to the working resolution before the expensive filters
+    normalized = normalize_resolution(gray, target_text_height)
+    gray = normalized.image
+    debug.save("normalized", gray)
+    if thermal:
+        # Black-on-white thermal slip — a local threshold replaces denoise + CLAHE
+        logger.info("Thermal paper detected — Sauvola binarisation")
+        enhanced = sauvola_binarize(gray, target_text_height or OCR_TARGET_TEXT_HEIGHT)
+        debug.save("binarized", enhanced)
+    else:
+        denoised = cv2.fastNlMeansDenoising(gray, h=15)
+        debug.save("denoised", denoised)
+        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        enhanced = clahe.apply(denoised)
+        debug.save("enhanced", enhanced)
+    deskewed, rotation = deskew_with_matrix(enhanced)
+    debug.save("deskewed", deskewed)
+    timer.mark("preprocess")
+
+    box_scale = 1.0 / normalized.scale
+    # working (deskewed) coords → undo rotation → undo normalisation
+    to_source = _scale_affine(box_scale)
+    if rotation is not None:
+        to_source = cv2.invertAffineTransform(rotation) * box_scale
+    return PreparedImage(
+        deskewed, box_scale, quality_issues, timer.timings,
+        source=full_res, to_source=to_source, quality=metrics,
+    )
+
+
+def _scale_affine(factor: float) -> np.ndarray:
+    return np.array([[factor, 0.0, 0.0], [0.0, factor, 0.0]])
+
+
+def _compose_affine(outer: np.ndarray, inner: np.ndarray) -> np.ndarray:
+    """2x3 affine applying `inner` first, then `outer`."""
+    return outer[:, :2] @ inner + np.hstack([np.zeros((2, 2)), outer[:, 2:]])
+
+
+def orient_page(prepared: PreparedImage, use_cls: bool | None = None) -> PreparedImage:
+    """
+    Stage 4b: settle the page orientation once, so recognition can skip the
+    per-box angle classifier (see orientation). `use_cls=True` keeps the
+    per-box classifier, `False` assumes the page is already upright, None
+    follows OCR_ORIENTATION.
+    """
+    mode = OCR_ORIENTATION if use_cls is None else ("cls" if use_cls else "off")
+    if mode == "cls":
+        return prepared
+    if mode == "off":
+        prepared.page_rotation = 0
+        return prepared
+
+    rotation = detect_page_rotation(prepared.image, get_engine())
+    if rotation is None:
+        return prepared
+    if rotation:
+        logger.info(f"Page is rotated — turning it {rotation}° clockwise before recognition")
+        prepared.image, back = rotate_page(prepared.image, rotation)
+        if prepared.to_source is not None:
+            prepared.to_source = _compose_affine(prepared.to_source, back)
+    prepared.page_rotation = rotation
+    return prepared
+
+
+def recognize_boxes(image: np.ndarray, y_offset: int = 0, use_cls: bool = True) -> OCRBoxes:
+    """
+    Stage 5: RapidOCR detection + recognition on `image` (a full prepared
+    image or one tile of it), boxes shifted down by `y_offset`. Flags are
+    passed on every call — RapidOCR keeps per-call flags on the engine.
+    """
+    output = get_engine()(image, use_det=True, use_cls=use_cls, use_rec=True)
+    return _parse_ocr_result(output).shift(dy=y_offset)
+
+
+def rerecognize_boxes(
+    boxes: OCRBoxes,
+    source: np.ndarray | None,
+    to_source: np.ndarray | None,
+    page_rotation: int | None = 0,
+) -> OCRBoxes:
+    """
+    Stage 5b: re-read low-confidence boxes from full-resolution crops,
+    rec only (see rerecognition). Runs on a pool worker with its engine.
+    """
+    rerecognize_low_confidence(boxes, source, to_source, get_engine(), page_rotation=page_rotation)
+    return boxes
+
+
+def build_ocr_result(
+    boxes: OCRBoxes,
+    prepared: PreparedImage,
+    timer: StageTimer,
+    source_label: str = "",
+) -> OCRResult:
+    """Stage 6: map boxes back to original scale and reconstruct lines."""
+    quality_issues = prepared.quality_issues
+    if not boxes:
+        logger.warning(f"No text detected in: {source_label}")
+        return OCRResult(
+            boxes=OCRBoxes.empty(), raw_text="", quality_issues=quality_issues,
+            timings=timer.timings, quality=prepared.quality,
+        )
+
+    boxes = scale_boxes(boxes, prepared.box_scale)
+    raw_text = reconstruct_lines(boxes)
+    timer.mark("lines")
+    print(raw_text)
+    logger.info(
+        f"OCR complete: {len(boxes)} boxes, "
+        f"avg confidence: {boxes.mean_confidence():.3f}"
+    )
+
+    return OCRResult(
+        boxes=boxes, raw_text=raw_text, quality_issues=quality_issues or None,
+        timings=timer.timings, quality=prepared.quality,
+    )
+
+
+def run_ocr_pipeline(
+    image: ImageSource,
+    target_text_height: int = OCR_TARGET_TEXT_HEIGHT,
+    defer_tall: bool = False,
+    preprocess: bool | None = None,
+    use_cls: bool | None = None,
+) -> OCRResult | PreparedImage:
+    """
+    Synchronous OCR pipeline — runs inside an OCR pool worker (thread or
+    process), using that worker's own warmed RapidOCR engine.
 
     Pipeline:
       1. Quality assessment (soft-fail: attach warnings, don't abort)
       2. Perspective correction  →  crop  →  grayscale  →  inversion fix
-      3. Denoise  →  CLAHE  →  deskew
-      4. RapidOCR detection + recognition
-      5. Parse boxes into OCRBox dataclasses with overlap-based line grouping
+      3. Resolution normalisation (text ≈ target_text_height px; 0 disables)
+      4. Denoise  →  CLAHE (or Sauvola binarisation for thermal paper)  →  deskew
+         →  page orientation, decided once (see orient_page)
+      5. RapidOCR detection + recognition (angle classifier only if the
+         orientation is undecided), then rec-only re-reads of
+         low-confidence boxes from full-resolution crops
+      6. Parse boxes into an array-backed OCRBoxes (mapped back to pre-normalisation
+         coordinates) with overlap-based line grouping
+
+    With `defer_tall=True`, an image that needs tiling is returned as a
+    PreparedImage after step 4 so the caller can fan its strips out across
+    workers (see ocr_image). `preprocess` forces the raw/preprocessed path;
+    `use_cls` is passed to orient_page.
+    """
+    prepared = prepare_image(image, target_text_height, preprocess)
+    if prepared is None:
+        return OCRResult(boxes=OCRBoxes.empty(), raw_text="")
+
+    timer = StageTimer(prepared.timings)
+    orient_page(prepared, use_cls)
+    timer.mark("orientation")
+
+    height, width = prepared.image.shape[:2]
+    if defer_tall and needs_tiling(height, width):
+        return prepared
+
+    boxes = recognize_boxes(prepared.image, 0, prepared.use_cls)
+    timer.mark("ocr")
+    boxes = rerecognize_boxes(boxes, prepared.source, prepared.to_source, prepared.page_rotation)
+    timer.mark("rerec")
+    print(f"boxes: {boxes}")
+    return build_ocr_result(boxes, prepared, timer, describe_source(image))
+
+
+async def _ocr_tiles(pool: OCRWorkerPool, prepared: PreparedImage, source_label: str) -> OCRResult:
+    """Run det+rec on overlapping strips of a tall receipt in parallel, then merge."""
+    height, width = prepared.image.shape[:2]
+    tiles = plan_tiles(height, width)
+    logger.info(f"Tiling {width}x{height} receipt into {len(tiles)} strips")
+
+    timer = StageTimer(prepared.timings)
+    strips = [np.ascontiguousarray(prepared.image[top:bottom]) for top, bottom in tiles]
+    results = await asyncio.gather(*(
+        pool.run(recognize_boxes, strip, top, prepared.use_cls) for strip, (top, _) in zip(strips, tiles)
+    ))
+    boxes = merge_tile_boxes(list(zip(tiles, results)))
+    timer.mark("ocr")
+    boxes = await pool.run(
+        rerecognize_boxes, boxes, prepared.source, prepared.to_source, prepared.page_rotation
+    )
+    timer.mark("rerec")
+    return build_ocr_result(boxes, prepared, timer, source_label)
+
+
+async def _ocr_variant(
+    pool: OCRWorkerPool,
+    image: ImageSource,
+    source_label: str,
+    preprocess: bool | None = None,
+    stop: asyncio.Event | None = None,
+    use_cls: bool | None = None,
+) -> OCRResult | None:
+    """One full pass (single job, or prepare + parallel strips for tall receipts)."""
+    result = await pool.run(run_ocr_pipeline, image, OCR_TARGET_TEXT_HEIGHT, True, preprocess, use_cls)
+    if isinstance(result, PreparedImage):
+        if stop is not None and stop.is_set():
+            return None
+        return await _ocr_tiles(pool, result, source_label)
+    return result
+
+
+# Race losers left to finish their in-flight job (thread workers can't be stopped)
+_detached_variants: set[asyncio.Task] = set()
+
+
+def _abandon_variant(task: asyncio.Task, pool: OCRWorkerPool, stop: asyncio.Event) -> None:
+    """
+    Stop a losing variant. Process workers are killed (the pool respawns
+    them), which really frees the cores; a thread worker can't be stopped,
+    so its current job is left to finish and no further stages are queued.
     """
+    if pool.mode == "process":
+        task.cancel()
+        return
+    stop.set()
+    _detached_variants.add(task)
+    task.add_done_callback(_detached_variants.discard)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _race_variants(
+    pool: OCRWorkerPool,
+    image: ImageSource,
+    source_label: str,
+    use_cls: bool | None = None,
+) -> OCRResult:
+    """
+    Run the raw and preprocessed paths on separate workers and keep the
+    better-scoring result (see variant_race). The first variant to finish
+    wins outright if it is already decisive; the other is then abandoned.
+    """
+    stop = asyncio.Event()
+    tasks = {
+        asyncio.create_task(_ocr_variant(pool, image, source_label, preprocess, stop, use_cls)): name
+        for name, preprocess in VARIANTS.items()
+    }
+    results: dict[str, OCRResult] = {}
+    scores: dict[str, VariantScore] = {}
+    errors: list[Exception] = []
+    early = False
+    pending = set(tasks)
     try:
-        loop = asyncio.get_event_loop()
-
-        def process() -> OCRResult:
-            img = cv2.imread(image_path)
-            print(type(img))
-            cv2.imwrite("debug_original.jpg", img)
-            if img is None:
-                logger.warning(f"Could not read image: {image_path}")
-                return OCRResult(boxes=[], raw_text="")
-
-            # ── Quality assessment (non-blocking) ──────────────────────────
-            quality = assess_image_quality(img)
-            print(f"quality: {quality}")
-            quality_issues = quality["issues"] if not quality["is_acceptable"] else []
-            if quality_issues:
-                logger.warning(f"Image quality issues detected: {quality_issues} — attempting OCR anyway")
-
-            if should_preprocess(img):
-                logger.info("Applying OpenCV preprocessing")
-                img_corrected = correct_perspective(img)
-                cv2.imwrite("debug_perspective.jpg", img_corrected)
-                img_crop = crop_receipt(img_corrected)
-                cv2.imwrite("debug_cropped_image.jpg", img_crop)
-                gray = img_crop[:, :, 1]
-                gray = cv2.cvtColor(img_crop, cv2.COLOR_BGR2GRAY)
-                cv2.imwrite("debug_gray.jpg", gray)
-                gray = check_and_fix_inversion(gray)
-                cv2.imwrite("debug_inversion_fixed.jpg", gray)
-                denoised = cv2.fastNlMeansDenoising(gray, h=15)
-                cv2.imwrite("debug_denoised.jpg", denoised)
-                clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-                enhanced = clahe.apply(denoised)
-                cv2.imwrite("desbug_enhanced.jpg", enhanced)
-                deskewed = deskew(enhanced)
-                print(f"deskewed: {deskewed}")
-                cv2.imwrite("debug_deskewed.jpg", deskewed)
-                result = engine(deskewed)
-                boxes = _parse_ocr_result(result)
-                print(f"boxes: {boxes}")
-            else:
-                logger.info("Skipping preprocessing")
-                result = engine(img)
-                boxes = _parse_ocr_result(result)
-                print(f"boxes: {boxes}")
-
-            # # ── Step 1: Perspective correction ────────────────────────────
-            # img_corrected = correct_perspective(img)
-            # cv2.imwrite("debug_perspective.jpg", img_corrected)
-
-            # # ── Step 2: Crop to receipt area ───────────────────────────────
-            # # img_corrected is the perspective-fixed image, or the original if
-            # # the fix produced a fragment smaller than 50% of the frame.
-            # img_crop = crop_receipt(img_corrected)
-            # cv2.imwrite("debug_cropped_image.jpg", img_crop)
-
-            # gray = img_crop[:, :, 1] 
-            # # ── Step 3: Grayscale ──────────────────────────────────────────
-            # gray = cv2.cvtColor(img_crop, cv2.COLOR_BGR2GRAY)
-            # print(f"img_crop shape: {img_crop.shape}")  # harusnya (h, w, 3)
-            # print(f"img_crop dtype: {img_crop.dtype}")
-            # cv2.imwrite("debug_gray.jpg", gray)
-
-            # # ── Step 4: Fix inverted thermal receipts (white-on-dark) ──────
-            # gray = check_and_fix_inversion(gray)
-            # cv2.imwrite("debug_inversion_fixed.jpg", gray)
-
-            # # ── Step 5: Denoise ────────────────────────────────────────────
-            # denoised = cv2.fastNlMeansDenoising(gray, h=15)
-            # cv2.imwrite("debug_denoised.jpg", denoised)
-
-            # # ── Step 6: CLAHE contrast enhancement ────────────────────────
-            # clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-            # # cv2.imwrite("debug_clahe.jpg", clahe)
-            # enhanced = clahe.apply(denoised)
-            # cv2.imwrite("desbug_enhanced.jpg", enhanced)
-
-            # # ── Step 7: Deskew ─────────────────────────────────────────────
-            # deskewed = deskew(enhanced)
-            # print(f"deskewed: {deskewed}")
-            # cv2.imwrite("debug_deskewed.jpg", deskewed)
-
-            # # ── Step 8: Run OCR ────────────────────────────────────────────
-            # result = engine(deskewed)
-
-            # # ── Step 9: Parse boxes ────────────────────────────────────────
-            # boxes = _parse_ocr_result(result)
-            # print(f"boxes: {boxes}")
-
-            if not boxes:
-                logger.warning(f"No text detected in: {image_path}")
-                return OCRResult(boxes=[], raw_text="", quality_issues=quality_issues)
-
-            # Build raw_text using unified overlap-based line reconstruction
-            raw_text = reconstruct_lines(boxes)
-            print(raw_text)
-            logger.info(
-                f"OCR complete: {len(boxes)} boxes, "
-                f"avg confidence: {sum(b.confidence for b in boxes)/len(boxes):.3f}"
-            )
-
-            return OCRResult(boxes=boxes, raw_text=raw_text, quality_issues=quality_issues or None)
-
-        return await loop.run_in_executor(None, process)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"OCR variant {name} failed: {type(e).__name__}: {e}")
+                    errors.append(e)
+                    continue
+                results[name] = result
+                scores[name] = score_variant(result.boxes)
+            if pending and any(is_decisive(score) for score in scores.values()):
+                early = True
+                break
+    finally:
+        for task in pending:
+            _abandon_variant(task, pool, stop)
+
+    if not results:
+        raise errors[0]
+
+    winner = pick_winner(scores)
+    result = results[winner]
+    predicted = None
+    if result.quality:
+        predicted = "preprocessed" if should_preprocess(None, result.quality) else "raw"
+    logger.info(
+        f"OCR race: {winner} won{' early' if early else ''} "
+        f"(should_preprocess picked {predicted}) — "
+        + ", ".join(f"{name} {score.score:.1f}" for name, score in scores.items())
+    )
+    record_outcome(source_label, result.quality, predicted, winner, scores, early)
+    return result
+
 
+async def ocr_image(image: ImageSource, use_cls: bool | None = None) -> OCRResult:
+    """
+    Returns structured OCRResult with per-box confidence scores.
+    Falls back to empty OCRResult on failure.
+
+    `image` can be a file path (legacy callers), the raw encoded bytes of
+    the photo, or a decoded BGR array — bytes are decoded in memory with
+    cv2.imdecode so nothing touches the disk.
+
+    The pipeline runs on the dedicated OCR worker pool (see ocr_pool);
+    OCRPoolBusy is raised when the pool's queue is full so callers can
+    tell the user to retry instead of reporting "no text". Tall receipts
+    come back prepared-but-unrecognised and are OCR'd as parallel strips.
+
+    With OCR_VARIANT_RACE the raw and preprocessed paths race on two
+    workers whenever two are idle (see _race_variants).
+
+    `use_cls` controls RapidOCR's per-box angle classifier: None (default)
+    decides the page orientation once and skips it (OCR_ORIENTATION),
+    True runs it on every box, False skips it for a known-upright photo.
+    """
+    source_label = describe_source(image)
+    try:
+        pool = get_ocr_pool()
+        if OCR_VARIANT_RACE:
+            await pool.start()
+            if pool.idle >= 2:
+                return await _race_variants(pool, image, source_label, use_cls)
+        return await _ocr_variant(pool, image, source_label, use_cls=use_cls)
+
+    except OCRPoolBusy:
+        raise
     except Exception as e:
-        logger.error(f"OCR failed for {image_path}: {e}")
-        return OCRResult(boxes=[], raw_text="")
\ No newline at end of file
+        logger.error(f"OCR failed for {source_label}: {e}")
+        return OCRResult(boxes=OCRBoxes.empty(), raw_text="")
@@ -0,0 +1,116 @@
+"""
+Page orientation, decided once per receipt instead of per text box.
+
+default_rapidocr.yaml runs the angle classifier on every detected box, but
+a receipt has a single orientation. Here text is detected on a central
+band of the prepared image only, the classifier runs on a small sample of
+the widest lines, and the majority vote gives the clockwise rotation that
+makes the page upright:
+
+    boxes mostly wide  → lines are horizontal, classifier picks 0 or 180
+    boxes mostly tall  → page is sideways; crops are turned 90° clockwise
+                         first, so classifier 0 → 90, 180 → 270
+
+The caller rotates the image once and recognises with use_cls=False.
+When too few confident votes agree, None is returned and the pipeline
+falls back to per-box classification.
+"""
+import os
+import logging
+
+import cv2
+import numpy as np
+
+from app.services.engine_profiles import preserve_call_flags
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_ORIENTATION = os.getenv("OCR_ORIENTATION", "auto")        # auto | cls (per box) | off (assume upright)
+OCR_ORIENT_SAMPLE = int(os.getenv("OCR_ORIENT_SAMPLE", "12"))
+OCR_ORIENT_MIN_AGREEMENT = float(os.getenv("OCR_ORIENT_MIN_AGREEMENT", "0.75"))
+
+_MIN_VOTES = 3
+_ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def _probe_band(image: np.ndarray) -> np.ndarray:
+    """Central horizontal band (≥ 320px, ~half the width tall) — enough lines to vote."""
+    h, w = image.shape[:2]
+    band = min(h, max(320, max(w, h // 4) // 2))
+    top = (h - band) // 2
+    return image[top:top + band]
+
+
+def _sample_crops(probe: np.ndarray, quads: np.ndarray, sample: int) -> tuple[list[np.ndarray], bool]:
+    """Crops of the `sample` longest boxes, laid horizontal; and whether the page is sideways."""
+    mins, maxs = quads.min(axis=1), quads.max(axis=1)
+    sizes = maxs - mins                                   # (N, 2): width, height
+    sideways = float(np.mean(sizes[:, 1] > sizes[:, 0] * 1.5)) > 0.5
+    length = sizes[:, 1] if sideways else sizes[:, 0]
+
+    crops = []
+    for i in np.argsort(-length)[:sample]:
+        x0, y0 = np.floor(mins[i]).astype(int).clip(0)
+        x1, y1 = np.ceil(maxs[i]).astype(int)
+        crop = probe[y0:y1, x0:x1]
+        if crop.shape[0] < 4 or crop.shape[1] < 4:
+            continue
+        if sideways:
+            crop = cv2.rotate(crop, cv2.ROTATE_90_CLOCKWISE)
+        crops.append(np.ascontiguousarray(crop))
+    return crops, sideways
+
+
+def detect_page_rotation(image: np.ndarray, engine, sample: int = OCR_ORIENT_SAMPLE) -> int | None:
+    """Clockwise rotation (0/90/180/270) that makes the page upright, or None if undecided."""
+    probe = _probe_band(image)
+    if probe.ndim == 2:
+        probe = cv2.cvtColor(probe, cv2.COLOR_GRAY2BGR)
+
+    with preserve_call_flags(engine):
+        detected = engine(probe, use_det=True, use_cls=False, use_rec=False)
+    quads = getattr(detected, "boxes", None)
+    if quads is None or len(quads) < _MIN_VOTES:
+        return None
+
+    crops, sideways = _sample_crops(probe, np.asarray(quads, dtype=np.float32), sample)
+    if len(crops) < _MIN_VOTES:
+        return None
+
+    classifier = engine.text_cls
+    threshold = getattr(classifier, "cls_thresh", 0.9)
+    labels = [label for label, score in classifier(crops).cls_res if score >= threshold]
+    if len(labels) < _MIN_VOTES:
+        return None
+
+    flipped = sum("180" in label for label in labels) / len(labels)
+    if flipped >= OCR_ORIENT_MIN_AGREEMENT:
+        rotation = 270 if sideways else 180
+    elif 1.0 - flipped >= OCR_ORIENT_MIN_AGREEMENT:
+        rotation = 90 if sideways else 0
+    else:
+        logger.info(f"Page orientation undecided ({flipped:.0%} of {len(labels)} lines flipped)")
+        return None
+    return rotation
+
+
+def rotate_page(image: np.ndarray, rotation: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rotate by a multiple of 90° clockwise. Also returns the 2x3 affine that
+    maps coordinates in the rotated image back into `image`.
+    """
+    h, w = image.shape[:2]
+    if rotation == 90:      # (x, y) → (h-1-y, x)
+        back = np.array([[0.0, 1.0, 0.0], [-1.0, 0.0, h - 1.0]])
+    elif rotation == 180:   # (x, y) → (w-1-x, h-1-y)
+        back = np.array([[-1.0, 0.0, w - 1.0], [0.0, -1.0, h - 1.0]])
+    elif rotation == 270:   # (x, y) → (y, w-1-x)
+        back = np.array([[0.0, -1.0, w - 1.0], [1.0, 0.0, 0.0]])
+    else:
+        return image, np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    return cv2.rotate(image, _ROTATE_CODES[rotation]), back
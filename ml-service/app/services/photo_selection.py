@@ -0,0 +1,99 @@
+"""
+Pick the smallest Telegram PhotoSize that still has enough resolution.
+
+Telegram keeps several renditions of every photo (≈90, 320, 800, 1280 and
+2560 px on the long side). The largest is often 4× the bytes of the next
+one down, and download + decode is a big share of end-to-end latency. The
+character height a rendition will give is estimated from its width:
+
+    char height ≈ width × receipt fill / chars per line × glyph aspect
+
+(thermal slips print ~32-48 monospace characters per line). The smallest
+rendition reaching PHOTO_MIN_TEXT_HEIGHT is downloaded first. If OCR then
+comes back unsure, larger_photo_size picks a bigger rendition sized from
+the text height actually measured in the boxes. Detection boxes are not
+character heights: DB's unclip step pads each box (unclip_ratio 1.6) and
+a box spans ascender to descender, so a box is roughly 1.4× the character
+height. Measured box heights are divided by that factor before they are
+compared with the character-height targets above.
+"""
+import os
+import logging
+from typing import Protocol, Sequence
+
+import numpy as np
+
+from app.services.ocr_boxes import OCRBoxes
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+PHOTO_SIZE_POLICY = os.getenv("PHOTO_SIZE_POLICY", "smallest")       # smallest | largest
+# Character height (px) the first download should give — rec reads fine from ~16px
+PHOTO_MIN_TEXT_HEIGHT = float(os.getenv("PHOTO_MIN_TEXT_HEIGHT", "18"))
+PHOTO_RECEIPT_FILL = float(os.getenv("PHOTO_RECEIPT_FILL", "0.6"))     # receipt width / photo width
+PHOTO_CHARS_PER_LINE = int(os.getenv("PHOTO_CHARS_PER_LINE", "42"))
+# Retry at a larger rendition when mean box confidence is below this
+PHOTO_RETRY_CONFIDENCE = float(os.getenv("PHOTO_RETRY_CONFIDENCE", "0.85"))
+# Character height already this tall → low confidence isn't a resolution problem, don't retry
+PHOTO_RETRY_TEXT_HEIGHT = float(os.getenv("PHOTO_RETRY_TEXT_HEIGHT", str(PHOTO_MIN_TEXT_HEIGHT * 4 / 3)))
+
+_GLYPH_ASPECT = 1.5          # monospace glyph height / character pitch
+_BOX_TO_CHAR_HEIGHT = 1.4    # det box height (unclip padding, ascender→descender) / character height
+
+
+class Rendition(Protocol):
+    width: int
+    height: int
+
+
+def estimated_text_height(photo: Rendition) -> float:
+    """Expected character height (px) on this rendition of a receipt photo."""
+    width = min(photo.width, photo.height)    # receipts are shot portrait-ish
+    return width * PHOTO_RECEIPT_FILL / PHOTO_CHARS_PER_LINE * _GLYPH_ASPECT
+
+
+def select_photo_size(
+    photos: Sequence[Rendition],
+    min_text_height: float = PHOTO_MIN_TEXT_HEIGHT,
+    policy: str = PHOTO_SIZE_POLICY,
+) -> Rendition:
+    """Smallest rendition expected to reach `min_text_height`, else the largest."""
+    ordered = sorted(photos, key=lambda p: p.width * p.height)
+    if policy == "largest":
+        return ordered[-1]
+    for photo in ordered:
+        if estimated_text_height(photo) >= min_text_height:
+            return photo
+    return ordered[-1]
+
+
+def needs_larger(boxes: OCRBoxes) -> bool:
+    return not boxes or boxes.mean_confidence() < PHOTO_RETRY_CONFIDENCE
+
+
+def larger_photo_size(photos: Sequence[Rendition], current: Rendition, boxes: OCRBoxes) -> Rendition | None:
+    """
+    Rendition to retry OCR on after an unsure result from `current`, or None.
+    The median box height, converted to character height, decides how
+    much larger it must be.
+    """
+    if not needs_larger(boxes):
+        return None
+    area = current.width * current.height
+    larger = sorted((p for p in photos if p.width * p.height > area), key=lambda p: p.width * p.height)
+    if not larger:
+        return None
+    if not boxes:
+        return larger[-1]
+
+    text_height = float(np.median(boxes.height)) / _BOX_TO_CHAR_HEIGHT
+    if text_height >= PHOTO_RETRY_TEXT_HEIGHT:
+        logger.info(f"Low OCR confidence with {text_height:.0f}px characters — not a resolution problem, no retry")
+        return None
+    needed = PHOTO_RETRY_TEXT_HEIGHT / max(text_height, 1.0)
+    current_side = max(current.width, current.height)
+    for photo in larger:
+        if max(photo.width, photo.height) >= current_side * needed:
+            return photo
+    return larger[-1]
@@ -0,0 +1,98 @@
+"""
+Learned raw-vs-preprocessed path predictor.
+
+A logistic regression over the cheap quality features assess_image_quality
+already computes (blur, brightness, contrast, receipt ratio), trained
+offline by benchmarks/train_preprocess_model.py from logged outcomes:
+which path read the receipt with higher mean box confidence. The model is
+a small JSON file loaded once at import; a prediction is a handful of
+float ops (microseconds).
+
+Without a model file should_preprocess falls back to its fixed thresholds.
+"""
+import os
+import json
+import math
+import logging
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_PREPROCESS_MODEL = os.getenv("OCR_PREPROCESS_MODEL", "preprocess_model.json")
+
+# Feature name → extractor over the assess_image_quality dict
+FEATURES = {
+    "log_blur": lambda q: math.log1p(max(q["blur_score"], 0.0)),
+    "brightness": lambda q: q["brightness"] / 255.0,
+    # Both too dark and too bright need preprocessing — distance from mid-grey
+    "brightness_dev": lambda q: abs(q["brightness"] / 255.0 - 0.5),
+    "contrast": lambda q: q["contrast"] / 128.0,
+    "receipt_ratio": lambda q: q.get("receipt_ratio", 1.0),
+}
+
+
+def feature_vector(quality: dict, names: list[str] | tuple[str, ...] = tuple(FEATURES)) -> list[float]:
+    return [FEATURES[name](quality) for name in names]
+
+
+@dataclass(frozen=True)
+class PreprocessModel:
+    features: tuple[str, ...]
+    weights: tuple[float, ...]
+    bias: float
+    mean: tuple[float, ...]        # standardisation fitted on the training set
+    scale: tuple[float, ...]
+    threshold: float = 0.5         # P(preprocessing helps) above this → preprocess
+    trained_on: int = 0
+
+    def probability(self, quality: dict) -> float:
+        z = self.bias
+        for value, w, mu, sd in zip(feature_vector(quality, self.features), self.weights, self.mean, self.scale):
+            z += w * (value - mu) / sd
+        return 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, z))))
+
+    def predict(self, quality: dict) -> bool:
+        return self.probability(quality) >= self.threshold
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PreprocessModel":
+        features = tuple(data["features"])
+        unknown = [name for name in features if name not in FEATURES]
+        if unknown:
+            raise ValueError(f"unknown features {unknown}")
+        model = cls(
+            features=features,
+            weights=tuple(float(w) for w in data["weights"]),
+            bias=float(data["bias"]),
+            mean=tuple(float(m) for m in data["mean"]),
+            scale=tuple(float(s) or 1.0 for s in data["scale"]),
+            threshold=float(data.get("threshold", 0.5)),
+            trained_on=int(data.get("trained_on", 0)),
+        )
+        if not len(model.features) == len(model.weights) == len(model.mean) == len(model.scale):
+            raise ValueError("features/weights/mean/scale lengths differ")
+        return model
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+
+def load_model(path: str | Path = OCR_PREPROCESS_MODEL) -> PreprocessModel | None:
+    """The model at `path`, or None (→ fixed thresholds) if it's missing or invalid."""
+    if not path or not Path(path).is_file():
+        return None
+    try:
+        model = PreprocessModel.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring preprocess model {path}: {e}")
+        return None
+    logger.info(f"Loaded preprocess model {path} ({len(model.features)} features, trained on {model.trained_on})")
+    return model
+
+
+preprocess_model = load_model()
@@ -0,0 +1,123 @@
+"""
+One status message per receipt, edited in place.
+
+Instead of an awaited reply_text per stage ('Processing…', 'Performing
+OCR…', 'Refining…', then the result), the handler calls
+`progress.update(text)`, which returns immediately: the first update sends
+the status message and later ones edit it, all from a background task.
+Updates are coalesced — only the newest pending text is sent — and spaced
+at least PROGRESS_MIN_INTERVAL apart per chat. A 429 (RetryAfter) pauses
+every chat's progress edits until Telegram's retry time has passed.
+`await progress.finish(text)` turns the status message into the final reply.
+"""
+import os
+import asyncio
+import logging
+import time
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+# Telegram asks for ≤ 1 message per second per chat
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "1.0"))
+
+# Shared across chats: no progress edits before this (monotonic) time after a 429
+_flood_until = 0.0
+
+
+def _retry_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class ProgressMessage:
+    def __init__(self, reply_to: Message, min_interval: float = PROGRESS_MIN_INTERVAL):
+        self._reply_to = reply_to
+        self.min_interval = min_interval
+        self._status: Message | None = None     # the bot's status message, once sent
+        self._pending: str | None = None
+        self._shown: str | None = None
+        self._last_sent = 0.0
+        self._task: asyncio.Task | None = None
+        self._sending = False                    # _task is inside a Telegram call
+        self._closed = False
+
+    def update(self, text: str) -> None:
+        """Show `text` as soon as the rate limit allows. Never blocks."""
+        if self._closed:
+            return
+        self._pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending is not None and not self._closed:
+            now = time.monotonic()
+            delay = max(self._last_sent + self.min_interval - now, _flood_until - now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self._closed:
+                    return
+            text, self._pending = self._pending, None
+            if text != self._shown:
+                self._sending = True
+                try:
+                    await self._send(text)
+                finally:
+                    self._sending = False
+
+    async def _send(self, text: str) -> bool:
+        global _flood_until
+        try:
+            if self._status is None:
+                self._status = await self._reply_to.reply_text(text)
+            else:
+                await self._status.edit_text(text)
+            self._shown = text
+            return True
+        except RetryAfter as e:
+            _flood_until = time.monotonic() + _retry_seconds(e)
+            logger.warning(f"Telegram flood control — pausing progress edits for {_retry_seconds(e):.0f}s")
+            if self._pending is None and not self._closed:
+                self._pending = text      # resend after the pause unless something newer came in
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                self._shown = text
+                return True
+            logger.warning(f"Progress update failed: {e}")
+        except TelegramError as e:
+            logger.warning(f"Progress update failed: {e}")
+        finally:
+            self._last_sent = time.monotonic()
+        return False
+
+    async def finish(self, text: str) -> None:
+        """
+        Replace the status message with the final `text` (or send it, if no
+        status message went out). Pending progress updates are dropped.
+        """
+        self._closed = True
+        self._pending = None
+        if self._task is not None and not self._task.done():
+            if not self._sending:
+                # Only sleeping out the throttle — nothing left for it to send
+                self._task.cancel()
+            # A send already in flight must land first so there is a message to edit
+            await asyncio.gather(self._task, return_exceptions=True)
+
+        for _ in range(2):
+            delay = _flood_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self._send(text):
+                return
+        # Edit refused (message deleted, too old, ...) or no status message could
+        # be sent at all — the final result must still reach the user
+        try:
+            await self._reply_to.reply_text(text)
+        except TelegramError as e:
+            logger.error(f"Final reply failed: {e}")
+            raise
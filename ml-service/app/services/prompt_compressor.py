@@ -0,0 +1,300 @@
+"""
+Token-budgeted OCR section for the refine_receipt prompt.
+
+The prompt used to carry the OCR content twice — build_llm_input's
+`[x=.. y=.. w=..] text` dump of every box plus the whole raw_text — on top
+of ~1.5k tokens of instructions. Here the content appears once:
+
+  - lines are rebuilt from the boxes with the same overlap grouping as
+    raw_text, so every box is covered by exactly one line
+  - coordinates survive only as a quantised column tag per column segment
+    ("@12" = 12/LLM_COORD_GRID of the text width from the left), and not
+    at all on single left-aligned segments
+  - header/footer noise (NPWP, phone numbers, addresses, URLs, rulers) is
+    cut using find_zone_boundaries; the item zone is never touched
+
+The item zone runs from the first item row (a line ending in an amount
+column) to the first TOTAL line after it. It is not anchored on the date:
+Indomaret prints the transaction line above the items, Alfamart prints
+"Tgl : dd/mm/yyyy hh:mm:ss" under the totals. A line that looks like an
+item row, a payment line or a date line is never dropped, whatever zone
+it landed in.
+
+When the assembled prompt is still over LLM_PROMPT_TOKEN_BUDGET, the
+footer goes first (bottom-up), then the column tags, then header lines
+past the first LLM_HEADER_KEEP_LINES. Tokens are estimated from
+characters — the cloud model's tokenizer isn't available locally.
+
+Every call's PromptStats is appended to LLM_PROMPT_LOG (JSONL) together
+with the receipt's scoring status, so savings can be checked against
+extraction accuracy (LLM_PROMPT_MODE=legacy gives the baseline).
+"""
+import os
+import re
+import json
+import math
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from app.services.line_grouping import column_gap_threshold, group_lines_by_overlap
+from app.services.ocr_boxes import OCRBoxes
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+LLM_PROMPT_MODE = os.getenv("LLM_PROMPT_MODE", "compact")          # compact | legacy (coords + raw_text)
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "3000"))
+LLM_COORD_GRID = int(os.getenv("LLM_COORD_GRID", "40"))             # column tag resolution
+LLM_HEADER_KEEP_LINES = int(os.getenv("LLM_HEADER_KEEP_LINES", "3"))  # merchant name lives here
+LLM_PROMPT_LOG = os.getenv("LLM_PROMPT_LOG", "llm_prompt_stats.jsonl")   # empty disables
+
+_CHARS_PER_TOKEN = 3.5       # mixed Indonesian text + digits, slightly pessimistic
+_TEMPLATE_INDENT = re.compile(r"^ {1,8}", re.MULTILINE)
+_BLANK_RUNS = re.compile(r"\n[ \t]*(?:\n[ \t]*)+\n")
+
+# Outside the item zone only — these never carry merchant, date, items or totals
+NOISE_PATTERNS = re.compile(
+    r"\bnpwp\b|\bjl\.?\s|\bjalan\b|\bkel\.|\bkec\.|\bkab\.|\bkota\b|\brt\b|\brw\b"
+    r"|www\.|https?:|\.co\.id|\.com\b|@|\bkritik\b|\bsaran\b"
+    r"|\d{3,4}[-\s]?\d{3,4}[-\s]?\d{3,5}"       # phone / WA / SMS numbers
+    r"|^[\W_]+$",                               # rulers: ------, ======, ****
+    re.IGNORECASE,
+)
+# Payment summary lines are never dropped, even when zone detection put them in the footer
+_PAYMENT_LINE = re.compile(r"total|tunai|kembali|bayar|jumlah|hemat|diskon|voucher", re.IGNORECASE)
+_DATE = re.compile(r"\d{2}[./-]\s?\d{2}[./-]\s?\d{2,4}")
+# End of the item zone
+_TOTAL_LINE = re.compile(r"^\W*(?:sub\s*total|total|grand\s+total|harga\s+jual|jumlah)\b", re.IGNORECASE)
+# "NAME | 1 | 9,500 | 9,500", "1PCSx | 24.000= | 24.000", "IDM KTG PLSTK | 1 | 200 | 200"
+_AMOUNT_TOKEN = re.compile(r"\(?-?\d{1,3}(?:[.,]\d{3})+\)?=?|\(?-?\d+\)?=?")
+_GROUPED_AMOUNT = re.compile(r"\d{1,3}(?:[.,]\d{3})+")
+_CONTACT = re.compile(r"\b(?:telp|tlp|hp|wa|sms|fax|phone|npwp)\b", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def compact_whitespace(prompt: str) -> str:
+    """Strip the f-string's 8-space code indentation and collapse blank runs."""
+    prompt = _TEMPLATE_INDENT.sub("", prompt)
+    return _BLANK_RUNS.sub("\n\n", prompt).strip()
+
+
+def is_item_row(text: str) -> bool:
+    """
+    A line ending in an amount column: a thousands-grouped amount, or at
+    least two numeric columns (qty + price). Payment, date and contact
+    lines are not item rows.
+    """
+    tokens = text.replace("|", " ").split()
+    if not tokens or not _AMOUNT_TOKEN.fullmatch(tokens[-1]):
+        return False
+    if _PAYMENT_LINE.search(text) or _DATE.search(text) or _CONTACT.search(text):
+        return False
+    last = tokens[-1].strip("()-=")
+    if _GROUPED_AMOUNT.fullmatch(last):
+        return True
+    # Ungrouped: a price of 100+ (not "RT 003") after a qty column
+    numeric = [t for t in tokens if _AMOUNT_TOKEN.fullmatch(t) or re.fullmatch(r"-?\d{1,3}(?:pcs|x)+", t, re.IGNORECASE)]
+    return len(numeric) >= 2 and len(last) >= 3 and not last.startswith("0")
+
+
+def _zone_bounds(tops: list[float], texts: list[str]) -> tuple[float, float]:
+    """(item zone start y, footer start y) for top→bottom lines."""
+    item_start = next((y for y, text in zip(tops, texts) if is_item_row(text)), None)
+    if item_start is None:
+        # No recognisable item row — fall back to the transaction date line
+        item_start = next((y for y, text in zip(tops, texts) if _DATE.search(text)), None)
+    footer_start = None
+    if item_start is not None:
+        footer_start = next(
+            (y for y, text in zip(tops, texts) if y > item_start and _TOTAL_LINE.match(text)), None
+        )
+
+    max_y = max(tops) if tops else 1000
+    return (
+        item_start if item_start is not None else max_y * 0.25,
+        footer_start if footer_start is not None else max_y * 0.80,
+    )
+
+
+def find_zone_boundaries(boxes: OCRBoxes) -> tuple[float, float]:
+    """(item zone start y, footer start y): first item row → first TOTAL line after it."""
+    boxes = OCRBoxes.coerce(boxes)
+    if not boxes:
+        return 250.0, 800.0
+    tops, texts = [], []
+    for line in group_lines_by_overlap(boxes.y, boxes.height):
+        line = sorted(line, key=lambda i: boxes.x[i])
+        tops.append(float(boxes.y[line].min()))
+        texts.append(" | ".join(boxes.texts[i].strip() for i in line))
+    return _zone_bounds(tops, texts)
+
+
+def _protected(line: "_Line") -> bool:
+    """Lines no trimming step may drop: item rows, payment lines, dates."""
+    return is_item_row(line.plain) or bool(_PAYMENT_LINE.search(line.plain)) or bool(_DATE.search(line.plain))
+
+
+@dataclass
+class PromptStats:
+    mode: str
+    boxes: int = 0
+    lines: int = 0              # reconstructed lines before trimming
+    kept_lines: int = 0
+    noise_dropped: int = 0
+    footer_dropped: int = 0
+    header_dropped: int = 0
+    column_tags: bool = False
+    raw_tokens: int = 0         # raw_text alone
+    ocr_tokens: int = 0         # OCR section actually sent
+    prompt_tokens: int = 0
+    budget: int = LLM_PROMPT_TOKEN_BUDGET
+    over_budget: bool = False
+
+    def summary(self) -> str:
+        return (
+            f"prompt ≈{self.prompt_tokens} tokens (budget {self.budget}), OCR section "
+            f"{self.ocr_tokens} vs raw_text {self.raw_tokens}; {self.kept_lines}/{self.lines} lines kept "
+            f"(noise -{self.noise_dropped}, footer -{self.footer_dropped}, header -{self.header_dropped}), "
+            f"column tags {'on' if self.column_tags else 'off'}"
+        )
+
+
+@dataclass
+class _Line:
+    zone: str                   # header | body | footer
+    plain: str
+    tagged: str
+
+
+def _render_segments(line: list[int], xs: list[float], ws: list[float], texts: list[str], x: np.ndarray,
+                     w: np.ndarray, left: float, span: float) -> tuple[str, str]:
+    """
+    One line as (plain, column-tagged) text. Columns split as in render_lines,
+    and also on any gap wider than two grid cells (≈ two monospace characters),
+    which render_lines misses on evenly spaced item rows.
+    """
+    line = sorted(line, key=xs.__getitem__)
+    threshold = min(column_gap_threshold(x[line], w[line]), 2 * span / LLM_COORD_GRID)
+
+    segments = [[line[0]]]
+    for prev, cur in zip(line, line[1:]):
+        if xs[cur] - (xs[prev] + ws[prev]) > threshold:
+            segments.append([cur])
+        else:
+            segments[-1].append(cur)
+
+    plain, tagged = [], []
+    for seg in segments:
+        text = " ".join(texts[i].strip() for i in seg)
+        column = round((xs[seg[0]] - left) / span * LLM_COORD_GRID)
+        plain.append(text)
+        tagged.append(text if len(segments) == 1 and column <= 1 else f"@{column} {text}")
+    return " | ".join(plain), " | ".join(tagged)
+
+
+def _zoned_lines(boxes: OCRBoxes) -> list[_Line]:
+    x, y, w, h = boxes.x, boxes.y, boxes.width, boxes.height
+    xs, ws, texts = x.tolist(), w.tolist(), boxes.texts
+    left = float(x.min())
+    span = max(float((x + w).max()) - left, 1.0)
+
+    rendered = []
+    for line in group_lines_by_overlap(y, h):
+        plain, tagged = _render_segments(line, xs, ws, texts, x, w, left, span)
+        rendered.append((float(y[line].min()), plain, tagged))
+    item_start, footer_start = _zone_bounds([r[0] for r in rendered], [r[1] for r in rendered])
+
+    lines = []
+    for top, plain, tagged in rendered:
+        zone = "header" if top < item_start else "footer" if top >= footer_start else "body"
+        lines.append(_Line(zone, plain, tagged))
+    return lines
+
+
+def _section(lines: list[_Line], tags: bool) -> str:
+    body = "\n".join(line.tagged if tags else line.plain for line in lines)
+    if tags:
+        return f"=== OCR (atas→bawah; @N = posisi kolom 0-{LLM_COORD_GRID} dari kiri) ===\n{body}"
+    return f"=== OCR (atas→bawah) ===\n{body}"
+
+
+def compress_ocr_input(raw_text: str, boxes: OCRBoxes | None, budget: int) -> tuple[str, PromptStats]:
+    """
+    OCR section for the prompt, fitted to `budget` tokens where possible
+    (the item zone is always kept whole), plus its PromptStats.
+    """
+    stats = PromptStats(mode="compact", raw_tokens=estimate_tokens(raw_text))
+    boxes = OCRBoxes.coerce(boxes) if boxes is not None else OCRBoxes.empty()
+    boxes = boxes[np.fromiter((bool(t.strip()) for t in boxes.texts), dtype=bool, count=len(boxes))]
+    if not boxes:
+        section = f"=== OCR (atas→bawah) ===\n{raw_text}"
+        stats.lines = stats.kept_lines = raw_text.count("\n") + 1 if raw_text else 0
+        stats.ocr_tokens = estimate_tokens(section)
+        stats.over_budget = stats.ocr_tokens > budget
+        return section, stats
+
+    lines = _zoned_lines(boxes)
+    stats.boxes = len(boxes)
+    stats.lines = len(lines)
+
+    kept = [
+        line for line in lines
+        if line.zone == "body" or _protected(line) or not NOISE_PATTERNS.search(line.plain)
+    ]
+    stats.noise_dropped = len(lines) - len(kept)
+
+    tags = True
+    section = _section(kept, tags)
+    # Footer bottom-up
+    while estimate_tokens(section) > budget:
+        footer = [i for i, line in enumerate(kept) if line.zone == "footer" and not _protected(line)]
+        if not footer:
+            break
+        del kept[footer[-1]]
+        stats.footer_dropped += 1
+        section = _section(kept, tags)
+    # Then the column tags
+    if estimate_tokens(section) > budget:
+        tags = False
+        section = _section(kept, tags)
+    # Then header lines past the merchant block, nearest the item zone first
+    while estimate_tokens(section) > budget:
+        header = [i for i, line in enumerate(kept) if line.zone == "header"]
+        droppable = [i for i in header[LLM_HEADER_KEEP_LINES:] if not _protected(kept[i])]
+        if not droppable:
+            break
+        del kept[droppable[-1]]
+        stats.header_dropped += 1
+        section = _section(kept, tags)
+
+    stats.kept_lines = len(kept)
+    stats.column_tags = tags
+    stats.ocr_tokens = estimate_tokens(section)
+    stats.over_budget = stats.ocr_tokens > budget
+    return section, stats
+
+
+def record_prompt_stats(receipt_id: str, stats: PromptStats, status: str | None) -> None:
+    """Append one prompt's stats and the resulting status to LLM_PROMPT_LOG. Never raises."""
+    if not LLM_PROMPT_LOG:
+        return
+    entry = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "receipt_id": receipt_id,
+        "status": status,
+        **asdict(stats),
+    }
+    try:
+        path = Path(LLM_PROMPT_LOG)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not record prompt stats to {LLM_PROMPT_LOG}: {e}")
@@ -0,0 +1,168 @@
+"""
+Content-addressed cache of receipt results, so a resent/forwarded photo
+skips OpenCV, RapidOCR and the LLM entirely.
+
+Entries are keyed by a 256-bit difference hash (dHash) of the image and
+aliased by Telegram's `file_unique_id`; a uid hit can answer before the
+photo is even downloaded. Because a structural hash alone could collide for
+two similar-looking receipts, each entry also stores a 32x32 thumbnail and a
+hash hit is only accepted when the thumbnails match closely.
+
+Only VERIFIED refinements are kept with an entry: an ACTION_REQUIRED answer
+replayed from the cache would just be re-posted to the backend. The
+public methods are coroutines — the sqlite backend's disk I/O runs in a
+worker thread, off the event loop.
+"""
+import asyncio
+import copy
+import logging
+import uuid
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from app.services.cache import CacheBackend, build_cache
+from app.services.ocr_services import ImageSource, OCRResult, load_image
+
+logger = logging.getLogger(__name__)
+
+_HASH_SIZE = 16          # 16x16 gradient bits = 256-bit hash
+_THUMB_SIZE = 32
+_THUMB_MAX_DIFF = 6.0    # mean abs difference (0-255) to accept a hash hit
+
+
+@dataclass
+class ImageFingerprint:
+    hash: str
+    thumbnail: np.ndarray
+
+
+@dataclass
+class CachedReceipt:
+    hash: str
+    ocr_result: OCRResult
+    refined: dict | None
+
+
+def fingerprint_image(source: ImageSource) -> ImageFingerprint | None:
+    """dHash + verification thumbnail. Encoded bytes are decoded at 1/8 scale (fast)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        gray = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    else:
+        img = load_image(source)
+        gray = None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if gray is None:
+        return None
+
+    small = cv2.resize(gray, (_HASH_SIZE + 1, _HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    digest = np.packbits(bits).tobytes().hex()
+    thumbnail = cv2.resize(gray, (_THUMB_SIZE, _THUMB_SIZE), interpolation=cv2.INTER_AREA)
+    return ImageFingerprint(digest, thumbnail)
+
+
+def _verified(refined: dict | None) -> bool:
+    return bool(refined) and refined.get("status") == "VERIFIED"
+
+
+def with_fresh_receipt_id(refined: dict) -> dict:
+    """Copy of a cached refinement with a new receipt_id (each upload is its own receipt)."""
+    refined = copy.deepcopy(refined)
+    receipt_data = refined.get("receipt_data")
+    if isinstance(receipt_data, dict):
+        receipt_data["receipt_id"] = str(uuid.uuid4())
+    return refined
+
+
+class ReceiptCache:
+    def __init__(self, backend: CacheBackend | None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _load(self, digest: str, fingerprint: ImageFingerprint | None) -> CachedReceipt | None:
+        entry = self.backend.get(f"receipt:{digest}")
+        if entry is None:
+            return None
+        if fingerprint is not None:
+            stored = np.frombuffer(bytes.fromhex(entry["thumbnail"]), dtype=np.uint8)
+            diff = np.abs(stored.astype(np.int16) - fingerprint.thumbnail.reshape(-1).astype(np.int16)).mean()
+            if diff > _THUMB_MAX_DIFF:
+                logger.info(f"Receipt cache: hash collision rejected (thumb diff {diff:.1f})")
+                return None
+        refined = entry.get("refined")
+        return CachedReceipt(
+            hash=digest,
+            ocr_result=OCRResult.from_dict(entry["ocr_result"]),
+            refined=refined if _verified(refined) else None,
+        )
+
+    async def lookup(
+        self,
+        file_unique_id: str | None = None,
+        fingerprint: ImageFingerprint | None = None,
+    ) -> CachedReceipt | None:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._lookup, file_unique_id, fingerprint)
+
+    def _lookup(self, file_unique_id: str | None, fingerprint: ImageFingerprint | None) -> CachedReceipt | None:
+
+        hit = None
+        if file_unique_id:
+            alias = self.backend.get(f"uid:{file_unique_id}")
+            if alias is not None:
+                # Same Telegram file → same pixels, no thumbnail check needed
+                hit = self._load(alias, None)
+        if hit is None and fingerprint is not None:
+            hit = self._load(fingerprint.hash, fingerprint)
+
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info(f"Receipt cache hit ({self.hits} hits / {self.misses} misses)")
+        return hit
+
+    async def store(
+        self,
+        fingerprint: ImageFingerprint,
+        ocr_result: OCRResult,
+        refined: dict | None = None,
+        file_unique_id: str | None = None,
+    ) -> str | None:
+        """Cache an OCR result (and refinement, if VERIFIED). Returns the entry hash."""
+        if not self.enabled or fingerprint is None:
+            return None
+        entry = {
+            "ocr_result": ocr_result.to_dict(),
+            "refined": refined if _verified(refined) else None,
+            "thumbnail": fingerprint.thumbnail.tobytes().hex(),
+        }
+        await asyncio.to_thread(self._store, fingerprint.hash, entry, file_unique_id)
+        return fingerprint.hash
+
+    def _store(self, digest: str, entry: dict, file_unique_id: str | None) -> None:
+        self.backend.set(f"receipt:{digest}", entry)
+        if file_unique_id:
+            self.backend.set(f"uid:{file_unique_id}", digest)
+
+    async def attach_refined(self, digest: str | None, refined: dict) -> None:
+        """Add a VERIFIED refinement to an entry stored earlier with only the OCR result."""
+        if not self.enabled or not digest or not _verified(refined):
+            return
+        await asyncio.to_thread(self._attach_refined, digest, refined)
+
+    def _attach_refined(self, digest: str, refined: dict) -> None:
+        entry = self.backend.get(f"receipt:{digest}")
+        if entry is not None:
+            entry["refined"] = refined
+            self.backend.set(f"receipt:{digest}", entry)
+
+
+receipt_cache = ReceiptCache(build_cache("RECEIPT_CACHE", table="receipt_cache"))
@@ -0,0 +1,129 @@
+"""
+Targeted re-recognition of low-confidence boxes.
+
+Boxes below the strictest field threshold in validation would send their
+field to ACTION_REQUIRED. Instead of re-running the whole pipeline, each such
+box is cropped from the full-resolution source frame (before resolution
+normalisation / denoise), upscaled to the recogniser's input height,
+enhanced, and passed through rec only (no det, no cls). A variant that
+reads with clearly higher confidence replaces the box's text and score;
+geometry is left untouched.
+"""
+import os
+import logging
+
+import cv2
+import numpy as np
+
+from app.services.engine_profiles import preserve_call_flags
+from app.services.ocr_boxes import OCRBoxes
+from app.services.orientation import rotate_page
+from app.services.validation import FIELD_THRESHOLDS
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_REREC_ENABLED = os.getenv("OCR_REREC", "true").lower() in {"1", "true", "yes"}
+# Default: the strictest field threshold (total_amount) — anything below may fail scoring
+OCR_REREC_THRESHOLD = float(os.getenv("OCR_REREC_THRESHOLD", str(max(FIELD_THRESHOLDS.values()))))
+OCR_REREC_MAX_BOXES = int(os.getenv("OCR_REREC_MAX_BOXES", "24"))
+# A new reading must beat the old confidence by this much to replace it
+OCR_REREC_MIN_GAIN = float(os.getenv("OCR_REREC_MIN_GAIN", "0.02"))
+
+_REC_HEIGHT = 48          # PP-OCR rec input height
+_MAX_UPSCALE = 4.0
+
+
+def _crop_region(source: np.ndarray, to_source: np.ndarray, box: list[float]) -> np.ndarray | None:
+    """Map a working-image box to the source frame and crop it with a little padding."""
+    x, y, w, h = box
+    corners = np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=np.float64)
+    mapped = corners @ to_source[:, :2].T + to_source[:, 2]
+    x0, y0 = mapped.min(axis=0)
+    x1, y1 = mapped.max(axis=0)
+
+    pad_y = (y1 - y0) * 0.15 + 2
+    pad_x = (y1 - y0) * 0.25 + 2
+    src_h, src_w = source.shape[:2]
+    x0 = int(max(0, np.floor(x0 - pad_x)))
+    y0 = int(max(0, np.floor(y0 - pad_y)))
+    x1 = int(min(src_w, np.ceil(x1 + pad_x)))
+    y1 = int(min(src_h, np.ceil(y1 + pad_y)))
+    if x1 - x0 < 4 or y1 - y0 < 4:
+        return None
+    return source[y0:y1, x0:x1]
+
+
+def _variants(crop: np.ndarray) -> list[np.ndarray]:
+    """Upscaled crop, and the same with CLAHE + unsharp masking."""
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    scale = min(_MAX_UPSCALE, max(1.0, _REC_HEIGHT / gray.shape[0]))
+    if scale > 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2, 8))
+    enhanced = clahe.apply(gray)
+    blurred = cv2.GaussianBlur(enhanced, (0, 0), 1.0)
+    sharpened = cv2.addWeighted(enhanced, 1.5, blurred, -0.5, 0)
+    return [gray, sharpened]
+
+
+def _plausible(old: str, new: str) -> bool:
+    """Reject readings that clearly picked up neighbouring text or lost most of the box."""
+    new = new.strip()
+    return bool(new) and len(old) / 2 <= len(new) <= len(old) * 2 + 2
+
+
+def rerecognize_low_confidence(
+    boxes: OCRBoxes,
+    source: np.ndarray | None,
+    to_source: np.ndarray | None,
+    engine,
+    threshold: float = OCR_REREC_THRESHOLD,
+    max_boxes: int = OCR_REREC_MAX_BOXES,
+    page_rotation: int | None = 0,
+) -> int:
+    """
+    Re-read the lowest-confidence boxes (working-image coords) from `source`
+    in place. `to_source` is the 2x3 affine from working to source coords.
+    `page_rotation` is the clockwise turn that makes `source` upright
+    (see orientation); None leaves each crop to the angle classifier.
+    Returns how many boxes were improved.
+    """
+    if not OCR_REREC_ENABLED or source is None or to_source is None or not boxes:
+        return 0
+
+    candidates = np.flatnonzero(boxes.confidences < threshold)
+    if candidates.size == 0:
+        return 0
+    candidates = candidates[np.argsort(boxes.confidences[candidates], kind="stable")][:max_boxes]
+
+    improved = 0
+    coords = boxes.coords.tolist()
+    with preserve_call_flags(engine):
+        for i in candidates.tolist():
+            crop = _crop_region(source, to_source, coords[i])
+            if crop is None:
+                continue
+            if page_rotation:
+                crop = rotate_page(crop, page_rotation)[0]
+
+            old_text = boxes.texts[i]
+            best_text, best_score = old_text, float(boxes.confidences[i])
+            for variant in _variants(crop):
+                output = engine(variant, use_det=False, use_cls=page_rotation is None, use_rec=True)
+                txts = getattr(output, "txts", None)
+                if not txts:
+                    continue
+                text, score = txts[0], float(output.scores[0])
+                if score > best_score + OCR_REREC_MIN_GAIN and _plausible(old_text, text):
+                    best_text, best_score = text.strip(), score
+
+            if best_text != old_text or best_score > boxes.confidences[i]:
+                logger.debug(f"Re-recognised {old_text!r} ({boxes.confidences[i]:.2f}) → {best_text!r} ({best_score:.2f})")
+                boxes.texts[i] = best_text
+                boxes.confidences[i] = best_score
+                improved += 1
+
+    logger.info(f"Re-recognition: {improved}/{len(candidates)} low-confidence boxes improved")
+    return improved
@@ -0,0 +1,99 @@
+import os
+import logging
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+# Character height (px) the expensive filters + RapidOCR should see.
+# 0 disables normalisation (full-resolution processing, old behaviour).
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32"))
+# Never shrink the receipt narrower than this — det starts missing small text
+OCR_MIN_WORKING_WIDTH = int(os.getenv("OCR_MIN_WORKING_WIDTH", "640"))
+
+# Text height is estimated on a proxy this size so the estimate itself is cheap
+_PROBE_MAX_SIDE = 1000
+
+
+@dataclass
+class NormalizedImage:
+    image: np.ndarray
+    scale: float                # working size / original size (<= 1.0)
+    text_height: float | None   # estimated character height in original px
+
+    def to_original(self, value: float) -> float:
+        """Map a coordinate/length from working space back to original space."""
+        return value / self.scale
+
+
+def estimate_text_height(gray: np.ndarray) -> float | None:
+    """
+    Estimate character pixel height from connected components of a binarised,
+    downsampled proxy. Returns the median character height in original pixels,
+    or None when there are too few character-like components to trust.
+    """
+    h, w = gray.shape[:2]
+    probe_scale = min(1.0, _PROBE_MAX_SIDE / max(h, w))
+    probe = gray
+    if probe_scale < 1.0:
+        probe = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA)
+
+    # Dark text on light paper → foreground = text strokes
+    binary = cv2.adaptiveThreshold(
+        probe, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15
+    )
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    stats = stats[1:]  # drop background
+    if len(stats) == 0:
+        return None
+
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    areas = stats[:, cv2.CC_STAT_AREA]
+
+    # Character-like: not specks, not rules/borders, not big blobs
+    is_char = (
+        (heights >= 4)
+        & (heights <= probe.shape[0] * 0.08)
+        & (widths <= heights * 2.5)
+        & (areas >= 8)
+    )
+    if np.count_nonzero(is_char) < 20:
+        return None
+
+    return float(np.median(heights[is_char])) / probe_scale
+
+
+def normalize_resolution(
+    gray: np.ndarray,
+    target_text_height: int = OCR_TARGET_TEXT_HEIGHT,
+    min_width: int = OCR_MIN_WORKING_WIDTH,
+) -> NormalizedImage:
+    """
+    Downscale so text is ~`target_text_height` px tall before denoise/deskew.
+    Never upscales; images with unknown text height are left untouched.
+    """
+    if not target_text_height:
+        return NormalizedImage(gray, 1.0, None)
+
+    text_height = estimate_text_height(gray)
+    if text_height is None:
+        logger.debug("Text height unknown — skipping resolution normalisation")
+        return NormalizedImage(gray, 1.0, None)
+
+    width = gray.shape[1]
+    scale = target_text_height / text_height
+    scale = max(scale, min(1.0, min_width / width))
+
+    if scale >= 0.95:  # not worth a resize
+        return NormalizedImage(gray, 1.0, text_height)
+
+    resized = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    logger.info(
+        f"Normalised resolution: text≈{text_height:.0f}px, "
+        f"{gray.shape[1]}x{gray.shape[0]} → {resized.shape[1]}x{resized.shape[0]} (scale {scale:.2f})"
+    )
+    return NormalizedImage(resized, scale, text_height)
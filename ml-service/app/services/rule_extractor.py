@@ -0,0 +1,308 @@
+"""
+Deterministic fast path for Indomaret / Alfamart receipts.
+
+Most receipts are minimarket slips in one clean columnar layout:
+
+    INDOMARET
+    ...
+    26.03.26-12:09/4.1.10/F0IH-72314/AMEL1/02     (Indomaret: date above the items)
+    MHSUKA HOT LAVA 130      1    9,500    9,500
+    VOUCHER : (4,700)                               → voucher of the item above
+    RINSO ANTINODA          -1    5,000   -5,000    → void of an earlier item
+    RINSO ANTINODA ROSE FRESH 700                   → long name, numbers on the next line
+    1PCSx   24.000=   24.000
+    TOTAL BELANJA : 52,700
+    TUNAI : 60,000
+    KEMBALI : 7,300
+    Tgl : 09/03/2026 10:57:16                       (Alfamart: date under the totals)
+
+The item zone runs from the first item row to the TOTAL line and is found
+independently of the date, which is read from anywhere on the slip.
+
+parse_minimarket reads the reconstruct_lines text of such a slip into the
+same receipt_data schema the LLM returns. The result is only accepted when
+nothing in the item zone was left unparsed and the numbers reconcile —
+arithmetic_cross_check finds no issue and TUNAI − KEMBALI matches the total
+when both are printed. Anything else returns None and the caller falls back
+to the LLM. `rule_stats` keeps the hit rate and the reasons for misses.
+"""
+import os
+import re
+import logging
+from collections import Counter
+from datetime import date
+from difflib import get_close_matches
+from typing import Callable
+
+from app.services.validation import arithmetic_cross_check
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+RULE_EXTRACTOR = os.getenv("RULE_EXTRACTOR", "true").lower() in {"1", "true", "yes"}
+
+BRANDS = ["INDOMARET", "ALFAMART", "ALFAMIDI"]
+_HEADER_SCAN_LINES = 6       # brand must show up near the top...
+_FOOTER_SCAN_LINES = 6       # ...or in the customer-service footer
+
+AMOUNT = r"\(?-?\d{1,3}(?:[.,]\d{3})+\)?|\(?-?\d+\)?"
+_ITEM_LINE = re.compile(
+    rf"^(?:(?P<name>.*?)\s+)?(?P<qty>-?\d{{1,3}})(?i:pcs)?(?i:x)?\s+(?P<price>{AMOUNT})=?\s+(?P<total>{AMOUNT})=?$"
+)
+_DISCOUNT_LINE = re.compile(
+    rf"^(?P<label>voucher|diskon|disc|potongan|hemat)\b[^\d(]*(?P<amount>{AMOUNT})$", re.IGNORECASE
+)
+_TOTAL_LINE = re.compile(rf"^(?:total\s+belanja|grand\s+total|total(?:\s+item\s+\d+)?)\s*:?\s*(?:rp\.?)?\s*(?P<amount>{AMOUNT})$", re.IGNORECASE)
+_PAYMENT_LINE = re.compile(rf"^(?P<label>tunai|kembali|kembalian)\s*:?\s*(?:rp\.?)?\s*(?P<amount>{AMOUNT})$", re.IGNORECASE)
+_SUMMARY_START = re.compile(r"^(?:harga\s+jual|sub\s*total|total|tunai|ppn|dpp)\b", re.IGNORECASE)
+DATE = re.compile(r"(?<!\d)(\d{2})[./-](\d{2})[./-](\d{4}|\d{2})(?!\d)")
+TIME = re.compile(r"(?<!\d)([01]\d|2[0-3])[:.]([0-5]\d)(?::[0-5]\d)?(?!\d)")
+_NUMBER_COLUMN = re.compile(r"(?<![\w.,])\(?-?\d[\d.,]*\)?=?(?![\w.,])")
+_GROUPED_AMOUNT = re.compile(r"(?<![\d.,])\d{1,3}(?:[.,]\d{3})+(?![\d.,])")
+
+
+class RuleStats:
+    def __init__(self, name: str = "Rule extractor"):
+        self.name = name
+        self.attempts = 0
+        self.hits = 0
+        self.misses: Counter[str] = Counter()
+
+    def record(self, hit: bool, reason: str = "") -> None:
+        self.attempts += 1
+        if hit:
+            self.hits += 1
+        else:
+            self.misses[reason] += 1
+        logger.info(
+            f"{self.name} {'hit' if hit else f'miss ({reason})'} — "
+            f"hit rate {self.hit_rate:.0%} over {self.attempts} receipts"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def to_dict(self) -> dict:
+        return {"attempts": self.attempts, "hits": self.hits, "hit_rate": round(self.hit_rate, 4),
+                "misses": dict(self.misses)}
+
+
+rule_stats = RuleStats()
+
+
+class _Reject(Exception):
+    pass
+
+
+def parse_amount(text: str) -> int | None:
+    """'9,500' / '9.500' / '(4,700)' / '-5,000' / '24.000=' → int; None if not an amount."""
+    text = text.strip().rstrip("=").strip()
+    negative = text.startswith("-") or (text.startswith("(") and text.endswith(")"))
+    digits = text.strip("()-")
+    if not re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+|\d+", digits):
+        return None
+    value = int(re.sub(r"[.,]", "", digits))
+    return -value if negative else value
+
+
+def _flatten(line: str) -> str:
+    # reconstruct_lines puts "  |  " between columns; the patterns work on plain tokens
+    return " ".join(line.replace("|", " ").split())
+
+
+def _detect_brand(lines: list[str]) -> str | None:
+    scan = lines[:_HEADER_SCAN_LINES] + lines[-_FOOTER_SCAN_LINES:]
+    for line in scan:
+        for token in re.findall(r"[A-Za-z]{6,}", line):
+            match = get_close_matches(token.upper(), BRANDS, n=1, cutoff=0.8)
+            if match:
+                return match[0]
+    return None
+
+
+def _find_datetime(lines: list[str], pattern: re.Pattern | None = None) -> tuple[int, str | None, str | None]:
+    """
+    Index of the transaction line and its ISO date / HH:MM (DD/MM/YY[YY], day
+    first). `pattern` (groups: day, month, year[, hour, minute]) replaces the
+    generic date search — merchant templates pass their learned date line.
+    """
+    for i, line in enumerate(lines):
+        m = (pattern or DATE).search(line)
+        if not m:
+            continue
+        day, month, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        if year < 100:
+            year += 2000
+        try:
+            iso = date(year, month, day).isoformat()
+        except ValueError:
+            continue
+        if m.re.groups >= 5 and m.group(4):
+            return i, iso, f"{m.group(4)}:{m.group(5)}"
+        t = TIME.search(line, m.end())
+        return i, iso, f"{t.group(1)}:{t.group(2)}" if t else None
+    return -1, None, None
+
+
+def _item(name: str, qty: int, price: int, total: int, categorize: Callable[[str], str]) -> dict:
+    return {
+        "name": {"value": name},
+        "qty": {"value": qty},
+        "price": {"value": price},
+        "total_price": {"value": total},
+        "category": {"value": categorize(name)},
+        "discount_type": {"value": None},
+        "discount_value": {"value": 0},
+        "voucher_amount": {"value": 0},
+    }
+
+
+def _looks_like_amounts(line: str) -> bool:
+    """Price columns the item pattern missed: a thousands-grouped amount or two numeric columns."""
+    return bool(_GROUPED_AMOUNT.search(line)) or len(_NUMBER_COLUMN.findall(line)) >= 2
+
+
+def _parse_items(lines: list[str], categorize: Callable[[str], str]) -> list[dict]:
+    items: list[dict] = []
+    pending_name = ""
+    for line in lines:
+        if re.search(r"\d", pending_name):
+            # "AQUA 600ML" on its own line is only a name if a bare qty/price/total line follows
+            m = _ITEM_LINE.match(line)
+            if not m or m.group("name"):
+                raise _Reject("unparsed_amount_line")
+
+        m = _DISCOUNT_LINE.match(line)
+        if m:
+            amount = parse_amount(m.group("amount"))
+            if not items or amount is None:
+                raise _Reject("orphan_discount")
+            item = items[-1]
+            if m.group("label").lower() == "voucher":
+                item["voucher_amount"]["value"] += abs(amount)
+            else:
+                item["discount_type"]["value"] = "nominal"
+                item["discount_value"]["value"] += abs(amount)
+            item["total_price"]["value"] -= abs(amount)
+            continue
+
+        m = _ITEM_LINE.match(line)
+        if m:
+            name = (m.group("name") or pending_name).strip()
+            pending_name = ""
+            qty, price, total = int(m.group("qty")), parse_amount(m.group("price")), parse_amount(m.group("total"))
+            if not name or price is None or total is None or qty == 0 or abs(qty * price - total) > 1:
+                raise _Reject("item_arithmetic")
+            price = abs(price)
+
+            if qty < 0:
+                # Void: cancels the matching earlier item, else stays as a negative line
+                for prev in reversed(items):
+                    if prev["name"]["value"] == name and prev["price"]["value"] == price and prev["qty"]["value"] >= -qty:
+                        prev["qty"]["value"] += qty
+                        prev["total_price"]["value"] += total
+                        if prev["qty"]["value"] == 0:
+                            items.remove(prev)
+                        break
+                else:
+                    items.append(_item(name, qty, price, total, categorize))
+                continue
+
+            items.append(_item(name, qty, price, total, categorize))
+            continue
+
+        if _looks_like_amounts(line):
+            raise _Reject("unparsed_amount_line")
+        # A long name wraps onto its own line, numbers on the next
+        pending_name = line
+    if re.search(r"\d", pending_name):
+        raise _Reject("unparsed_amount_line")
+    return items
+
+
+def parse_layout(
+    lines: list[str],
+    merchant: str,
+    categorize: Callable[[str], str] = lambda name: "Others",
+    date_pattern: re.Pattern | None = None,
+    total_line: re.Pattern = _TOTAL_LINE,
+) -> tuple[dict | None, str]:
+    """
+    receipt_data for flattened `lines` in the columnar layout, or (None, reason).
+    Items run from the first item row to the payment summary, the date is
+    read from wherever it is printed; the result must pass the reconcile
+    checks described above.
+    """
+    _, iso_date, time_value = _find_datetime(lines, date_pattern)
+    if iso_date is None:
+        return None, "no_date_line"
+
+    start = next((i for i, line in enumerate(lines) if _ITEM_LINE.match(line)), None)
+    if start is None:
+        return None, "no_items"
+    if not _ITEM_LINE.match(lines[start]).group("name") and start > 0:
+        start -= 1      # the first item's name wrapped onto the line above
+
+    end = next(
+        (i for i in range(start + 1, len(lines)) if _SUMMARY_START.match(lines[i]) or total_line.match(lines[i])),
+        None,
+    )
+    if end is None:
+        return None, "no_total"
+
+    try:
+        items = _parse_items(lines[start:end], categorize)
+    except _Reject as e:
+        return None, str(e)
+    if not items:
+        return None, "no_items"
+
+    total = None
+    payments: dict[str, int] = {}
+    for line in lines[end:]:
+        m = total_line.match(line)
+        if m and total is None:
+            total = parse_amount(m.group("amount"))
+            continue
+        m = _PAYMENT_LINE.match(line)
+        if m:
+            label = "kembali" if m.group("label").lower().startswith("kembali") else "tunai"
+            payments.setdefault(label, parse_amount(m.group("amount")) or 0)
+    if not total:
+        return None, "no_total"
+
+    receipt_data = {
+        "merchant_name": {"value": merchant},
+        "date": {"value": iso_date},
+        "time": {"value": time_value},
+        "items": items,
+        "total_amount": {"value": total},
+    }
+
+    if arithmetic_cross_check(receipt_data):
+        return None, "cross_check"
+    if sum(item["total_price"]["value"] for item in items) != total:
+        return None, "sum_mismatch"
+    if "tunai" in payments and "kembali" in payments and payments["tunai"] - payments["kembali"] != total:
+        return None, "payment_mismatch"
+    return receipt_data, "ok"
+
+
+def flatten_lines(text: str) -> list[str]:
+    return [flat for flat in (_flatten(line) for line in text.splitlines()) if flat]
+
+
+def parse_minimarket(text: str, categorize: Callable[[str], str] = lambda name: "Others") -> tuple[dict | None, str]:
+    """
+    receipt_data (without receipt_id) for a minimarket slip, or (None, reason).
+    `text` is reconstruct_lines output; `categorize` maps an item name to a category.
+    """
+    lines = flatten_lines(text)
+    if not lines:
+        return None, "empty"
+
+    brand = _detect_brand(lines)
+    if brand is None:
+        return None, "not_minimarket"
+    return parse_layout(lines, brand, categorize)
@@ -0,0 +1,70 @@
+"""
+Skew angle estimation on a downsampled, binarised copy of the receipt.
+
+The old estimator fed every non-zero pixel of the full working image to
+cv2.minAreaRect — after CLAHE that is nearly every pixel, i.e. hundreds of
+MB of int64 coordinates on a large photo. Here the image is shrunk so its
+long side is ≤ OCR_DESKEW_MAX_SIDE, binarised with a local threshold
+(ink = foreground), and only the ink pixels are kept. Each candidate angle
+rotates those points and scores the horizontal projection profile: level
+text lines give tall, narrow row peaks, so the sum of squared row counts
+is highest at the true skew. A coarse 1° sweep over ±OCR_DESKEW_MAX_ANGLE is refined
+in 0.1° steps around the best angle.
+
+The returned angle uses cv2.getRotationMatrix2D's convention, so the
+caller rotates the full-resolution image exactly once.
+"""
+import os
+
+import cv2
+import numpy as np
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_DESKEW_MAX_SIDE = int(os.getenv("OCR_DESKEW_MAX_SIDE", "800"))
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", "15"))
+
+_COARSE_STEP = 1.0
+_FINE_STEP = 0.1
+_MIN_INK_POINTS = 200
+
+
+def _ink_points(gray: np.ndarray, max_side: int) -> tuple[np.ndarray, np.ndarray]:
+    """(x, y) float32 coords of ink pixels on the downsampled binary image."""
+    h, w = gray.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    small = gray if scale >= 1.0 else cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    # Local threshold: strokes become ink, large flat dark areas (table, shadow) don't
+    binary = cv2.adaptiveThreshold(small, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 15)
+    ys, xs = np.nonzero(binary)
+    return xs.astype(np.float32), ys.astype(np.float32)
+
+
+def _profile_score(xs: np.ndarray, ys: np.ndarray, angle: float) -> float:
+    """Sharpness of the row profile after rotating by `angle` (getRotationMatrix2D sense)."""
+    theta = np.deg2rad(angle)
+    rows = ys * np.float32(np.cos(theta)) - xs * np.float32(np.sin(theta))
+    counts = np.bincount((rows - rows.min()).astype(np.int32))
+    return float(np.dot(counts, counts))
+
+
+def _best_angle(xs: np.ndarray, ys: np.ndarray, angles: np.ndarray) -> float:
+    scores = [_profile_score(xs, ys, a) for a in angles]
+    return float(angles[int(np.argmax(scores))])
+
+
+def estimate_skew_angle(
+    gray: np.ndarray,
+    max_angle: float = OCR_DESKEW_MAX_ANGLE,
+    max_side: int = OCR_DESKEW_MAX_SIDE,
+) -> float:
+    """Degrees to rotate `gray` by (cv2.getRotationMatrix2D) to level its text lines."""
+    xs, ys = _ink_points(gray, max_side)
+    if len(xs) < _MIN_INK_POINTS:
+        return 0.0
+    # Centre the points so rotation doesn't shift them out of a compact histogram
+    xs -= xs.mean()
+    ys -= ys.mean()
+
+    coarse = _best_angle(xs, ys, np.arange(-max_angle, max_angle + _COARSE_STEP / 2, _COARSE_STEP))
+    fine = np.arange(coarse - _COARSE_STEP, coarse + _COARSE_STEP + _FINE_STEP / 2, _FINE_STEP)
+    return round(_best_angle(xs, ys, fine), 2)
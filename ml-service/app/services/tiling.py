@@ -0,0 +1,102 @@
+import os
+import logging
+
+import numpy as np
+
+from app.services.ocr_boxes import OCRBoxes
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_TILING_ENABLED = os.getenv("OCR_TILING", "true").lower() in {"1", "true", "yes"}
+# Only tile images taller than this many widths (long thermal receipts)
+OCR_TILE_MIN_ASPECT = float(os.getenv("OCR_TILE_MIN_ASPECT", "2.5"))
+# Strip height as a multiple of image width — keeps every strip well under
+# RapidOCR's max_side_len so small text is not downscaled away
+OCR_TILE_HEIGHT_RATIO = float(os.getenv("OCR_TILE_HEIGHT_RATIO", "1.5"))
+# Overlap between strips (working-resolution px); must exceed a text line
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "96"))
+OCR_TILE_MAX_TILES = int(os.getenv("OCR_TILE_MAX_TILES", "8"))
+
+
+def needs_tiling(height: int, width: int, min_aspect: float = OCR_TILE_MIN_ASPECT) -> bool:
+    return OCR_TILING_ENABLED and width > 0 and height / width >= min_aspect
+
+
+def plan_tiles(
+    height: int,
+    width: int,
+    height_ratio: float = OCR_TILE_HEIGHT_RATIO,
+    overlap: int = OCR_TILE_OVERLAP,
+    max_tiles: int = OCR_TILE_MAX_TILES,
+) -> list[tuple[int, int]]:
+    """
+    Split [0, height) into overlapping horizontal strips (top, bottom).
+    Strips grow beyond `height_ratio * width` only when `max_tiles` would be exceeded.
+    """
+    tile_height = max(int(width * height_ratio), overlap * 3)
+    step = tile_height - overlap
+    count = max(1, -(-(height - overlap) // step))  # ceil
+    if count > max_tiles:
+        count = max_tiles
+        step = -(-(height - overlap) // count)
+        tile_height = step + overlap
+
+    tiles = []
+    for i in range(count):
+        top = i * step
+        bottom = min(height, top + tile_height)
+        if i == count - 1:
+            bottom = height
+        tiles.append((top, bottom))
+    return tiles
+
+
+def _iou(a: list[float], b: list[float]) -> float:
+    """IoU of two [x, y, width, height] rows."""
+    ix = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    iy = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def merge_tile_boxes(tile_boxes: list[tuple[tuple[int, int], OCRBoxes]], overlap: int = OCR_TILE_OVERLAP) -> OCRBoxes:
+    """
+    Merge per-strip boxes (already offset into full-image coordinates).
+
+    Each strip owns the band between the midpoints of its overlaps; a box is
+    kept only by the strip that owns its center-Y, so a line cut by one
+    strip's edge is taken from the neighbour that saw it whole. Any remaining
+    near-duplicates at the seams (IoU > 0.5) keep the higher-confidence box.
+    """
+    owned = []
+    last = len(tile_boxes) - 1
+    for i, ((top, bottom), boxes) in enumerate(tile_boxes):
+        own_top = top + overlap / 2 if i > 0 else float("-inf")
+        own_bottom = bottom - overlap / 2 if i < last else float("inf")
+        center_y = boxes.y + boxes.height / 2
+        owned.append(boxes[(center_y >= own_top) & (center_y < own_bottom)])
+
+    merged = OCRBoxes.concat(owned).sorted()
+    coords = merged.coords.tolist()
+    confidences = merged.confidences.tolist()
+    deduped: list[int] = []
+    for i in range(len(merged)):
+        duplicate = None
+        # Only boxes within one line height above can overlap — scan back briefly
+        for slot in range(len(deduped) - 1, max(-1, len(deduped) - 9), -1):
+            if _iou(coords[deduped[slot]], coords[i]) > 0.5:
+                duplicate = slot
+                break
+        if duplicate is None:
+            deduped.append(i)
+        elif confidences[i] > confidences[deduped[duplicate]]:
+            deduped[duplicate] = i
+
+    if len(deduped) != len(merged):
+        logger.debug(f"Tile merge dropped {len(merged) - len(deduped)} seam duplicates")
+        return merged[np.asarray(deduped, dtype=np.intp)]
+    return merged
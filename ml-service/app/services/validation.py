@@ -1,6 +1,8 @@
 import re
 import logging
 
+from app.services.ocr_boxes import OCRBoxes
+
 logger = logging.getLogger(__name__)
 
 # ── Field risk classification ──────────────────────────────────────────────────
@@ -45,7 +47,7 @@ def is_valid_ocr_text(raw_text: str) -> tuple[bool, str]:
     return True, "OK"
 
 
-def match_field_confidence(field_value, ocr_boxes: list, field_name: str = "") -> float:
+def match_field_confidence(field_value, ocr_boxes: OCRBoxes, field_name: str = "") -> float:
     """
     Match LLM-extracted field value against OCR boxes.
     Handles 3 cases:
@@ -56,6 +58,7 @@ def match_field_confidence(field_value, ocr_boxes: list, field_name: str = "") -
     if not field_value or not ocr_boxes:
         return 0.0
 
+    ocr_boxes = OCRBoxes.coerce(ocr_boxes)
     field_str = str(field_value).strip().lower()
 
     # ── Numeric fields: normalize before matching ──────────────────────────
@@ -71,7 +74,7 @@ def match_field_confidence(field_value, ocr_boxes: list, field_name: str = "") -
     return _match_text_confidence(field_str, ocr_boxes)
 
 
-def _match_text_confidence(field_str: str, ocr_boxes: list) -> float:
+def _match_text_confidence(field_str: str, ocr_boxes: OCRBoxes) -> float:
     """
     For multi-word fields like "KITA SAYUR WARUNG":
     Split into tokens, find each token in boxes, return average confidence
@@ -82,17 +85,18 @@ def _match_text_confidence(field_str: str, ocr_boxes: list) -> float:
         return 0.0
 
     matched_confidences = []
+    box_texts = [t.strip().upper() for t in ocr_boxes.texts]
+    confidences = ocr_boxes.confidences.tolist()
 
     for token in tokens:
         if len(token) <= 2:  # skip noise tokens like "x", "rp"
             continue
 
         best_match = 0.0
-        for box in ocr_boxes:
-            box_text = box["text"].strip().upper()
+        for box_text, confidence in zip(box_texts, confidences):
             # Token fully contained in box or box fully contained in token
             if token in box_text or box_text in token:
-                best_match = max(best_match, box["confidence"])
+                best_match = max(best_match, confidence)
 
         if best_match > 0:
             matched_confidences.append(best_match)
@@ -108,7 +112,7 @@ def _match_text_confidence(field_str: str, ocr_boxes: list) -> float:
     return avg_conf * coverage  # penalize partial matches
 
 
-def _match_numeric_confidence(field_value, ocr_boxes: list) -> float:
+def _match_numeric_confidence(field_value, ocr_boxes: OCRBoxes) -> float:
     """
     For numeric fields: normalize value and box texts, then compare.
     "24000" should match "24.000=", "24.", ".000"
@@ -120,19 +124,19 @@ def _match_numeric_confidence(field_value, ocr_boxes: list) -> float:
         return 0.0
 
     best_conf = 0.0
-    for box in ocr_boxes:
-        box_digits = re.sub(r'[^\d]', '', box["text"])
+    for text, confidence in zip(ocr_boxes.texts, ocr_boxes.confidences.tolist()):
+        box_digits = re.sub(r'[^\d]', '', text)
         if not box_digits:
             continue
 
         # Check if box digits are a substring of target, or target is in box
         if box_digits in target_digits or target_digits in box_digits:
-            best_conf = max(best_conf, box["confidence"])
+            best_conf = max(best_conf, confidence)
 
     return best_conf
 
 
-def _match_date_confidence(field_str: str, ocr_boxes: list) -> float:
+def _match_date_confidence(field_str: str, ocr_boxes: OCRBoxes) -> float:
     """
     Date "2026-02-15" should match OCR boxes "Tg1.15/02/" and "/2026".
     Extract numeric fragments and match against boxes.
@@ -143,10 +147,11 @@ def _match_date_confidence(field_str: str, ocr_boxes: list) -> float:
         return 0.0
 
     matched = []
+    confidences = ocr_boxes.confidences.tolist()
     for part in parts:
-        for box in ocr_boxes:
-            if part in box["text"] or part in re.sub(r'[^\d]', '', box["text"]):
-                matched.append(box["confidence"])
+        for text, confidence in zip(ocr_boxes.texts, confidences):
+            if part in text or part in re.sub(r'[^\d]', '', text):
+                matched.append(confidence)
                 break
 
     if not matched:
@@ -275,93 +280,125 @@ def arithmetic_cross_check(response_data: dict) -> list[dict]:
 
     return issues
 
-def determine_receipt_status(response_data: dict, ocr_boxes: list) -> dict:
+HEADER_FIELDS = ["merchant_name", "date", "time", "total_amount"]
+ITEM_SUB_FIELDS = ["name", "price", "qty"]
+
+
+def _low_confidence_entry(field: str, result: dict) -> dict | None:
+    if result["status"] == "VERIFIED":
+        return None
+    return {
+        "field": field,
+        "confidence": result["ocr_confidence"],
+        "status": result["status"],
+        "value": result["value"],
+    }
+
+
+class ReceiptScorer:
     """
-    Classify each field using REAL RapidOCR confidence scores,
-    not LLM self-reported confidence.
+    determine_receipt_status, fed one field / item at a time.
+
+    While the LLM response streams in, header fields and finished items are
+    scored as they arrive (add_field / add_item); finish() scores whatever
+    is left or changed in the final response and assembles the same result
+    determine_receipt_status gives for it.
     """
-    field_results = {}
-    low_confidence_fields = []
-
-    # ── Header fields ──────────────────────────────────────────────────────────
-    header_fields = ["merchant_name", "date", "time", "total_amount"]
-    for field in header_fields:
-        if field not in response_data:
-            field_results[field] = {"status": "ACTION_REQUIRED", "reason": "field_missing"}
-            continue
 
-        value = response_data[field].get("value")
-        real_conf = match_field_confidence(str(value), ocr_boxes, field_name=field)
-        status = classify_field_status(real_conf, field)
+    def __init__(self, ocr_boxes: OCRBoxes):
+        self.ocr_boxes = OCRBoxes.coerce(ocr_boxes)
+        self._fields: dict[str, tuple[object, dict]] = {}          # field → (value, result)
+        self._items: dict[int, tuple[dict, dict[str, dict]]] = {}  # index → (item, sub-field results)
 
-        field_results[field] = {
+    def _score(self, value, field_name: str, threshold_key: str) -> dict:
+        real_conf = match_field_confidence(str(value), self.ocr_boxes, field_name=field_name)
+        return {
             "value": value,
             "ocr_confidence": real_conf,  # real score from RapidOCR
-            "status": status,
+            "status": classify_field_status(real_conf, threshold_key),
         }
 
-        if status != "VERIFIED":
-            low_confidence_fields.append({
-                "field": field,
-                "confidence": real_conf,
-                "status": status,
-                "value": value,
-            })
-
-    # ── Items ──────────────────────────────────────────────────────────────────
-    for i, item in enumerate(response_data.get("items", [])):
-        for sub_field in ["name", "price", "qty"]:
+    def add_field(self, field: str, data: dict) -> dict:
+        value = data.get("value")
+        cached = self._fields.get(field)
+        if cached is not None and cached[0] == value:
+            return cached[1]
+        result = self._score(value, field, field)
+        self._fields[field] = (value, result)
+        return result
+
+    def add_item(self, index: int, item: dict) -> dict[str, dict]:
+        cached = self._items.get(index)
+        if cached is not None and cached[0] == item:
+            return cached[1]
+        results = {}
+        for sub_field in ITEM_SUB_FIELDS:
             if sub_field not in item:
                 continue
-
-            value = item[sub_field].get("value")
-            real_conf = match_field_confidence(str(value), ocr_boxes, field_name=sub_field)
-            
             # Map item sub-field to threshold key
             threshold_key = "items" if sub_field == "name" else sub_field
-            status = classify_field_status(real_conf, threshold_key)
-
-            field_key = f"items[{i}].{sub_field}"
-            field_results[field_key] = {
-                "value": value,
-                "ocr_confidence": real_conf,
-                "status": status,
-            }
-
-            if status != "VERIFIED":
-                low_confidence_fields.append({
-                    "field": field_key,
-                    "confidence": real_conf,
-                    "status": status,
-                    "value": value,
-                })
-
-    if not response_data.get("items"):
-        low_confidence_fields.append({
-            "field": "items",
-            "confidence": 0.0,
-            "status": "ACTION_REQUIRED",
-            "value": [],
-            "reason": "No items extracted by LLM"
-        })
-    
-    arithmetic_issues = arithmetic_cross_check(response_data)
-    low_confidence_fields.extend(arithmetic_issues)
+            results[sub_field] = self._score(item[sub_field].get("value"), sub_field, threshold_key)
+        self._items[index] = (item, results)
+        return results
+
+    def finish(self, response_data: dict) -> dict:
+        field_results = {}
+        low_confidence_fields = []
+
+        # ── Header fields ──────────────────────────────────────────────────────
+        for field in HEADER_FIELDS:
+            if field not in response_data:
+                field_results[field] = {"status": "ACTION_REQUIRED", "reason": "field_missing"}
+                continue
+            result = self.add_field(field, response_data[field])
+            field_results[field] = result
+            entry = _low_confidence_entry(field, result)
+            if entry:
+                low_confidence_fields.append(entry)
+
+        # ── Items ──────────────────────────────────────────────────────────────
+        for i, item in enumerate(response_data.get("items", [])):
+            for sub_field, result in self.add_item(i, item).items():
+                field_key = f"items[{i}].{sub_field}"
+                field_results[field_key] = result
+                entry = _low_confidence_entry(field_key, result)
+                if entry:
+                    low_confidence_fields.append(entry)
+
+        if not response_data.get("items"):
+            low_confidence_fields.append({
+                "field": "items",
+                "confidence": 0.0,
+                "status": "ACTION_REQUIRED",
+                "value": [],
+                "reason": "No items extracted by LLM"
+            })
 
-    # ── Overall receipt status (weighted by field risk) ────────────────────────
-    high_risk_failed = any(
-        f["field"] in HIGH_RISK_FIELDS and f["status"] == "ACTION_REQUIRED"
-        for f in low_confidence_fields
-    )
+        arithmetic_issues = arithmetic_cross_check(response_data)
+        low_confidence_fields.extend(arithmetic_issues)
 
-    if not low_confidence_fields:
-        overall_status = "VERIFIED"
-    else:
-        overall_status = "ACTION_REQUIRED"
+        # ── Overall receipt status (weighted by field risk) ────────────────────
+        high_risk_failed = any(
+            f["field"] in HIGH_RISK_FIELDS and f["status"] == "ACTION_REQUIRED"
+            for f in low_confidence_fields
+        )
 
-    return {
-        "status": overall_status,
-        "field_results": field_results,
-        "low_confidence_fields": low_confidence_fields,
-        "requires_review": len(low_confidence_fields) > 0,
-    }
+        if not low_confidence_fields:
+            overall_status = "VERIFIED"
+        else:
+            overall_status = "ACTION_REQUIRED"
+
+        return {
+            "status": overall_status,
+            "field_results": field_results,
+            "low_confidence_fields": low_confidence_fields,
+            "requires_review": len(low_confidence_fields) > 0,
+        }
+
+
+def determine_receipt_status(response_data: dict, ocr_boxes: OCRBoxes) -> dict:
+    """
+    Classify each field using REAL RapidOCR confidence scores,
+    not LLM self-reported confidence.
+    """
+    return ReceiptScorer(ocr_boxes).finish(response_data)
@@ -0,0 +1,92 @@
+"""
+Raw vs preprocessed OCR variant racing (opt-in: OCR_VARIANT_RACE=true).
+
+should_preprocess picks one path from fixed blur/brightness/contrast
+thresholds; when it guesses wrong the LLM call and the human review that
+follow are wasted. In race mode both paths run at once on separate pool
+workers and are scored by how much confident text they read:
+
+    score = (boxes with confidence ≥ OCR_RACE_MIN_BOX_CONF) × their mean confidence
+
+The first variant to finish wins outright when it is already decisive
+(mean confidence ≥ OCR_RACE_ACCEPT_CONF over ≥ OCR_RACE_MIN_BOXES boxes);
+otherwise the other variant is awaited and the higher score wins.
+
+Every race is appended to OCR_RACE_LOG (JSONL) with the image's quality
+metrics, what should_preprocess would have chosen and which path won —
+see benchmarks/tune_preprocess.py for fitting the thresholds to it.
+"""
+import os
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from app.services.ocr_boxes import OCRBoxes
+
+logger = logging.getLogger(__name__)
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+OCR_VARIANT_RACE = os.getenv("OCR_VARIANT_RACE", "false").lower() in {"1", "true", "yes"}
+OCR_RACE_MIN_BOX_CONF = float(os.getenv("OCR_RACE_MIN_BOX_CONF", "0.5"))
+OCR_RACE_ACCEPT_CONF = float(os.getenv("OCR_RACE_ACCEPT_CONF", "0.93"))
+OCR_RACE_MIN_BOXES = int(os.getenv("OCR_RACE_MIN_BOXES", "10"))
+OCR_RACE_LOG = os.getenv("OCR_RACE_LOG", "ocr_race_outcomes.jsonl")   # empty disables
+
+VARIANTS = {"raw": False, "preprocessed": True}   # variant name → preprocess flag
+
+
+@dataclass
+class VariantScore:
+    boxes: int              # boxes counted (confidence ≥ OCR_RACE_MIN_BOX_CONF)
+    mean_confidence: float
+    score: float
+
+    def to_dict(self) -> dict:
+        return {"boxes": self.boxes, "mean_confidence": round(self.mean_confidence, 4), "score": round(self.score, 3)}
+
+
+def score_variant(boxes: OCRBoxes) -> VariantScore:
+    confident = boxes[boxes.confidences >= OCR_RACE_MIN_BOX_CONF]
+    mean = confident.mean_confidence()
+    return VariantScore(len(confident), mean, len(confident) * mean)
+
+
+def is_decisive(score: VariantScore) -> bool:
+    """Good enough to stop waiting for the other variant."""
+    return score.boxes >= OCR_RACE_MIN_BOXES and score.mean_confidence >= OCR_RACE_ACCEPT_CONF
+
+
+def pick_winner(scores: dict[str, VariantScore]) -> str:
+    """Higher score wins; ties go to the preprocessed path (the pipeline's default)."""
+    return max(scores, key=lambda name: (scores[name].score, name == "preprocessed"))
+
+
+def record_outcome(
+    source_label: str,
+    quality: dict | None,
+    predicted: str | None,
+    winner: str,
+    scores: dict[str, VariantScore],
+    early: bool,
+) -> None:
+    """Append one race to OCR_RACE_LOG. Never raises — tuning data is best-effort."""
+    if not OCR_RACE_LOG:
+        return
+    entry = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "source": source_label,
+        "quality": quality,
+        "predicted": predicted,
+        "winner": winner,
+        "early": early,
+        "scores": {name: s.to_dict() for name, s in scores.items()},
+    }
+    try:
+        path = Path(OCR_RACE_LOG)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not record OCR race outcome: {e}")
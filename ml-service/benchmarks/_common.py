@@ -0,0 +1,56 @@
+"""Shared helpers for the benchmark scripts (corpus loading, quiet runs, tables)."""
+import contextlib
+import io
+import logging
+import statistics
+from pathlib import Path
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def load_corpus(path: str | Path, limit: int | None = None) -> list[tuple[str, bytes]]:
+    """Read every receipt image under `path` as raw encoded bytes."""
+    root = Path(path)
+    files = sorted(p for p in root.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    if limit:
+        files = files[:limit]
+    if not files:
+        raise SystemExit(f"No receipt images found under {root}")
+    return [(str(p.relative_to(root)), p.read_bytes()) for p in files]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the pipeline's debug prints and INFO logs while timing."""
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        root.setLevel(level)
+
+
+def mean_confidence(boxes) -> float:
+    confidences = [b.confidence for b in boxes]
+    return statistics.fmean(confidences) if confidences else 0.0
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_table(headers: list[str], rows: list[list]) -> None:
+    cells = [[str(h) for h in headers]] + [
+        [f"{v:.3f}" if isinstance(v, float) else str(v) for v in row] for row in rows
+    ]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(headers))]
+    for n, row in enumerate(cells):
+        print("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+        if n == 0:
+            print("  ".join("-" * w for w in widths))
@@ -0,0 +1,86 @@
+"""
+Aggregate OCR throughput under concurrent receipts: unsharded vs core-sharded.
+
+    uv run python -m benchmarks.bench_concurrency path/to/receipts --levels 1 2 4 8 --rounds 4
+
+For each concurrency level C, C clients each push `rounds` receipts through
+a C-worker pool, back to back:
+
+    current  — every engine uses the profile's thread count (-1 = all cores),
+               so C sessions oversubscribe the CPU
+    sharded  — cores split across C sessions (CoreSharder plan for C),
+               optionally pinned to disjoint core slices with --pin
+
+Reported: receipts/s across all clients, p50/p99 per-receipt latency.
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.core_sharding import CoreSharder, available_cores
+from app.services.ocr_pool import OCRWorkerPool
+from app.services.ocr_services import run_ocr_pipeline, warm_engine
+from benchmarks._common import load_corpus, percentile, print_table, quiet
+
+
+async def run_level(corpus, concurrency: int, rounds: int, mode: str, sharder: CoreSharder | None):
+    pool = OCRWorkerPool(
+        mode=mode,
+        size=concurrency,
+        queue_size=concurrency * rounds,
+        max_jobs=0,
+        initializer=warm_engine,
+        sharder=sharder,
+    )
+    await pool.start()
+    latencies: list[float] = []
+
+    async def client(offset: int) -> None:
+        for i in range(rounds):
+            _, data = corpus[(offset + i) % len(corpus)]
+            started = time.perf_counter()
+            await pool.run(run_ocr_pipeline, data)
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(c * rounds) for c in range(concurrency)))
+        wall = time.perf_counter() - started
+    finally:
+        await pool.close()
+    return len(latencies) / wall, percentile(latencies, 50), percentile(latencies, 99)
+
+
+async def main_async(args) -> None:
+    corpus = load_corpus(args.corpus, args.limit)
+    cores = available_cores()
+    print(f"{len(corpus)} receipts, {len(cores)} cores, {args.mode} workers, {args.rounds} receipts per client")
+
+    rows = []
+    for level in args.levels:
+        for setup in ("current", "sharded"):
+            sharder = None
+            if setup == "sharded":
+                # Fixed plan for this level — no re-planning mid-run
+                sharder = CoreSharder(max_sessions=level, cores=cores, pin=args.pin, replan_interval=float("inf"))
+            with quiet():
+                throughput, p50, p99 = await run_level(corpus, level, args.rounds, args.mode, sharder)
+            plan = f"{sharder.plan.sessions}x{sharder.plan.threads}t" if sharder else "-"
+            rows.append([level, setup, plan, throughput, p50 * 1000, p99 * 1000])
+
+    print_table(["clients", "setup", "plan", "receipts/s", "p50 ms", "p99 ms"], rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of receipt photos")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=4, help="receipts per client")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--pin", action="store_true", help="pin sharded workers to disjoint cores")
+    parser.add_argument("--limit", type=int, default=None)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
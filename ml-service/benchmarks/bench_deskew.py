@@ -0,0 +1,84 @@
+"""
+Deskew angle estimation: legacy minAreaRect over every pixel vs the
+downsampled projection-profile search (skew.estimate_skew_angle).
+
+    uv run python -m benchmarks.bench_deskew path/to/receipts --tilts -7 -2 0 3
+
+Each receipt is converted to gray + CLAHE at full resolution (what deskew
+sees without resolution normalisation), rotated by each known tilt, and
+both estimators are timed on it. Reported: mean/p95 ms, peak numpy
+allocation (tracemalloc) and mean absolute angle error vs the applied tilt.
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from app.services.skew import estimate_skew_angle
+from benchmarks._common import load_corpus, percentile, print_table
+
+
+def legacy_skew_angle(image: np.ndarray) -> float:
+    """The pre-projection-profile estimator, angle part only."""
+    inverted = cv2.bitwise_not(image)
+    coords = np.column_stack(np.where(inverted > 0))
+    if len(coords) == 0:
+        return 0.0
+    angle = cv2.minAreaRect(coords)[-1]
+    return -(90 + angle) if angle < -45 else -angle
+
+
+def measure(estimator, image: np.ndarray) -> tuple[float, float, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    angle = estimator(image)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return angle, elapsed, peak / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of receipt photos")
+    parser.add_argument("--tilts", type=float, nargs="+", default=[-7.0, -2.0, 0.0, 3.0])
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    estimators = {"legacy minAreaRect": legacy_skew_angle, "projection profile": estimate_skew_angle}
+    stats = {name: ([], [], []) for name in estimators}
+
+    for _, data in corpus:
+        gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        gray = clahe.apply(gray)
+        h, w = gray.shape
+        for tilt in args.tilts:
+            M = cv2.getRotationMatrix2D((w // 2, h // 2), tilt, 1.0)
+            tilted = cv2.warpAffine(gray, M, (w, h), borderMode=cv2.BORDER_REPLICATE)
+            for name, estimator in estimators.items():
+                angle, elapsed, peak = measure(estimator, tilted)
+                times, peaks, errors = stats[name]
+                times.append(elapsed)
+                peaks.append(peak)
+                # Estimators return the correcting rotation, i.e. -tilt
+                errors.append(abs(angle + tilt))
+
+    print(f"{len(corpus)} receipts × {len(args.tilts)} tilts")
+    print_table(
+        ["estimator", "mean ms", "p95 ms", "peak MB", "mean |err|°"],
+        [
+            [name, statistics.fmean(t) * 1000, percentile(t, 95) * 1000, max(p), statistics.fmean(e)]
+            for name, (t, p, e) in stats.items()
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
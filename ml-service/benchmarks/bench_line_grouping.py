@@ -0,0 +1,73 @@
+"""
+Speed of the sweep-line line grouping engine vs the original quadratic loops
+(tests/line_grouping_reference.py, also what tests/test_line_grouping.py
+checks equivalence against). Run from ml-service/:
+
+    uv run python -m benchmarks.bench_line_grouping --sizes 50 150 300 600
+
+Boxes are synthetic receipt layouts (jittered rows, 1-4 columns). Also
+re-checks equivalence on --cases random layouts and exits non-zero if any
+output differs from the reference.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+if not __package__:
+    # Also runnable as `python benchmarks/bench_line_grouping.py` from anywhere
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.line_grouping import reconstruct_lines_by_center, reconstruct_lines_by_overlap
+from benchmarks._common import print_table
+from tests.line_grouping_reference import ref_center_lines, ref_overlap_lines, synthetic_receipt
+
+
+def _time(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 150, 300, 600])
+    parser.add_argument("--cases", type=int, default=200, help="random layouts checked for equivalence")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    mismatches = 0
+    for _ in range(args.cases):
+        boxes = synthetic_receipt(rng.randint(0, 120), rng)
+        dicts = [vars(b) for b in boxes]
+        tolerance = rng.uniform(4, 15)
+        if reconstruct_lines_by_overlap(boxes) != ref_overlap_lines(boxes):
+            mismatches += 1
+        if reconstruct_lines_by_center(dicts, tolerance) != ref_center_lines(dicts, tolerance):
+            mismatches += 1
+    print(f"equivalence: {2 * args.cases - mismatches}/{2 * args.cases} identical")
+
+    rows = []
+    for n in args.sizes:
+        boxes = synthetic_receipt(n, rng)
+        dicts = [vars(b) for b in boxes]
+        rows.append([
+            n,
+            _time(ref_overlap_lines, boxes) * 1000,
+            _time(reconstruct_lines_by_overlap, boxes) * 1000,
+            _time(ref_center_lines, dicts, 9) * 1000,
+            _time(reconstruct_lines_by_center, dicts, 9) * 1000,
+        ])
+    print_table(["boxes", "overlap ref ms", "overlap sweep ms", "center ref ms", "center sweep ms"], rows)
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Prompt size: legacy OCR section (coordinate dump + raw_text) vs the compressor.
+
+    uv run python -m benchmarks.bench_prompt path/to/receipts
+    uv run python -m benchmarks.bench_prompt --log llm_prompt_stats.jsonl
+
+With a corpus, every receipt is OCR'd and both prompts are assembled (no
+LLM call). Reported: estimated tokens of the OCR section and the whole
+prompt (mean / p95), lines dropped per receipt and how often the budget
+was exceeded. With --log, LLM_PROMPT_LOG is summarised per prompt mode:
+mean prompt tokens against the share of receipts scored VERIFIED — run
+once with LLM_PROMPT_MODE=legacy to get the accuracy baseline.
+"""
+import argparse
+import json
+import statistics
+from collections import defaultdict
+
+from app.services.ai_services import build_llm_input, build_prompt, get_category_prompt
+from app.services.ocr_services import get_engine, run_ocr_pipeline
+from app.services.prompt_compressor import LLM_PROMPT_TOKEN_BUDGET, compress_ocr_input, estimate_tokens
+from benchmarks._common import load_corpus, percentile, print_table, quiet
+
+
+def bench_corpus(path: str, limit: int | None) -> None:
+    corpus = load_corpus(path, limit)
+    with quiet():
+        get_engine()
+
+    sizes: dict[str, list[tuple[int, int]]] = {"legacy": [], "compact": []}   # (OCR section, prompt)
+    dropped, over = [], 0
+    for name, data in corpus:
+        with quiet():
+            result = run_ocr_pipeline(data)
+        if not result.boxes:
+            continue
+        category_section = get_category_prompt(result.raw_text)
+
+        legacy = (
+            f"{build_llm_input(result.boxes)}\n\n"
+            f"=== FULL RECONSTRUCTED TEXT (all lines, no filtering) ===\n"
+            f"{result.raw_text}"
+        )
+        sizes["legacy"].append((estimate_tokens(legacy), estimate_tokens(build_prompt(legacy, category_section, name))))
+
+        overhead = estimate_tokens(build_prompt("", category_section, name))
+        section, stats = compress_ocr_input(result.raw_text, result.boxes, LLM_PROMPT_TOKEN_BUDGET - overhead)
+        prompt_tokens = estimate_tokens(build_prompt(section, category_section, name))
+        sizes["compact"].append((stats.ocr_tokens, prompt_tokens))
+        dropped.append(stats.lines - stats.kept_lines)
+        over += prompt_tokens > LLM_PROMPT_TOKEN_BUDGET
+
+    if not dropped:
+        raise SystemExit("No receipt produced OCR boxes")
+    print(f"{len(dropped)} receipts, budget {LLM_PROMPT_TOKEN_BUDGET} tokens, "
+          f"{statistics.fmean(dropped):.1f} lines dropped per receipt, {over} over budget")
+    rows = []
+    for mode, runs in sizes.items():
+        ocr = [r[0] for r in runs]
+        prompt = [r[1] for r in runs]
+        rows.append([mode, statistics.fmean(ocr), percentile(ocr, 95), statistics.fmean(prompt), percentile(prompt, 95)])
+    print_table(["mode", "OCR tokens", "p95", "prompt tokens", "p95"], rows)
+
+
+def summarise_log(path: str) -> None:
+    by_mode: dict[str, list[dict]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                by_mode[entry["mode"]].append(entry)
+
+    rows = []
+    for mode, entries in sorted(by_mode.items()):
+        rows.append([
+            mode, len(entries),
+            statistics.fmean(e["prompt_tokens"] for e in entries),
+            statistics.fmean(e["ocr_tokens"] for e in entries),
+            sum(e["status"] == "VERIFIED" for e in entries) / len(entries),
+            sum(e["status"] == "parse_failed" for e in entries) / len(entries),
+        ])
+    print_table(["mode", "receipts", "prompt tokens", "OCR tokens", "verified", "parse failed"], rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="directory of receipt photos")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--log", help="summarise an LLM_PROMPT_LOG file instead")
+    args = parser.parse_args()
+
+    if args.log:
+        summarise_log(args.log)
+    elif args.corpus:
+        bench_corpus(args.corpus, args.limit)
+    else:
+        parser.error("give a corpus directory or --log")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Latency vs accuracy of resolution normalisation ahead of denoise/deskew.
+
+    uv run python -m benchmarks.bench_resolution path/to/receipts --targets 0 24 32 40
+
+Target 0 is the full-resolution baseline. Accuracy is reported as mean box
+confidence, box count, and similarity of raw_text to the baseline output.
+Only images that take the preprocessing branch are affected by the target.
+"""
+import argparse
+import difflib
+import statistics
+import time
+
+from app.services.ocr_services import run_ocr_pipeline, warm_engine
+from benchmarks._common import load_corpus, mean_confidence, percentile, print_table, quiet
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of receipt photos")
+    parser.add_argument("--targets", type=int, nargs="+", default=[0, 24, 32, 40],
+                        help="target text heights in px (0 = no normalisation)")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    targets = [0] + [t for t in args.targets if t != 0]
+    warm_engine()
+
+    baseline_text: dict[str, str] = {}
+    rows = []
+    for target in targets:
+        totals, preprocess, ocr, confs, box_counts, similarity = [], [], [], [], [], []
+        for name, data in corpus:
+            with quiet():
+                started = time.perf_counter()
+                result = run_ocr_pipeline(data, target_text_height=target)
+                totals.append(time.perf_counter() - started)
+
+            timings = result.timings or {}
+            preprocess.append(timings.get("preprocess", 0.0))
+            ocr.append(timings.get("ocr", 0.0))
+            confs.append(mean_confidence(result.boxes))
+            box_counts.append(len(result.boxes))
+
+            if target == 0:
+                baseline_text[name] = result.raw_text
+            else:
+                similarity.append(
+                    difflib.SequenceMatcher(None, baseline_text.get(name, ""), result.raw_text).ratio()
+                )
+
+        rows.append([
+            target or "full-res",
+            percentile(totals, 50) * 1000,
+            percentile(totals, 95) * 1000,
+            statistics.fmean(preprocess) * 1000,
+            statistics.fmean(ocr) * 1000,
+            statistics.fmean(confs),
+            statistics.fmean(box_counts),
+            statistics.fmean(similarity) if similarity else 1.0,
+        ])
+
+    print(f"{len(corpus)} receipts")
+    print_table(
+        ["text_px", "p50 ms", "p95 ms", "preproc ms", "ocr ms", "mean conf", "boxes", "text sim"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
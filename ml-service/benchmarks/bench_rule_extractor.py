@@ -0,0 +1,57 @@
+"""
+Hit rate and latency of the rule-based minimarket extractor.
+
+    uv run python -m benchmarks.bench_rule_extractor path/to/receipts
+
+Every receipt is OCR'd and its reconstruct_lines text handed to
+parse_minimarket (no LLM call). Reported: how many receipts the fast path
+accepts, the miss reasons, and parse time per receipt.
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from app.services.ai_services import guess_category, reconstruct_lines
+from app.services.ocr_services import get_engine, run_ocr_pipeline
+from app.services.rule_extractor import parse_minimarket
+from benchmarks._common import load_corpus, percentile, print_table, quiet
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of receipt photos")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="print the outcome per receipt")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    with quiet():
+        get_engine()
+
+    reasons: Counter[str] = Counter()
+    seconds = []
+    for name, data in corpus:
+        with quiet():
+            result = run_ocr_pipeline(data)
+        if not result.boxes:
+            reasons["no_text"] += 1
+            continue
+        text = reconstruct_lines(result.boxes)
+        started = time.perf_counter()
+        receipt_data, reason = parse_minimarket(text, categorize=guess_category)
+        seconds.append(time.perf_counter() - started)
+        reasons[reason] += 1
+        if args.verbose:
+            total = receipt_data["total_amount"]["value"] if receipt_data else "-"
+            print(f"{name}: {reason} (total {total})")
+
+    hits = reasons["ok"]
+    print(f"{len(corpus)} receipts, {hits} accepted by the fast path ({hits / len(corpus):.0%})")
+    if seconds:
+        print(f"parse time: mean {statistics.fmean(seconds) * 1e6:.0f}µs, p95 {percentile(seconds, 95) * 1e6:.0f}µs")
+    print_table(["outcome", "receipts"], [[reason, count] for reason, count in reasons.most_common()])
+
+
+if __name__ == "__main__":
+    main()
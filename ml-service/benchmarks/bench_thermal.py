@@ -0,0 +1,66 @@
+"""
+Thermal-paper binarisation vs the denoise + CLAHE chain.
+
+    uv run python -m benchmarks.bench_thermal path/to/receipts
+
+Every receipt goes through the preprocessed path twice — once with
+fastNlMeansDenoising + CLAHE, once with Sauvola binarisation (binarize) —
+and the prepared image is OCR'd. Reported per chain: preprocessing
+latency (mean / p95), mean box confidence and box count, over all
+receipts and over the ones auto-detection would route to the thermal path.
+"""
+import argparse
+import statistics
+
+import cv2
+
+from app.services.binarize import looks_like_thermal
+from app.services.ocr_services import get_engine, load_image, prepare_image, recognize_boxes
+from benchmarks._common import load_corpus, percentile, print_table, quiet
+
+CHAINS = {"denoise + CLAHE": False, "sauvola": True}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of receipt photos")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    with quiet():
+        get_engine()
+
+    # chain → list of (is_thermal, preprocess seconds, mean confidence, boxes)
+    runs: dict[str, list[tuple[bool, float, float, int]]] = {name: [] for name in CHAINS}
+    for name, data in corpus:
+        img = load_image(data)
+        if img is None:
+            continue
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        thermal = looks_like_thermal(gray, img)
+        for chain, binarize in CHAINS.items():
+            with quiet():
+                prepared = prepare_image(data, preprocess=True, thermal=binarize)
+                boxes = recognize_boxes(prepared.image)
+            runs[chain].append((thermal, prepared.timings["preprocess"], boxes.mean_confidence(), len(boxes)))
+
+    detected = sum(r[0] for r in runs["sauvola"])
+    print(f"{len(corpus)} receipts, {detected} auto-detected as thermal paper")
+    rows = []
+    for subset in ("all", "thermal"):
+        for chain, results in runs.items():
+            picked = [r for r in results if subset == "all" or r[0]]
+            if not picked:
+                continue
+            seconds = [r[1] for r in picked]
+            rows.append([
+                subset, chain,
+                statistics.fmean(seconds) * 1000, percentile(seconds, 95) * 1000,
+                statistics.fmean(r[2] for r in picked), statistics.fmean(r[3] for r in picked),
+            ])
+    print_table(["receipts", "chain", "preprocess ms", "p95 ms", "mean conf", "boxes"], rows)
+
+
+if __name__ == "__main__":
+    main()
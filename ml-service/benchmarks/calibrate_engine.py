@@ -0,0 +1,118 @@
+"""
+Pick the RapidOCR engine profile for this machine from data.
+
+    uv run python -m benchmarks.calibrate_engine path/to/receipts
+    uv run python -m benchmarks.calibrate_engine path/to/receipts --profiles default ort-arena --threads 1 2 4
+
+Every receipt is preprocessed once (prepare_image), then each profile runs
+det+cls+rec over the same prepared images. Reported per profile: mean
+det / cls / rec latency (RapidOCR's elapse_list), p50/p95 end-to-end
+engine latency, sequential throughput, mean box confidence, box count, and
+text similarity to the `default` profile. Profiles whose backend or models
+are unavailable are listed as skipped.
+
+Use the winner with OCR_ENGINE_PROFILE=<name> (and OCR_ENGINE_THREADS=<n>
+for a thread-count variant).
+"""
+import argparse
+import difflib
+import statistics
+import time
+
+from app.services.engine_profiles import load_profiles
+from app.services.ocr_boxes import OCRBoxes
+from app.services.ocr_services import build_engine, prepare_image, reconstruct_lines
+from benchmarks._common import load_corpus, percentile, print_table, quiet
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of receipt photos")
+    parser.add_argument("--profiles", nargs="+", default=None, help="profile names (default: all)")
+    parser.add_argument("--threads", type=int, nargs="+", default=None,
+                        help="also try each profile at these intra-op thread counts")
+    parser.add_argument("--repeat", type=int, default=2, help="timed passes over the corpus per profile")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    profiles = load_profiles()
+    names = args.profiles or list(profiles)
+    candidates = []
+    for name in names:
+        if name not in profiles:
+            raise SystemExit(f"Unknown profile {name!r} (have {', '.join(profiles)})")
+        candidates.append(profiles[name])
+        for threads in args.threads or []:
+            candidates.append(profiles[name].with_threads(threads))
+
+    corpus = load_corpus(args.corpus, args.limit)
+    with quiet():
+        prepared = [(name, prepare_image(data)) for name, data in corpus]
+    prepared = [(name, p.image) for name, p in prepared if p is not None]
+    print(f"{len(prepared)} receipts, {len(candidates)} profiles, {args.repeat} passes each")
+
+    baseline_text: dict[str, str] = {}
+    rows, skipped = [], []
+    for profile in sorted(candidates, key=lambda p: p.name != "default"):
+        if not profile.available:
+            skipped.append(f"{profile.name} ({profile.backend} not installed)")
+            continue
+        try:
+            with quiet():
+                engine = build_engine(profile)
+                engine(prepared[0][1])  # warm-up (session init, arena growth)
+        except Exception as e:
+            skipped.append(f"{profile.name} ({e})")
+            continue
+
+        det, cls, rec, totals, confs, box_counts, similarity = [], [], [], [], [], [], []
+        wall_start = time.perf_counter()
+        for _ in range(args.repeat):
+            for name, image in prepared:
+                started = time.perf_counter()
+                with quiet():
+                    output = engine(image)
+                totals.append(time.perf_counter() - started)
+
+                elapse = [e or 0.0 for e in (getattr(output, "elapse_list", None) or [0.0, 0.0, 0.0])]
+                det.append(elapse[0])
+                cls.append(elapse[1])
+                rec.append(elapse[2])
+
+                boxes = (
+                    OCRBoxes.from_quads(output.boxes, output.txts, output.scores)
+                    if output.boxes is not None and output.txts is not None
+                    else OCRBoxes.empty()
+                )
+                confs.append(boxes.mean_confidence())
+                box_counts.append(len(boxes))
+                text = reconstruct_lines(boxes)
+                if profile.name == "default":
+                    baseline_text[name] = text
+                elif name in baseline_text:
+                    similarity.append(difflib.SequenceMatcher(None, baseline_text[name], text).ratio())
+        wall = time.perf_counter() - wall_start
+
+        rows.append([
+            profile.name,
+            statistics.fmean(det) * 1000,
+            statistics.fmean(cls) * 1000,
+            statistics.fmean(rec) * 1000,
+            percentile(totals, 50) * 1000,
+            percentile(totals, 95) * 1000,
+            len(totals) / wall,
+            statistics.fmean(confs),
+            statistics.fmean(box_counts),
+            statistics.fmean(similarity) if similarity else (1.0 if profile.name == "default" else "-"),
+        ])
+
+    print_table(
+        ["profile", "det ms", "cls ms", "rec ms", "p50 ms", "p95 ms", "img/s", "mean conf", "boxes", "text sim"],
+        rows,
+    )
+    for line in skipped:
+        print(f"skipped: {line}")
+
+
+if __name__ == "__main__":
+    main()
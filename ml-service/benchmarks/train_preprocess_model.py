@@ -0,0 +1,158 @@
+"""
+Train the raw-vs-preprocessed path predictor (see preprocess_model).
+
+    # label a corpus by running both paths on every receipt, then train
+    uv run python -m benchmarks.train_preprocess_model --corpus path/to/receipts --outcomes outcomes.jsonl
+    # or train from race outcomes logged in production (OCR_VARIANT_RACE=true)
+    uv run python -m benchmarks.train_preprocess_model --logs ocr_race_outcomes.jsonl
+
+Each outcome is labelled "preprocess" when the preprocessed path's mean box
+confidence beats the raw path's by more than --margin; ties go to raw, so
+the model only spends denoise/CLAHE/deskew time where it pays off. A
+logistic regression is fitted on standardised quality features, checked on
+a held-out split against the fixed-threshold rule, refitted on everything
+and written to --out (OCR_PREPROCESS_MODEL, default preprocess_model.json).
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.services.ocr_services import get_engine, prepare_image, recognize_boxes, threshold_preprocess_rule
+from app.services.preprocess_model import FEATURES, OCR_PREPROCESS_MODEL, PreprocessModel, feature_vector
+from app.services.variant_race import VARIANTS, score_variant
+from benchmarks._common import load_corpus, print_table, quiet
+
+
+def label_corpus(corpus: str, outcomes: str, limit: int | None) -> None:
+    """Run both paths on every receipt and append race-log style outcomes."""
+    receipts = load_corpus(corpus, limit)
+    with quiet():
+        get_engine()
+    with open(outcomes, "a", encoding="utf-8") as f:
+        for n, (name, data) in enumerate(receipts, 1):
+            scores, quality, seconds = {}, None, {}
+            for variant, preprocess in VARIANTS.items():
+                started = time.perf_counter()
+                with quiet():
+                    prepared = prepare_image(data, preprocess=preprocess)
+                    if prepared is None:
+                        break
+                    boxes = recognize_boxes(prepared.image)
+                seconds[variant] = time.perf_counter() - started
+                scores[variant] = score_variant(boxes).to_dict()
+                quality = prepared.quality
+            if len(scores) < 2:
+                continue
+            f.write(json.dumps({
+                "source": name,
+                "quality": quality,
+                "scores": scores,
+                "seconds": {k: round(v, 4) for k, v in seconds.items()},
+            }) + "\n")
+            print(f"[{n}/{len(receipts)}] {name}: "
+                  + ", ".join(f"{k} {v['mean_confidence']:.3f}" for k, v in scores.items()))
+
+
+def load_outcomes(paths: list[str], margin: float) -> tuple[list[dict], list[int]]:
+    qualities, labels = [], []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                scores = entry.get("scores", {})
+                if not entry.get("quality") or not {"raw", "preprocessed"} <= set(scores):
+                    continue   # early race wins only scored one path
+                gain = scores["preprocessed"]["mean_confidence"] - scores["raw"]["mean_confidence"]
+                qualities.append(entry["quality"])
+                labels.append(int(gain > margin))
+    return qualities, labels
+
+
+def fit(qualities: list[dict], labels: list[int], l2: float, epochs: int) -> PreprocessModel:
+    """Full-batch gradient descent on the L2-regularised logistic loss."""
+    names = tuple(FEATURES)
+    x = np.array([feature_vector(q, names) for q in qualities], dtype=np.float64)
+    y = np.array(labels, dtype=np.float64)
+    mean, scale = x.mean(axis=0), x.std(axis=0)
+    scale[scale == 0] = 1.0
+    xs = (x - mean) / scale
+
+    w, b = np.zeros(len(names)), 0.0
+    lr = 0.5
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(xs @ w + b)))
+        grad = p - y
+        w -= lr * (xs.T @ grad / len(y) + l2 * w)
+        b -= lr * grad.mean()
+    return PreprocessModel(
+        features=names,
+        weights=tuple(w.tolist()),
+        bias=float(b),
+        mean=tuple(mean.tolist()),
+        scale=tuple(scale.tolist()),
+        trained_on=len(y),
+    )
+
+
+def accuracy(predict, qualities, labels) -> float:
+    return sum(int(predict(q)) == label for q, label in zip(qualities, labels)) / len(labels)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="receipt photos to label by running both paths")
+    parser.add_argument("--outcomes", default="preprocess_outcomes.jsonl", help="where --corpus labels are written")
+    parser.add_argument("--logs", nargs="*", default=[], help="race outcome JSONL files (OCR_RACE_LOG)")
+    parser.add_argument("--margin", type=float, default=0.01, help="confidence gain needed to label 'preprocess'")
+    parser.add_argument("--l2", type=float, default=0.01)
+    parser.add_argument("--epochs", type=int, default=2000)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--out", default=OCR_PREPROCESS_MODEL)
+    args = parser.parse_args()
+
+    paths = list(args.logs)
+    if args.corpus:
+        label_corpus(args.corpus, args.outcomes, args.limit)
+        paths.append(args.outcomes)
+    if not paths:
+        raise SystemExit("Give --corpus and/or --logs")
+
+    qualities, labels = load_outcomes(paths, args.margin)
+    if len(set(labels)) < 2:
+        raise SystemExit(f"Need both outcomes to train ({len(labels)} samples, labels {set(labels) or '-'})")
+    print(f"{len(labels)} outcomes, preprocessing helped on {sum(labels)}")
+
+    order = list(range(len(labels)))
+    random.Random(0).shuffle(order)
+    cut = max(1, int(len(order) * (1 - args.holdout)))
+    train, test = order[:cut], order[cut:] or order[:cut]
+    model = fit([qualities[i] for i in train], [labels[i] for i in train], args.l2, args.epochs)
+    test_q, test_y = [qualities[i] for i in test], [labels[i] for i in test]
+
+    print_table(
+        ["rule", "holdout accuracy", "preprocess rate"],
+        [
+            ["fixed thresholds", accuracy(threshold_preprocess_rule, test_q, test_y),
+             sum(map(threshold_preprocess_rule, test_q)) / len(test_q)],
+            ["learned", accuracy(model.predict, test_q, test_y),
+             sum(map(model.predict, test_q)) / len(test_q)],
+        ],
+    )
+
+    model = fit(qualities, labels, args.l2, args.epochs)
+    started = time.perf_counter()
+    for q in qualities:
+        model.predict(q)
+    per_call = (time.perf_counter() - started) / len(qualities)
+    model.save(args.out)
+    print(f"wrote {args.out} (trained on {model.trained_on}, {per_call * 1e6:.1f} µs per prediction)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Fit should_preprocess's skip thresholds to recorded OCR race outcomes.
+
+    uv run python -m benchmarks.tune_preprocess ocr_race_outcomes.jsonl
+
+Reads the JSONL written in race mode (OCR_VARIANT_RACE=true, see
+variant_race), reports how often the current thresholds picked the winning
+path, then grid-searches the skip rule
+
+    blur_score > B  and  LO < brightness < HI  and  contrast > C  →  raw
+
+for the thresholds that agree with the most winners. Races whose scores
+were within --min-margin of each other are ignored (either path was fine).
+"""
+import argparse
+import itertools
+import json
+
+from benchmarks._common import print_table
+
+CURRENT = (200.0, 100.0, 200.0, 50.0)   # blur, brightness lo, brightness hi, contrast
+
+
+def load_races(path: str, min_margin: float) -> list[tuple[dict, str]]:
+    races = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            scores = entry.get("scores", {})
+            if not entry.get("quality") or len(scores) < 2:
+                continue   # early wins only scored one variant
+            raw, pre = scores["raw"]["score"], scores["preprocessed"]["score"]
+            if abs(raw - pre) / max(raw, pre, 1e-9) < min_margin:
+                continue
+            races.append((entry["quality"], entry["winner"]))
+    return races
+
+
+def predict(quality: dict, blur: float, lo: float, hi: float, contrast: float) -> str:
+    skip = quality["blur_score"] > blur and lo < quality["brightness"] < hi and quality["contrast"] > contrast
+    return "raw" if skip else "preprocessed"
+
+
+def agreement(races, thresholds) -> float:
+    return sum(predict(q, *thresholds) == winner for q, winner in races) / len(races)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="race outcome JSONL (OCR_RACE_LOG)")
+    parser.add_argument("--min-margin", type=float, default=0.05, help="ignore races closer than this (relative)")
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    races = load_races(args.log, args.min_margin)
+    if not races:
+        raise SystemExit("No fully-scored races in the log yet")
+    raw_wins = sum(winner == "raw" for _, winner in races)
+    print(f"{len(races)} races ({raw_wins} raw wins, {len(races) - raw_wins} preprocessed wins)")
+    print(f"current thresholds agree with the winner {agreement(races, CURRENT):.1%} of the time")
+
+    grid = itertools.product(
+        (50, 100, 150, 200, 300, 400, 600),
+        (60, 80, 100, 120),
+        (180, 200, 220, 240),
+        (20, 30, 40, 50, 60, 80),
+    )
+    ranked = sorted(((agreement(races, t), t) for t in grid), reverse=True)[:args.top]
+    print_table(
+        ["agreement", "blur >", "brightness >", "brightness <", "contrast >"],
+        [[score, *t] for score, t in ranked],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Keep on-disk state (caches, templates, JSONL logs) out of the working tree and $HOME
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="ml-service-tests-"))
+os.environ.setdefault("LLM_PROMPT_LOG", "")
+os.environ.setdefault("OCR_RACE_LOG", "")
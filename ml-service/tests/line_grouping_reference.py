@@ -0,0 +1,120 @@
+"""
+The original quadratic line-grouping loops (pre-sweep ocr_services /
+ai_services), kept verbatim as the reference the sweep engine in
+app.services.line_grouping must match, plus the synthetic receipt layouts
+both the equivalence tests and benchmarks/bench_line_grouping.py run on.
+"""
+import random
+from dataclasses import dataclass
+
+
+@dataclass
+class Box:
+    text: str
+    confidence: float
+    x: float
+    y: float
+    width: float
+    height: float
+
+
+# ── Reference implementations (pre-sweep ocr_services / ai_services) ──────────
+def _ref_column_gap_threshold(line_boxes):
+    if len(line_boxes) < 3:
+        return 30
+    gaps = []
+    sorted_line = sorted(line_boxes, key=lambda b: b.x)
+    for i in range(1, len(sorted_line)):
+        gap = sorted_line[i].x - (sorted_line[i - 1].x + sorted_line[i - 1].width)
+        if gap > 0:
+            gaps.append(gap)
+    if not gaps:
+        return 30
+    gaps.sort()
+    return gaps[len(gaps) // 2] * 2.0
+
+
+def ref_overlap_lines(boxes):
+    if not boxes:
+        return ""
+    lines, used = [], set()
+    sorted_boxes = sorted(boxes, key=lambda b: b.y)
+    for i, box in enumerate(sorted_boxes):
+        if i in used:
+            continue
+        line_boxes = [box]
+        used.add(i)
+        for j, other in enumerate(sorted_boxes):
+            if j in used:
+                continue
+            line_top = min(b.y for b in line_boxes)
+            line_bottom = max(b.y + b.height for b in line_boxes)
+            overlap = min(line_bottom, other.y + other.height) - max(line_top, other.y)
+            min_height = min(line_bottom - line_top, other.height)
+            if min_height > 0 and overlap / min_height > 0.3:
+                line_boxes.append(other)
+                used.add(j)
+        threshold = _ref_column_gap_threshold(line_boxes)
+        line_boxes.sort(key=lambda b: b.x)
+        parts = []
+        for k, lb in enumerate(line_boxes):
+            if k == 0:
+                parts.append(lb.text)
+                continue
+            prev = line_boxes[k - 1]
+            gap = lb.x - (prev.x + prev.width)
+            parts.append("  |  " + lb.text if gap > threshold else " " + lb.text)
+        lines.append("".join(parts))
+    return "\n".join(lines)
+
+
+def ref_center_lines(boxes, y_tolerance):
+    if not boxes:
+        return ""
+    lines, used = [], set()
+    sorted_boxes = sorted(boxes, key=lambda b: b["y"])
+    for i, anchor in enumerate(sorted_boxes):
+        if i in used:
+            continue
+        line_boxes = [anchor]
+        used.add(i)
+        anchor_cy = anchor["y"] + anchor.get("height", 20) / 2
+        for j, other in enumerate(sorted_boxes):
+            if j in used:
+                continue
+            if abs(anchor_cy - (other["y"] + other.get("height", 20) / 2)) <= y_tolerance:
+                line_boxes.append(other)
+                used.add(j)
+        line_boxes.sort(key=lambda b: b["x"])
+        parts = []
+        for k, lb in enumerate(line_boxes):
+            if k == 0:
+                parts.append(lb["text"])
+                continue
+            prev = line_boxes[k - 1]
+            gap = lb["x"] - (prev["x"] + prev.get("width", 50))
+            parts.append("  |  " + lb["text"] if gap > 30 else " " + lb["text"])
+        lines.append("".join(parts))
+    return "\n".join(lines)
+
+
+# ── Synthetic receipts ─────────────────────────────────────────────────────────
+def synthetic_receipt(n_boxes: int, rng: random.Random) -> list[Box]:
+    boxes, y = [], 20.0
+    while len(boxes) < n_boxes:
+        row_height = rng.uniform(18, 30)
+        x = rng.uniform(5, 30)
+        for col in range(rng.randint(1, 4)):
+            width = rng.uniform(20, 180)
+            boxes.append(Box(
+                text=f"T{len(boxes)}",
+                confidence=rng.uniform(0.5, 1.0),
+                x=round(x, 1),
+                y=round(y + rng.uniform(-6, 6), 1),
+                width=round(width, 1),
+                height=round(row_height + rng.uniform(-4, 4), 1),
+            ))
+            x += width + rng.choice([rng.uniform(2, 12), rng.uniform(40, 120)])
+        y += row_height + rng.uniform(2, 14)
+    rng.shuffle(boxes)
+    return boxes[:n_boxes]
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+from app.services.binarize import looks_like_thermal, sauvola_binarize, sauvola_threshold, use_thermal_path
+
+
+def _brute_force_sauvola(gray: np.ndarray, window: int, k: float) -> np.ndarray:
+    half = window // 2
+    padded = cv2.copyMakeBorder(gray, half, half, half, half, cv2.BORDER_REFLECT).astype(np.float64)
+    out = np.empty(gray.shape)
+    for y in range(gray.shape[0]):
+        for x in range(gray.shape[1]):
+            patch = padded[y:y + window, x:x + window]
+            out[y, x] = patch.mean() * (1 + k * (patch.std() / 128.0 - 1))
+    return out
+
+
+def _slip(shade: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """(gray, ink mask) of a thermal slip, optionally under a strong lighting gradient."""
+    gray = np.full((300, 240), 235, dtype=np.uint8)
+    for y in range(30, 290, 28):
+        cv2.putText(gray, "AQUA 2 7,000", (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 30, 2)
+    ink = gray < 128
+    if shade:
+        gradient = np.linspace(0.45, 1.0, gray.shape[1])[None, :]
+        gray = (gray * gradient).astype(np.uint8)
+    return gray, ink
+
+
+def test_integral_image_threshold_matches_the_direct_window_statistics():
+    gray = np.random.default_rng(1).integers(0, 256, size=(23, 31), dtype=np.uint8)
+    expected = _brute_force_sauvola(gray, 7, 0.2)
+    assert np.allclose(sauvola_threshold(gray, 7, k=0.2), expected, atol=1e-3)
+
+
+def test_text_survives_uneven_lighting():
+    gray, ink = _slip(shade=True)
+    binary = sauvola_binarize(gray, text_height=14)
+    assert set(np.unique(binary)) <= {0, 255}
+    assert np.mean(binary[ink] == 0) > 0.9            # strokes stay black
+    assert np.mean(binary[~ink] == 255) > 0.97        # shaded paper turns white
+    _, global_otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    assert np.mean(global_otsu[~ink] == 255) < np.mean(binary[~ink] == 255)
+
+
+def test_thermal_paper_detection():
+    gray, _ = _slip()
+    assert looks_like_thermal(gray, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+
+    tinted = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    tinted[..., 0] = 80                                # strongly coloured paper
+    assert not looks_like_thermal(gray, tinted)
+    assert not looks_like_thermal((gray * 0.5).astype(np.uint8))     # grey, not near-white
+    assert not looks_like_thermal(np.full((300, 240), 235, dtype=np.uint8))   # no ink at all
+
+
+def test_mode_overrides_the_heuristic():
+    blank = np.full((50, 50), 235, dtype=np.uint8)
+    assert use_thermal_path(blank, mode="always")
+    assert not use_thermal_path(_slip()[0], mode="off")
+    assert use_thermal_path(_slip()[0], mode="auto")
@@ -0,0 +1,69 @@
+import pytest
+
+from app.services import core_sharding
+from app.services.core_sharding import ConcurrencyTracker, CoreSharder, ShardPlan, plan_shards
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(core_sharding.time, "monotonic", clock)
+    return clock
+
+
+def test_cores_are_split_across_the_observed_concurrency():
+    assert plan_shards(8, 1, 4) == ShardPlan(1, 8)
+    assert plan_shards(8, 2, 4) == ShardPlan(2, 4)
+    assert plan_shards(8, 10, 4) == ShardPlan(4, 2)
+    assert plan_shards(2, 4, 4) == ShardPlan(2, 1)
+    assert plan_shards(4, 0, 4) == ShardPlan(1, 4)
+
+
+def test_core_slices_are_disjoint_and_wrap_past_k():
+    cores = [0, 1, 2, 3, 4, 5, 6, 7]
+    plan = ShardPlan(4, 2)
+    slices = [plan.cpus_for(slot, cores) for slot in range(4)]
+    assert slices == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert plan.cpus_for(5, cores) == [2, 3]
+
+
+def test_tracker_reports_the_peak_within_the_window(clock):
+    tracker = ConcurrencyTracker(window=60, bucket=10)
+    assert tracker.observed() is None
+    for _ in range(3):
+        tracker.enter()
+    for _ in range(3):
+        tracker.exit()
+    clock.now += 15
+    tracker.enter()
+    assert tracker.observed() == 3
+    clock.now += 120
+    assert tracker.observed() == 1
+
+
+def test_sharder_replans_from_traffic_after_the_interval(clock):
+    sharder = CoreSharder(max_sessions=4, cores=list(range(8)), pin=False, window=60, replan_interval=30)
+    assert sharder.plan == ShardPlan(4, 2)     # assumes a full pool before any traffic
+
+    sharder.job_started()
+    sharder.job_finished()
+    clock.now += 10
+    assert sharder.plan == ShardPlan(4, 2)     # not due yet
+    clock.now += 25
+    assert sharder.plan == ShardPlan(1, 8)
+    assert sharder.worker_init_args(sharder.plan, 0) == (8, None)
+
+
+def test_pinned_workers_get_their_core_slice(clock):
+    sharder = CoreSharder(max_sessions=2, cores=[4, 5, 6, 7], pin=True)
+    plan = sharder.plan
+    assert sharder.worker_init_args(plan, 0) == (2, [4, 5])
+    assert sharder.worker_init_args(plan, 1) == (2, [6, 7])
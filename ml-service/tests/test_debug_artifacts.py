@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.services.debug_artifacts import NULL_DEBUG_SESSION, DebugArtifactSink
+
+IMG = np.full((8, 8, 3), 200, dtype=np.uint8)
+
+
+def test_disabled_sink_hands_out_the_null_session(tmp_path):
+    sink = DebugArtifactSink(enabled=False, base_dir=tmp_path)
+    session = sink.session("r1")
+    assert session is NULL_DEBUG_SESSION
+    session.save("original", IMG)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_zero_percent_sampling_never_records(tmp_path):
+    sink = DebugArtifactSink(enabled=True, sample_pct=0, base_dir=tmp_path)
+    assert all(sink.session() is NULL_DEBUG_SESSION for _ in range(50))
+
+
+def test_sessions_write_numbered_files_to_their_own_directory(tmp_path):
+    sink = DebugArtifactSink(enabled=True, sample_pct=100, base_dir=tmp_path)
+    first, second = sink.session("a"), sink.session("b")
+    first.save("original", IMG)
+    second.save("original", IMG)
+    first.save("perspective", IMG)
+    first.save("skipped", None)
+    sink.flush()
+
+    assert first.directory != second.directory
+    assert sorted(p.name for p in first.directory.iterdir()) == ["01_original.jpg", "02_perspective.jpg"]
+    assert sorted(p.name for p in second.directory.iterdir()) == ["01_original.jpg"]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    sink = DebugArtifactSink(enabled=True, base_dir=tmp_path, max_queue=2)
+    for i in range(5):
+        sink.enqueue(tmp_path / f"{i}.jpg", IMG)      # no writer running yet
+    assert sink.dropped == 3
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from rapidocr import EngineType, ModelType, OCRVersion
+
+from app.services.engine_profiles import EngineProfile, get_profile, load_profiles, preserve_call_flags
+
+
+def test_default_profile_keeps_the_yaml_engine_settings():
+    params = EngineProfile("default").to_params()
+    assert params["Det.engine_type"] is EngineType.ONNXRUNTIME
+    assert params["EngineConfig.onnxruntime.intra_op_num_threads"] == -1
+    assert params["EngineConfig.onnxruntime.enable_cpu_mem_arena"] is False
+    assert not any(key.endswith(("ocr_version", "model_type", "model_path")) for key in params)
+
+
+def test_model_overrides_apply_to_det_and_rec():
+    params = load_profiles(None)["v5-mobile"].to_params()
+    for task in ("Det", "Rec"):
+        assert params[f"{task}.ocr_version"] is OCRVersion.PPOCRV5
+        assert params[f"{task}.model_type"] is ModelType.MOBILE
+    assert "Cls.ocr_version" not in params
+
+
+def test_thread_override_makes_a_named_copy():
+    profile = load_profiles(None)["ort-arena"].with_threads(2)
+    assert profile.name == "ort-arena@2t"
+    assert profile.mem_arena
+    assert profile.to_params()["EngineConfig.onnxruntime.intra_op_num_threads"] == 2
+
+
+def test_profiles_file_adds_named_profiles(tmp_path):
+    path = tmp_path / "profiles.yaml"
+    path.write_text(
+        "my-int8:\n"
+        "  intra_threads: 2\n"
+        "  det_model_path: models/det_int8.onnx\n"
+        "  extra:\n"
+        "    Global.max_side_len: 1600\n"
+    )
+    profiles = load_profiles(str(path))
+    assert "default" in profiles
+    params = profiles["my-int8"].to_params()
+    assert params["Det.model_path"] == "models/det_int8.onnx"
+    assert params["Global.max_side_len"] == 1600
+
+
+def test_unknown_or_unavailable_profiles_fall_back_to_default():
+    assert get_profile("no-such-profile", threads=0).name == "default"
+    assert not EngineProfile("x", backend="not-a-backend").available
+    if not EngineProfile("openvino", backend="openvino").available:
+        assert get_profile("openvino", threads=0).name == "default"
+    assert get_profile("default", threads=3).name == "default@3t"
+
+
+def test_call_flags_are_restored_after_a_cls_free_call():
+    engine = SimpleNamespace(use_det=True, use_cls=True, use_rec=True)
+    with preserve_call_flags(engine):
+        engine.use_cls = False
+    assert engine.use_cls is True
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from app.services.fast_reject import OCR_REJECT_THUMB_SIDE, fast_quality_check, make_thumbnail
+
+
+def _receipt_jpeg(transform=None) -> bytes:
+    img = np.full((2000, 1200, 3), 225, dtype=np.uint8)
+    for y in range(80, 1950, 60):
+        cv2.putText(img, "MHSUKA HOT LAVA 1 9,500", (40, y), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (15, 15, 15), 3)
+    if transform is not None:
+        img = transform(img)
+    ok, jpeg = cv2.imencode(".jpg", img)
+    assert ok
+    return jpeg.tobytes()
+
+
+def test_a_sharp_receipt_is_usable():
+    verdict = fast_quality_check(_receipt_jpeg(), policy="severe")
+    assert verdict.usable
+    assert verdict.issues == []
+    assert verdict.quality["blur_score"] > 100
+
+
+def test_a_hopelessly_blurred_photo_is_rejected():
+    verdict = fast_quality_check(_receipt_jpeg(lambda img: cv2.GaussianBlur(img, (0, 0), 25)), policy="severe")
+    assert not verdict.usable
+    assert "blurry" in verdict.issues
+
+
+def test_a_dark_photo_is_rejected():
+    verdict = fast_quality_check(_receipt_jpeg(lambda img: (img * 0.1).astype(np.uint8)), policy="severe")
+    assert not verdict.usable
+    assert "too_dark" in verdict.issues
+
+
+def test_log_policy_reports_but_never_rejects():
+    verdict = fast_quality_check(_receipt_jpeg(lambda img: (img * 0.1).astype(np.uint8)), policy="log")
+    assert verdict.usable
+    assert "too_dark" in verdict.issues
+
+
+def test_off_policy_and_undecodable_bytes_go_to_ocr():
+    assert fast_quality_check(_receipt_jpeg(), policy="off").quality is None
+    verdict = fast_quality_check(b"not a jpeg", policy="severe")
+    assert verdict.usable
+    assert verdict.quality is None
+
+
+def test_thumbnail_is_small_and_the_size_hint_skips_the_probe():
+    data = _receipt_jpeg()
+    probed = make_thumbnail(data)
+    hinted = make_thumbnail(data, size_hint=(1200, 2000))
+    assert max(probed.shape) == OCR_REJECT_THUMB_SIDE
+    assert probed.ndim == 2
+    assert np.array_equal(probed, hinted)
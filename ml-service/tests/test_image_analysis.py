@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+from app.services import image_analysis
+from app.services.image_analysis import ImageAnalysis
+from app.services.ocr_services import assess_image_quality, crop_receipt
+
+
+def _photo() -> np.ndarray:
+    """A bright receipt-shaped rectangle with some 'text' on a dark table."""
+    img = np.full((400, 300, 3), 40, dtype=np.uint8)
+    cv2.rectangle(img, (60, 40), (240, 360), (235, 235, 235), -1)
+    for y in range(70, 340, 24):
+        cv2.putText(img, "ITEM 1 9,500", (70, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (20, 20, 20), 1)
+    return img
+
+
+def test_each_intermediate_is_computed_once(monkeypatch):
+    calls = {"cvtColor": 0, "findContours": 0}
+    for name in calls:
+        original = getattr(cv2, name)
+
+        def counted(*args, _original=original, _name=name, **kwargs):
+            calls[_name] += 1
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(image_analysis.cv2, name, counted)
+
+    img = _photo()
+    analysis = ImageAnalysis(img)
+    assess_image_quality(img, analysis=analysis)
+    crop_receipt(img, analysis)
+    assert ImageAnalysis.of(img, analysis) is analysis
+    assert calls == {"cvtColor": 1, "findContours": 1}
+
+
+def test_features_match_the_direct_computation():
+    img = _photo()
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    analysis = ImageAnalysis(img)
+    assert analysis.blur_score == cv2.Laplacian(gray, cv2.CV_64F).var()
+    assert np.isclose(analysis.brightness, np.mean(gray))
+    assert np.isclose(analysis.contrast, np.std(gray))
+    assert assess_image_quality(img, analysis=analysis) == assess_image_quality(img.copy())
+
+
+def test_a_new_frame_gets_a_fresh_analysis():
+    img = _photo()
+    analysis = ImageAnalysis(img)
+    rotated = np.ascontiguousarray(img[::-1])
+    assert analysis.for_image(img) is analysis
+    assert analysis.for_image(rotated) is not analysis
+    assert ImageAnalysis.of(img, None).img is img
+
+
+def test_crop_slices_the_cached_gray():
+    img = _photo()
+    analysis = ImageAnalysis(img)
+    analysis.gray
+    child = analysis.crop(60, 40, 180, 320)
+    assert "gray" in child.__dict__
+    assert np.array_equal(child.gray, cv2.cvtColor(img[40:360, 60:240], cv2.COLOR_BGR2GRAY))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from app.services import ai_services
+from app.services.json_stream import ObjectStream
+from app.services.ocr_boxes import OCRBoxes
+from app.services.validation import ReceiptScorer, determine_receipt_status
+
+RESPONSE = {
+    "merchant_name": {"value": "INDOMARET {JL. \"MAWAR\"}", "confidence": 0.9},
+    "date": {"value": "2026-03-26", "confidence": 0.9},
+    "time": {"value": None, "confidence": 0.0},
+    "items": [
+        {"name": {"value": "AQUA 600ML"}, "qty": {"value": 2}, "price": {"value": 3500}},
+        {"name": {"value": "ROTI [TAWAR], \\ 1/2"}, "qty": {"value": 1}, "price": {"value": 12500.5}},
+        {"name": {"value": "KOPI"}, "qty": {"value": 1}, "price": {"value": -2e3}, "tags": [1, [2, {}]]},
+    ],
+    "total_amount": {"value": 17500, "confidence": 0.95},
+    "paid": True,
+    "notes": [],
+}
+
+
+def _stream(text: str, rng: random.Random, array_keys=("items",)):
+    parser = ObjectStream(array_keys=array_keys)
+    events, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, 12)
+        events += parser.feed(text[pos:pos + size])
+        pos += size
+    return parser, events
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_every_member_and_item_is_reported_once_with_its_final_value(seed):
+    rng = random.Random(seed)
+    text = json.dumps(RESPONSE, indent=rng.choice([None, 2]))
+    parser, events = _stream(text, rng)
+
+    assert parser.done
+    items = [(e.index, e.value) for e in events if e.key == "items" and e.index is not None]
+    assert items == list(enumerate(RESPONSE["items"]))
+    members = {e.key: e.value for e in events if e.index is None}
+    assert members == RESPONSE
+
+
+def test_items_are_reported_before_the_response_ends():
+    text = json.dumps(RESPONSE)
+    parser = ObjectStream(array_keys={"items"})
+    cut = text.index('{"name": {"value": "KOPI"')
+    early = parser.feed(text[:cut])
+    assert [e.index for e in early if e.key == "items"] == [0, 1]
+    assert {e.key for e in early if e.index is None} == {"merchant_name", "date", "time"}
+
+
+def test_scalar_arrays_and_trailing_scalars():
+    parser, events = _stream('{"items": [1, "a,b", null], "n": 5}', random.Random(0))
+    assert [(e.key, e.index, e.value) for e in events] == [
+        ("items", 0, 1), ("items", 1, "a,b"), ("items", 2, None), ("items", None, [1, "a,b", None]), ("n", None, 5),
+    ]
+
+
+def test_malformed_input_raises():
+    with pytest.raises(ValueError):
+        ObjectStream().feed('}')
+    with pytest.raises(ValueError):
+        ObjectStream().feed('{"a": tru}')
+
+
+def test_text_after_the_object_is_left_to_the_final_parse():
+    parser = ObjectStream()
+    assert [e.value for e in parser.feed('{"a": 1}} trailing')] == [1]
+    assert parser.done
+
+
+# ── Scoring while streaming ───────────────────────────────────────────────────
+BOXES = OCRBoxes(
+    [[10, 10, 120, 20], [10, 40, 90, 20], [10, 70, 80, 20], [200, 70, 40, 20], [10, 100, 60, 20]],
+    [0.99, 0.95, 0.97, 0.96, 0.98],
+    ["INDOMARET", "26.03.26", "AQUA 600ML", "3,500", "17,500"],
+)
+
+
+def test_streamed_scoring_gives_the_same_verdict_as_scoring_at_the_end():
+    scorer = ReceiptScorer(BOXES)
+    parser, events = _stream(json.dumps(RESPONSE), random.Random(3))
+    for event in events:
+        if event.index is not None:
+            scorer.add_item(event.index, event.value)
+        elif isinstance(event.value, dict) and "value" in event.value:
+            scorer.add_field(event.key, event.value)
+    # The final response differs from what streamed in for one item: it is rescored
+    final = json.loads(json.dumps(RESPONSE))
+    final["items"][1]["price"]["value"] = 3500
+    assert scorer.finish(final) == determine_receipt_status(final, BOXES)
+
+
+def test_generate_extraction_scores_and_reports_partials(monkeypatch):
+    text = json.dumps(RESPONSE)
+
+    class FakeClient:
+        async def generate(self, **kwargs):
+            assert kwargs["stream"] is True
+
+            async def parts():
+                for i in range(0, len(text), 7):
+                    yield {"response": text[i:i + 7]}
+            return parts()
+
+    monkeypatch.setattr(ai_services, "custom_client", FakeClient())
+    monkeypatch.setattr(ai_services, "LLM_STREAM", True)
+    scorer = ReceiptScorer(BOXES)
+    partials = []
+
+    raw = asyncio.run(ai_services.generate_extraction("prompt", scorer, lambda p: partials.append(len(p["items"]))))
+    assert raw == text
+    assert partials[0] == 0 and partials[-1] == 3
+    assert partials == sorted(partials)
+    assert set(scorer._items) == {0, 1, 2}
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.line_grouping import (
+    column_gap_threshold,
+    reconstruct_lines_by_center,
+    reconstruct_lines_by_overlap,
+)
+from app.services.ocr_boxes import OCRBoxes
+from tests.line_grouping_reference import (
+    Box,
+    _ref_column_gap_threshold,
+    ref_center_lines,
+    ref_overlap_lines,
+    synthetic_receipt,
+)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_overlap_grouping_matches_the_quadratic_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(10):
+        boxes = synthetic_receipt(rng.randint(0, 120), rng)
+        assert reconstruct_lines_by_overlap(boxes) == ref_overlap_lines(boxes)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_center_grouping_matches_the_quadratic_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(10):
+        dicts = [vars(b) for b in synthetic_receipt(rng.randint(0, 120), rng)]
+        tolerance = rng.uniform(4, 15)
+        assert reconstruct_lines_by_center(dicts, tolerance) == ref_center_lines(dicts, tolerance)
+
+
+def test_center_grouping_defaults_missing_sizes_like_the_reference():
+    rng = random.Random(3)
+    dicts = [
+        {"text": b.text, "x": b.x, "y": b.y}
+        for b in synthetic_receipt(60, rng)
+    ]
+    assert reconstruct_lines_by_center(dicts, 9) == ref_center_lines(dicts, 9)
+
+
+def test_ocr_boxes_input_matches_box_objects():
+    boxes = synthetic_receipt(80, random.Random(11))
+    columnar = OCRBoxes(
+        np.array([[b.x, b.y, b.width, b.height] for b in boxes]),
+        np.array([b.confidence for b in boxes]),
+        [b.text for b in boxes],
+    )
+    assert reconstruct_lines_by_overlap(columnar) == ref_overlap_lines(boxes)
+
+
+def test_column_gap_threshold_matches_the_reference():
+    rng = random.Random(5)
+    for _ in range(200):
+        line = [Box("t", 1.0, rng.uniform(0, 400), 0, rng.uniform(5, 80), 20) for _ in range(rng.randint(1, 6))]
+        line.sort(key=lambda b: b.x)
+        x = np.array([b.x for b in line])
+        w = np.array([b.width for b in line])
+        assert column_gap_threshold(x, w) == _ref_column_gap_threshold(line)
+
+
+def test_columns_are_split_on_wide_gaps():
+    boxes = [
+        Box("AQUA 600ML", 1.0, 10, 100, 90, 20),
+        Box("7,000", 1.0, 300, 98, 50, 20),
+        Box("AQUA", 1.0, 10, 120, 40, 20),
+        Box("2x", 1.0, 55, 121, 20, 20),
+        Box("TOTAL", 1.0, 10, 140, 50, 20),
+        Box("7,000", 1.0, 300, 141, 50, 20),
+    ]
+    assert reconstruct_lines_by_overlap(boxes) == "AQUA 600ML  |  7,000\nAQUA 2x\nTOTAL  |  7,000"
+    assert reconstruct_lines_by_overlap([]) == ""
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.services import ai_services
+from app.services.cache import MemoryLRUCache
+
+RAW_TEXT = "INDOMARET\nMHSUKA HOT LAVA 130 | 1 | 9,500 | 9,500\nTOTAL BELANJA | 9,500"
+RESPONSE = {
+    "receipt_id": "from-llm",
+    "merchant_name": {"value": "INDOMARET"},
+    "date": {"value": "2026-03-26"},
+    "time": {"value": "12:09"},
+    "items": [],
+    "total_amount": {"value": 9500},
+}
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """refine_receipt with a fake LLM; `status` is what scoring will report."""
+    calls = []
+    state = {"status": "VERIFIED"}
+
+    async def generate(prompt, scorer, on_partial=None):
+        calls.append(prompt)
+        return json.dumps(RESPONSE)
+
+    def scored(response_data, ocr_boxes, scorer=None):
+        return {"receipt_data": response_data, "status": state["status"]}
+
+    monkeypatch.setattr(ai_services, "llm_cache", MemoryLRUCache())
+    monkeypatch.setattr(ai_services, "generate_extraction", generate)
+    monkeypatch.setattr(ai_services, "scored_result", scored)
+    monkeypatch.setattr(ai_services, "record_prompt_stats", lambda *args: None)
+    return calls, state
+
+
+def _refine(text: str = RAW_TEXT) -> dict:
+    return asyncio.run(ai_services.refine_receipt(text))
+
+
+def test_verified_answer_is_replayed_with_a_fresh_receipt_id(llm):
+    calls, _ = llm
+    first = _refine()
+    # Same receipt, different OCR formatting of the amounts
+    second = _refine(RAW_TEXT.replace("9,500", "9.500"))
+    assert len(calls) == 1
+    assert second["receipt_data"]["merchant_name"] == first["receipt_data"]["merchant_name"]
+    assert second["receipt_data"]["receipt_id"] != first["receipt_data"]["receipt_id"]
+
+
+def test_action_required_answer_is_not_cached(llm):
+    calls, state = llm
+    state["status"] = "ACTION_REQUIRED"
+    _refine()
+    _refine()
+    assert len(calls) == 2
+
+
+def test_normalised_text_ignores_layout_noise():
+    a = ai_services.normalize_ocr_text("INDOMARET\n\nTOTAL  |  24.000")
+    b = ai_services.normalize_ocr_text("indomaret\nTOTAL 24,000\n")
+    assert a == b == "indomaret\ntotal 24000"
+
+
+def test_prompt_version_covers_the_category_section():
+    sources = ai_services._prompt_sources()
+    assert "def get_category_prompt" in sources
+    assert "def compress_ocr_input" in sources
+
+
+def test_import_writes_nothing_to_the_working_directory(tmp_path):
+    data_dir = tmp_path / "data"
+    env = {**os.environ, "DATA_DIR": str(data_dir), "PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+    env.pop("LLM_CACHE_BACKEND", None)
+    subprocess.run(
+        [sys.executable, "-c", "import app.services.ai_services"],
+        cwd=tmp_path, env=env, capture_output=True, check=True,
+    )
+    assert not list(tmp_path.glob("*.sqlite3*"))
+    assert not (data_dir / "cache.sqlite3").exists()
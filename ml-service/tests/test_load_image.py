@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+
+from app.services.ocr_services import describe_source, load_image
+
+
+def _photo() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(40, 30, 3), dtype=np.uint8)
+
+
+def test_encoded_bytes_decode_like_the_file(tmp_path):
+    img = _photo()
+    path = tmp_path / "receipt.png"
+    cv2.imwrite(str(path), img)
+    data = path.read_bytes()
+
+    for source in (data, bytearray(data), memoryview(data)):
+        decoded = load_image(source)
+        assert np.array_equal(decoded, img)
+    assert np.array_equal(load_image(path), img)
+    assert np.array_equal(load_image(str(path)), img)
+
+
+def test_jpeg_bytes_from_telegram_decode_to_bgr():
+    ok, jpeg = cv2.imencode(".jpg", _photo())
+    assert ok
+    decoded = load_image(jpeg.tobytes())
+    assert decoded.shape == (40, 30, 3)
+    assert decoded.dtype == np.uint8
+
+
+def test_unreadable_sources_return_none(tmp_path):
+    assert load_image(b"") is None
+    assert load_image(b"not an image") is None
+    assert load_image(tmp_path / "missing.jpg") is None
+
+
+def test_decoded_arrays_are_normalised_to_bgr():
+    img = _photo()
+    assert load_image(img) is img
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    assert load_image(gray).shape == (40, 30, 3)
+    bgra = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    assert np.array_equal(load_image(bgra), img)
+
+
+def test_describe_source_never_dumps_the_buffer():
+    assert describe_source(b"\xff" * 2048) == "<2048 bytes>"
+    assert describe_source(_photo()) == "<array (40, 30, 3)>"
+    assert describe_source("receipt.jpg") == "receipt.jpg"
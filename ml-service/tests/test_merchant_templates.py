@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from app.services import ai_services
+from app.services.merchant_templates import TemplateStore, apply_template
+from app.services.ocr_boxes import OCRBoxes
+
+HEADER = ["KEDAI KOPI SENJA", "JL MELATI NO 5", "TELP 0812 3456", "NPWP 01.234.567", "KASIR RINA"]
+NAME_X, QTY_X, PRICE_X, TOTAL_X = 10, 300, 370, 460
+
+
+def _receipt(items, date="12-04-2026", time="14:30", header=HEADER, total=None):
+    """OCR boxes of a café slip plus the receipt_data an LLM would have VERIFIED for it."""
+    rows: list[list[tuple[str, float, float]]] = [[(text, NAME_X, 9 * len(text))] for text in header]
+    rows.append([(f"{date} {time}", NAME_X, 140)])
+    for name, qty, price in items:
+        rows.append([
+            (name, NAME_X, 9 * len(name)),
+            (str(qty), QTY_X, 20),
+            (f"{price:,}", PRICE_X, 60),
+            (f"{qty * price:,}", TOTAL_X, 60),
+        ])
+    amount = sum(qty * price for _, qty, price in items) if total is None else total
+    rows.append([("Grand Total", NAME_X, 100), (f"{amount:,}", TOTAL_X, 60)])
+    rows.append([("Tunai", NAME_X, 50), ("100,000", TOTAL_X, 60)])
+
+    coords, texts = [], []
+    for i, row in enumerate(rows):
+        for text, x, width in row:
+            coords.append([x, 20 + 30 * i, width, 20])
+            texts.append(text)
+    boxes = OCRBoxes(coords, [0.97] * len(texts), texts)
+
+    day, month, year = date.split("-")
+    receipt_data = {
+        "merchant_name": {"value": header[0]},
+        "date": {"value": f"{year}-{month}-{day}"},
+        "time": {"value": time},
+        "items": [
+            {"name": {"value": name}, "qty": {"value": qty}, "price": {"value": price},
+             "total_price": {"value": qty * price}}
+            for name, qty, price in items
+        ],
+        "total_amount": {"value": amount},
+    }
+    return boxes, receipt_data
+
+
+FIRST = [("KOPI SUSU GULA AREN", 2, 18_000), ("ROTI BAKAR COKLAT", 1, 15_000)]
+SECOND = [("ES TEH MANIS", 3, 5_000), ("KOPI SUSU GULA AREN", 1, 18_000), ("PISANG GORENG", 2, 8_000)]
+THIRD = [("AMERICANO", 1, 20_000), ("CROISSANT", 2, 17_500)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TemplateStore(str(tmp_path / "templates.sqlite3"))
+
+
+def _learned(store):
+    store.learn(*reversed(_receipt(FIRST)))
+    store.learn(*reversed(_receipt(SECOND, date="13-04-2026", time="09:05")))
+    return store
+
+
+def test_a_template_needs_two_verified_receipts(store):
+    store.learn(*reversed(_receipt(FIRST)))
+    assert store.match(_receipt(THIRD)[0]) is None
+    store.learn(*reversed(_receipt(SECOND, date="13-04-2026")))
+    assert store.match(_receipt(THIRD)[0]).merchant == "KEDAI KOPI SENJA"
+
+
+def test_learned_layout_reads_a_new_receipt(store):
+    boxes, expected = _receipt(THIRD, date="20-04-2026", time="19:45")
+    template = _learned(store).match(boxes)
+    assert template.columns.keys() == {"qty", "price", "total"}
+    assert template.total_label == "Grand Total"
+
+    receipt_data, reason = apply_template(template, boxes)
+    assert reason == "ok"
+    assert receipt_data["merchant_name"]["value"] == "KEDAI KOPI SENJA"
+    assert receipt_data["date"]["value"] == "2026-04-20"
+    assert receipt_data["time"]["value"] == "19:45"
+    assert receipt_data["total_amount"]["value"] == 55_000
+    assert [(i["name"]["value"], i["qty"]["value"], i["price"]["value"]) for i in receipt_data["items"]] == THIRD
+
+
+def test_numbers_that_do_not_reconcile_fall_back(store):
+    boxes, _ = _receipt(THIRD, total=60_000)
+    receipt_data, reason = apply_template(_learned(store).match(boxes), boxes)
+    assert receipt_data is None
+    assert reason in {"cross_check", "sum_mismatch"}
+
+
+def test_other_merchants_do_not_match(store):
+    _learned(store)
+    other = ["WARUNG BU TINI", "JL MAWAR NO 3", "TELP 0811 1111", "NPWP 02.000.000", "KASIR DEWI"]
+    assert store.match(_receipt(THIRD, header=other)[0]) is None
+
+    store.learn(*reversed(_receipt(FIRST, header=other)))
+    store.learn(*reversed(_receipt(SECOND, header=other)))
+    assert store.match(_receipt(THIRD, header=other)[0]).merchant == "WARUNG BU TINI"
+    assert store.match(_receipt(THIRD)[0]).merchant == "KEDAI KOPI SENJA"
+
+
+def test_look_alike_headers_are_too_close_to_call(store):
+    _learned(store)
+    sibling = ["KEDAI KOPI FAJAR"] + HEADER[1:]
+    store.learn(*reversed(_receipt(FIRST, header=sibling)))
+    store.learn(*reversed(_receipt(SECOND, header=sibling)))
+    # Both templates cover 7 of 8 landmarks of a slip that lost its first line
+    assert store.match(_receipt(THIRD, header=["KEDAI KOPI"] + HEADER[1:])[0]) is None
+
+
+def test_templates_persist_across_restarts(store):
+    _learned(store)
+    reopened = TemplateStore(store.path)
+    assert len(reopened) == 1
+    assert reopened.match(_receipt(THIRD)[0]).samples == 2
+
+
+def test_verified_llm_results_teach_the_template_and_skip_the_llm_next_time(store, monkeypatch):
+    monkeypatch.setattr(ai_services, "template_store", store)
+    monkeypatch.setattr(ai_services, "RULE_EXTRACTOR", False)
+    llm_calls = []
+
+    async def fake_refine(raw_text, ocr_boxes, on_partial=None):
+        llm_calls.append(raw_text)
+        return {"status": "VERIFIED", "receipt_data": fake_refine.receipt_data}
+
+    monkeypatch.setattr(ai_services, "refine_receipt", fake_refine)
+    monkeypatch.setattr(ai_services, "scored_result", lambda data, boxes: {"status": "VERIFIED", "receipt_data": data})
+
+    for items, date in ((FIRST, "12-04-2026"), (SECOND, "13-04-2026")):
+        boxes, fake_refine.receipt_data = _receipt(items, date=date)
+        asyncio.run(ai_services.extract_receipt("ocr text", boxes))
+    assert len(llm_calls) == 2
+
+    result = asyncio.run(ai_services.extract_receipt("ocr text", _receipt(THIRD)[0]))
+    assert len(llm_calls) == 2
+    assert result["receipt_data"]["total_amount"]["value"] == 55_000
+    assert result["receipt_data"]["receipt_id"]
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.ocr_boxes import OCRBoxes
+from app.services.ocr_services import OCRResult, _parse_ocr_result
+
+
+def _rapidocr_output():
+    quads = np.array([
+        [[100, 52], [180, 50], [181, 70], [101, 72]],    # 2nd line, right
+        [[10, 10], [90, 10], [90, 30], [10, 30]],        # 1st line
+        [[10, 50], [60, 50], [60, 70], [10, 70]],        # 2nd line, left
+    ], dtype=np.float32)
+    return SimpleNamespace(boxes=quads, txts=("9,500", "INDOMARET", "AQUA"), scores=(0.8, 0.99, 0.9))
+
+
+def test_quads_become_sorted_axis_aligned_boxes():
+    boxes = _parse_ocr_result(_rapidocr_output())
+    assert boxes.texts == ["INDOMARET", "AQUA", "9,500"]
+    assert boxes.coords.tolist() == [[10, 10, 80, 20], [10, 50, 50, 20], [100, 50, 81, 22]]
+    assert boxes.confidences.tolist() == pytest.approx([0.99, 0.9, 0.8])
+
+
+def test_missing_detections_parse_to_empty_boxes():
+    assert len(_parse_ocr_result(None)) == 0
+    assert len(_parse_ocr_result(SimpleNamespace(boxes=None, txts=None, scores=None))) == 0
+
+
+def test_box_views_read_and_write_through_to_the_columns():
+    boxes = _parse_ocr_result(_rapidocr_output())
+    box = boxes[1]
+    assert (box.text, box.x, box.width) == ("AQUA", 10.0, 50.0)
+    box.y = 55
+    assert boxes.y[1] == 55
+    assert boxes[-1].text == "9,500"
+    with pytest.raises(IndexError):
+        boxes[3]
+
+
+def test_masks_slices_and_index_arrays_return_subsets():
+    boxes = _parse_ocr_result(_rapidocr_output())
+    confident = boxes[boxes.confidences >= 0.85]
+    assert confident.texts == ["INDOMARET", "AQUA"]
+    assert boxes[1:].texts == ["AQUA", "9,500"]
+    assert boxes[np.array([2, 0])].texts == ["9,500", "INDOMARET"]
+    assert OCRResult(boxes, "").has_field_candidate(0.95).texts == ["INDOMARET"]
+
+
+def test_scale_shift_and_concat():
+    boxes = OCRBoxes([[10, 20, 30, 40]], [0.5], ["A"])
+    boxes.scale(2).shift(dy=100)
+    assert boxes.coords.tolist() == [[20, 140, 60, 80]]
+    merged = OCRBoxes.concat([OCRBoxes.empty(), boxes, OCRBoxes([[0, 0, 1, 1]], [1.0], ["B"])])
+    assert merged.texts == ["A", "B"]
+    assert merged.sorted().texts == ["B", "A"]
+
+
+def test_round_trips_through_the_cache_format():
+    boxes = _parse_ocr_result(_rapidocr_output())
+    result = OCRResult(boxes, "INDOMARET\nAQUA 9,500", quality_issues=["blurry"])
+    restored = OCRResult.from_dict(result.to_dict())
+    assert restored.boxes.texts == boxes.texts
+    assert np.array_equal(restored.boxes.coords, boxes.coords)
+    assert restored.raw_text == result.raw_text
+    assert restored.quality_issues == ["blurry"]
+    # Entries cached before the columnar format still load
+    legacy = OCRBoxes.from_dict(boxes.to_records())
+    assert np.array_equal(legacy.coords, boxes.coords)
+    assert OCRBoxes.coerce(None).texts == []
+
+
+def test_length_mismatch_is_rejected():
+    with pytest.raises(ValueError):
+        OCRBoxes([[0, 0, 1, 1]], [1.0, 0.5], ["A"])
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import ocr_pool
+from app.services.core_sharding import CoreSharder
+from app.services.ocr_pool import OCRJobTimeout, OCRPoolBusy, OCRPoolUnavailable, OCRWorkerPool
+
+
+def _thread_name() -> str:
+    return threading.current_thread().name
+
+
+def _block(event: threading.Event) -> str:
+    event.wait(5)
+    return "released"
+
+
+def _fail() -> None:
+    raise ValueError("bad photo")
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_jobs_run_on_dedicated_workers():
+    async def main():
+        pool = OCRWorkerPool(size=2)
+        names = await asyncio.gather(*(pool.run(_thread_name) for _ in range(4)))
+        await pool.close()
+        return names
+
+    names = _run(main())
+    assert all(name.startswith("ocr-worker-") for name in names)
+
+
+def test_initializer_runs_once_per_worker():
+    calls = []
+
+    async def main():
+        pool = OCRWorkerPool(size=3, initializer=lambda: calls.append(_thread_name()))
+        await pool.start()
+        await pool.close()
+
+    _run(main())
+    assert len(set(calls)) == 3
+
+
+def test_full_queue_raises_busy():
+    async def main():
+        pool = OCRWorkerPool(size=1, queue_size=1)
+        release = threading.Event()
+        running = asyncio.create_task(pool.run(_block, release))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(pool.run(_thread_name))
+        await asyncio.sleep(0.05)
+        with pytest.raises(OCRPoolBusy):
+            await pool.run(_thread_name)
+        release.set()
+        assert await running == "released"
+        await queued
+        await pool.close()
+
+    _run(main())
+
+
+def test_job_exception_keeps_the_worker():
+    async def main():
+        pool = OCRWorkerPool(size=1)
+        with pytest.raises(ValueError):
+            await pool.run(_fail)
+        name = await pool.run(_thread_name)
+        await pool.close()
+        return name
+
+    assert _run(main()) == "ocr-worker-1_0"
+
+
+def test_worker_is_recycled_after_max_jobs():
+    async def main():
+        pool = OCRWorkerPool(size=1, max_jobs=2)
+        names = [await pool.run(_thread_name) for _ in range(3)]
+        await pool.close()
+        return names
+
+    first, second, third = _run(main())
+    assert first == second != third
+
+
+def test_thread_replacement_waits_for_the_runaway_job():
+    async def main():
+        sharder = CoreSharder(cores=list(range(4)), max_sessions=2)
+        pool = OCRWorkerPool(size=1, job_timeout=0.1, sharder=sharder, runaway_grace=5)
+        release = threading.Event()
+        with pytest.raises(OCRJobTimeout):
+            await pool.run(_block, release)
+        await asyncio.sleep(0.2)
+        # Runaway still holds its core slot — no replacement yet
+        assert pool.alive == 0
+        assert pool._slots == {0}
+        release.set()
+        name = await asyncio.wait_for(pool.run(_thread_name), 2)
+        await pool.close()
+        return name
+
+    assert _run(main()).startswith("ocr-worker-2")
+
+
+def test_thread_replacement_starts_after_the_grace_period():
+    async def main():
+        pool = OCRWorkerPool(size=1, job_timeout=0.1, runaway_grace=0.2)
+        release = threading.Event()
+        with pytest.raises(OCRJobTimeout):
+            await pool.run(_block, release)
+        name = await asyncio.wait_for(pool.run(_thread_name), 2)
+        release.set()
+        await pool.close()
+        return name
+
+    assert _run(main()).startswith("ocr-worker-2")
+
+
+def test_failed_respawns_fail_waiters_and_the_pool_recovers(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "OCR_RESPAWN_BACKOFF", 0.01)
+    healthy = {"value": True}
+
+    def init():
+        if not healthy["value"]:
+            raise RuntimeError("model load failed")
+
+    async def main():
+        pool = OCRWorkerPool(size=1, job_timeout=0.1, initializer=init)
+        await pool.start()
+        healthy["value"] = False
+        with pytest.raises(OCRJobTimeout):
+            await pool.run(time.sleep, 0.3)
+        with pytest.raises(OCRPoolUnavailable):
+            await asyncio.wait_for(pool.run(_thread_name), 5)
+        assert pool.alive == 0
+        with pytest.raises(OCRPoolUnavailable):
+            await pool.run(_thread_name)       # fails fast, starts another respawn
+        healthy["value"] = True
+        await asyncio.sleep(0.1)
+        name = await asyncio.wait_for(pool.run(_thread_name), 2)
+        await pool.close()
+        return name
+
+    assert _run(main()).startswith("ocr-worker-")
+
+
+def test_process_worker_timeout_really_stops_the_job():
+    async def main():
+        pool = OCRWorkerPool(mode="process", size=1, job_timeout=0.5)
+        await pool.start()
+        assert await pool.run(time.sleep, 0.01) is None
+        started = time.perf_counter()
+        with pytest.raises(OCRJobTimeout):
+            await pool.run(time.sleep, 30)
+        elapsed = time.perf_counter() - started
+        assert await asyncio.wait_for(pool.run(time.sleep, 0.01), 30) is None
+        assert pool.alive == 1
+        await pool.close()
+        return elapsed
+
+    assert _run(main()) < 2
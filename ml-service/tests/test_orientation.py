@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.orientation import detect_page_rotation, rotate_page
+
+
+class FakeEngine:
+    """Detection returns fixed quads; the angle classifier returns scripted labels."""
+
+    def __init__(self, sizes, labels, score=0.99):
+        self.quads = np.array(
+            [[[20, 20 + 60 * i], [20 + w, 20 + 60 * i], [20 + w, 20 + 60 * i + h], [20, 20 + 60 * i + h]]
+             for i, (w, h) in enumerate(sizes)],
+            dtype=np.float32,
+        )
+        self.labels = labels
+        self.score = score
+        self.crops = []
+        self.use_cls = True
+        self.text_cls = self._classify
+
+    def __call__(self, img, use_det=True, use_cls=True, use_rec=True):
+        self.use_cls = use_cls
+        return SimpleNamespace(boxes=self.quads)
+
+    def _classify(self, crops):
+        self.crops = crops
+        return SimpleNamespace(cls_res=[(self.labels[i % len(self.labels)], self.score) for i in range(len(crops))])
+
+
+PAGE = np.full((800, 600, 3), 255, dtype=np.uint8)
+WIDE = [(200, 30)] * 6
+
+
+def test_upright_and_upside_down_pages():
+    assert detect_page_rotation(PAGE, FakeEngine(WIDE, ["0"])) == 0
+    engine = FakeEngine(WIDE, ["180"])
+    assert detect_page_rotation(PAGE, engine) == 180
+    assert engine.use_cls is True                     # per-call flags restored
+    assert all(crop.shape[1] > crop.shape[0] for crop in engine.crops)
+
+
+def test_sideways_pages_are_turned_before_voting():
+    tall = [(20, 55)] * 6
+    engine = FakeEngine(tall, ["0"])
+    assert detect_page_rotation(PAGE, engine) == 90
+    assert all(crop.shape[1] > crop.shape[0] for crop in engine.crops)
+    assert detect_page_rotation(PAGE, FakeEngine(tall, ["180"])) == 270
+
+
+def test_undecided_pages_fall_back_to_per_box_classification():
+    assert detect_page_rotation(PAGE, FakeEngine(WIDE, ["0", "180"])) is None
+    assert detect_page_rotation(PAGE, FakeEngine(WIDE[:2], ["0"])) is None
+    assert detect_page_rotation(PAGE, FakeEngine(WIDE, ["0"], score=0.5)) is None
+
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+def test_rotate_page_maps_coordinates_back(rotation):
+    image = np.arange(5 * 7, dtype=np.uint8).reshape(5, 7)
+    rotated, back = rotate_page(image, rotation)
+    for y in range(rotated.shape[0]):
+        for x in range(rotated.shape[1]):
+            sx, sy = back @ np.array([x, y, 1.0])
+            assert rotated[y, x] == image[int(round(sy)), int(round(sx))]
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from app.services.ocr_boxes import OCRBoxes
+from app.services.photo_selection import estimated_text_height, larger_photo_size, select_photo_size
+
+
+def _size(width: int, height: int):
+    return SimpleNamespace(width=width, height=height)
+
+
+# Telegram renditions of a portrait receipt photo, in the order the API lists them
+PHOTOS = [_size(68, 90), _size(240, 320), _size(600, 800), _size(960, 1280), _size(1920, 2560)]
+
+
+def _boxes(height: float, confidence: float, n: int = 20) -> OCRBoxes:
+    return OCRBoxes([[10, 40 * i, 200, height] for i in range(n)], [confidence] * n, ["T"] * n)
+
+
+def test_the_smallest_sufficient_rendition_is_downloaded():
+    assert estimated_text_height(_size(960, 1280)) >= 18 > estimated_text_height(_size(600, 800))
+    assert select_photo_size(PHOTOS[::-1], min_text_height=18) is PHOTOS[3]
+    assert select_photo_size(PHOTOS, min_text_height=8) is PHOTOS[2]
+
+
+def test_the_largest_is_used_when_nothing_is_enough_or_by_policy():
+    assert select_photo_size(PHOTOS[:3], min_text_height=18) is PHOTOS[2]
+    assert select_photo_size(PHOTOS, policy="largest") is PHOTOS[4]
+
+
+def test_confident_ocr_never_retries():
+    assert larger_photo_size(PHOTOS, PHOTOS[3], _boxes(14, 0.95)) is None
+
+
+def test_retry_size_follows_the_measured_character_height():
+    # 25px boxes ≈ 18px characters: one step up is enough
+    assert larger_photo_size(PHOTOS, PHOTOS[2], _boxes(25, 0.6)) is PHOTOS[3]
+    # 14px boxes ≈ 10px characters: needs far more than 1280 → the largest
+    assert larger_photo_size(PHOTOS, PHOTOS[3], _boxes(14, 0.6)) is PHOTOS[4]
+
+
+def test_no_retry_when_characters_are_already_large_or_nothing_is_larger():
+    assert larger_photo_size(PHOTOS, PHOTOS[3], _boxes(40, 0.6)) is None
+    assert larger_photo_size(PHOTOS, PHOTOS[4], _boxes(14, 0.6)) is None
+
+
+def test_no_text_at_all_retries_at_the_largest():
+    assert larger_photo_size(PHOTOS, PHOTOS[2], OCRBoxes.empty()) is PHOTOS[4]
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from app.services import ocr_services
+from app.services.ocr_services import should_preprocess, threshold_preprocess_rule
+from app.services.preprocess_model import FEATURES, PreprocessModel, load_model
+from benchmarks.train_preprocess_model import accuracy, fit
+
+CLEAN = {"blur_score": 400.0, "brightness": 170.0, "contrast": 60.0, "receipt_ratio": 0.8}
+MURKY = {"blur_score": 40.0, "brightness": 70.0, "contrast": 20.0, "receipt_ratio": 0.8}
+
+
+def _blur_model(threshold: float = 0.5) -> PreprocessModel:
+    """Preprocess when the photo is blurry: one negative weight on log_blur."""
+    names = tuple(FEATURES)
+    weights = tuple(-3.0 if name == "log_blur" else 0.0 for name in names)
+    return PreprocessModel(names, weights, 0.0, (5.0,) * len(names), (1.0,) * len(names), threshold)
+
+
+def test_probability_follows_the_weights():
+    model = _blur_model()
+    assert model.probability(MURKY) > 0.9
+    assert model.probability(CLEAN) < 0.1
+    assert model.predict(MURKY) and not model.predict(CLEAN)
+    assert not _blur_model(threshold=0.99).predict({**MURKY, "blur_score": 100.0})
+
+
+def test_model_file_round_trips(tmp_path):
+    path = tmp_path / "model.json"
+    _blur_model().save(path)
+    assert load_model(path) == _blur_model()
+
+
+def test_missing_or_invalid_model_files_fall_back(tmp_path):
+    assert load_model(tmp_path / "missing.json") is None
+    bad = tmp_path / "bad.json"
+    bad.write_text('{"features": ["sharpness"], "weights": [1], "bias": 0, "mean": [0], "scale": [1]}')
+    assert load_model(bad) is None
+    bad.write_text("not json")
+    assert load_model(bad) is None
+
+
+def test_should_preprocess_uses_the_model_when_present(monkeypatch):
+    monkeypatch.setattr(ocr_services, "preprocess_model", None)
+    assert should_preprocess(None, CLEAN) is threshold_preprocess_rule(CLEAN) is False
+    assert should_preprocess(None, MURKY) is True
+
+    inverted = _blur_model()
+    inverted = PreprocessModel(inverted.features, tuple(-w for w in inverted.weights), 0.0, inverted.mean, inverted.scale)
+    monkeypatch.setattr(ocr_services, "preprocess_model", inverted)
+    assert should_preprocess(None, CLEAN) is True
+    assert should_preprocess(None, MURKY) is False
+
+
+def test_training_learns_a_separable_rule():
+    rng = random.Random(0)
+    qualities = [
+        {"blur_score": rng.uniform(10, 600), "brightness": rng.uniform(60, 220),
+         "contrast": rng.uniform(15, 80), "receipt_ratio": rng.uniform(0.3, 1.0)}
+        for _ in range(300)
+    ]
+    labels = [int(q["contrast"] < 40) for q in qualities]
+    model = fit(qualities, labels, l2=1e-3, epochs=2000)
+    assert model.trained_on == 300
+    assert accuracy(model.predict, qualities, labels) >= 0.95
+    assert model.predict({**CLEAN, "contrast": 20.0}) and not model.predict(CLEAN)
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from app.services import progress as progress_module
+from app.services.progress import ProgressMessage
+
+
+class FakeStatus:
+    def __init__(self, chat: "FakeChat", text: str):
+        self.chat = chat
+        self.text = text
+
+    async def edit_text(self, text: str):
+        await asyncio.sleep(self.chat.latency)
+        if self.chat.edit_errors:
+            raise self.chat.edit_errors.pop(0)
+        self.text = text
+        self.chat.log.append(("edit", text))
+
+
+class FakeChat:
+    """Stands in for the user's Message: reply_text posts, edit_text edits."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.log: list[tuple[str, str]] = []
+        self.reply_errors: list[Exception] = []
+        self.edit_errors: list[Exception] = []
+
+    async def reply_text(self, text: str):
+        await asyncio.sleep(self.latency)
+        if self.reply_errors:
+            raise self.reply_errors.pop(0)
+        self.log.append(("reply", text))
+        return FakeStatus(self, text)
+
+
+@pytest.fixture(autouse=True)
+def no_flood_pause(monkeypatch):
+    monkeypatch.setattr(progress_module, "_flood_until", 0.0)
+
+
+def test_updates_edit_one_status_message_and_finish_replaces_it():
+    async def run(chat):
+        progress = ProgressMessage(chat, min_interval=0.01)
+        progress.update("Processing...")
+        await asyncio.sleep(0.05)
+        progress.update("Performing OCR...")
+        await asyncio.sleep(0.05)
+        await progress.finish("Total 7,000")
+
+    chat = FakeChat()
+    asyncio.run(run(chat))
+    assert chat.log == [("reply", "Processing..."), ("edit", "Performing OCR..."), ("edit", "Total 7,000")]
+
+
+def test_updates_are_coalesced_within_the_interval():
+    async def run(chat):
+        progress = ProgressMessage(chat, min_interval=0.2)
+        progress.update("one")
+        await asyncio.sleep(0.01)
+        progress.update("two")
+        progress.update("three")
+        await asyncio.sleep(0.3)
+        await progress.finish("done")
+
+    chat = FakeChat()
+    asyncio.run(run(chat))
+    assert chat.log == [("reply", "one"), ("edit", "three"), ("edit", "done")]
+
+
+def test_finish_drops_throttled_updates_without_waiting():
+    async def run(chat):
+        progress = ProgressMessage(chat, min_interval=10)
+        progress.update("one")
+        await asyncio.sleep(0.01)
+        progress.update("two")
+        await asyncio.wait_for(progress.finish("done"), timeout=1)
+
+    chat = FakeChat()
+    asyncio.run(run(chat))
+    assert chat.log == [("reply", "one"), ("edit", "done")]
+
+
+def test_finish_waits_for_the_in_flight_status_message():
+    async def run(chat):
+        progress = ProgressMessage(chat)
+        progress.update("Processing...")
+        await asyncio.sleep(0.01)           # reply_text is now in flight
+        await progress.finish("done")
+
+    chat = FakeChat(latency=0.05)
+    asyncio.run(run(chat))
+    assert chat.log == [("reply", "Processing..."), ("edit", "done")]
+
+
+def test_retry_after_pauses_then_finish_delivers():
+    async def run(chat):
+        progress = ProgressMessage(chat, min_interval=0)
+        progress.update("Processing...")
+        await asyncio.sleep(0.01)
+        chat.edit_errors.append(RetryAfter(1))
+        progress.update("Performing OCR...")
+        await asyncio.sleep(0.01)
+        assert progress_module._flood_until > 0
+        await progress.finish("done")
+
+    chat = FakeChat()
+    asyncio.run(run(chat))
+    assert chat.log == [("reply", "Processing..."), ("edit", "done")]
+
+
+def test_refused_edit_falls_back_to_a_fresh_reply():
+    async def run(chat):
+        progress = ProgressMessage(chat)
+        progress.update("Processing...")
+        await asyncio.sleep(0.01)
+        chat.edit_errors += [BadRequest("Message to edit not found")] * 2
+        await progress.finish("done")
+
+    chat = FakeChat()
+    asyncio.run(run(chat))
+    assert chat.log == [("reply", "Processing..."), ("reply", "done")]
+
+
+def test_final_reply_is_retried_when_no_status_message_went_out():
+    chat = FakeChat()
+    chat.reply_errors += [NetworkError("timed out")] * 2
+    asyncio.run(ProgressMessage(chat).finish("done"))
+    assert chat.log == [("reply", "done")]
+
+
+def test_final_reply_failure_is_raised():
+    chat = FakeChat()
+    chat.reply_errors += [NetworkError("timed out")] * 3
+    with pytest.raises(NetworkError):
+        asyncio.run(ProgressMessage(chat).finish("done"))
+    assert chat.log == []
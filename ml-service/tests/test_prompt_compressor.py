@@ -0,0 +1,102 @@
+from app.services.ocr_boxes import OCRBoxes
+from app.services.prompt_compressor import compress_ocr_input, find_zone_boundaries, is_item_row
+
+COLUMNS = (10, 300, 380, 470)       # name, qty, price, total
+
+
+def _boxes(rows: list[tuple[str, ...]]) -> OCRBoxes:
+    records = []
+    for i, row in enumerate(rows):
+        for x, text in zip(COLUMNS, row):
+            records.append({"text": text, "confidence": 0.95, "x": x, "y": 20 + i * 30, "width": 60, "height": 20})
+    return OCRBoxes.from_records(records)
+
+
+ITEMS = [(f"SARANG BURUNG WALET {n}", "1", "12,500", "12,500") for n in range(16)]
+
+ALFAMART = [
+    ("ALFAMART",),
+    ("PT SUMBER ALFARIA TRIJAYA TBK",),
+    ("NPWP 01.336.238.9-054.000",),
+    ("JL. MH THAMRIN NO 9",),
+    *ITEMS,
+    ("Total Item 16", "", "", "200,000"),
+    ("Tunai", "", "", "200,000"),
+    ("Kembalian", "", "", "0"),
+    ("Tgl : 09/03/2026 10:57:16 V.2025.11.6",),
+    ("Kritik&Saran: 1500959",),
+    ("SMS/WA 0811 1500 959",),
+]
+
+INDOMARET = [
+    ("INDOMARET",),
+    ("PT INDOMARCO PRISMATAMA",),
+    ("NPWP 01.337.994.6-092.000",),
+    ("JL. MAWAR NO 3 RT 003",),
+    ("26.03.26-12:09/4.1.10/F0IH-72314/AMEL1/02",),
+    *ITEMS,
+    ("TOTAL BELANJA", "", "", "200,000"),
+    ("TUNAI", "", "", "200,000"),
+    ("KEMBALI", "", "", "0"),
+    ("LAYANAN KONSUMEN SMS 0815 8100 0000",),
+]
+
+
+def _section(rows, budget=3000):
+    boxes = _boxes(rows)
+    raw_text = "\n".join(" | ".join(row) for row in rows)
+    return compress_ocr_input(raw_text, boxes, budget)
+
+
+def test_item_row_detection():
+    assert is_item_row("MHSUKA HOT LAVA 130 | 1 | 9,500 | 9,500")
+    assert is_item_row("1PCSx | 24.000= | 24.000")
+    assert is_item_row("IDM KTG PLSTK 1W SDG | 1 | 200 | 200")
+    assert not is_item_row("TOTAL BELANJA | 52,700")
+    assert not is_item_row("JL. MAWAR NO 3 RT 003")
+    assert not is_item_row("SMS/WA 0811 1500 959")
+    assert not is_item_row("Tgl : 09/03/2026 10:57:16")
+
+
+def test_item_zone_starts_at_first_item_row_not_the_date():
+    # Alfamart prints the date under the totals
+    item_start, footer_start = find_zone_boundaries(_boxes(ALFAMART))
+    assert item_start == 20 + 4 * 30
+    assert footer_start == 20 + 20 * 30
+
+
+def test_date_at_bottom_keeps_every_item_and_the_date():
+    section, stats = _section(ALFAMART)
+    for name, *_ in ITEMS:
+        assert name in section
+    assert "Tgl : 09/03/2026" in section
+    assert "NPWP" not in section and "Kritik" not in section
+    assert stats.noise_dropped == 4
+
+
+def test_date_on_top_keeps_every_item_and_the_date():
+    section, _ = _section(INDOMARET)
+    for name, *_ in ITEMS:
+        assert name in section
+    assert "26.03.26-12:09" in section
+    assert "NPWP" not in section
+
+
+def test_budget_trimming_never_drops_item_rows():
+    items = [(f"ITEM NOMOR {n:03d}", "1", "1,000", "1,000") for n in range(110)]
+    rows = [
+        ("ALFAMART",), ("PT SUMBER ALFARIA TRIJAYA TBK",), ("ALFAMART CILANDAK KKO",),
+        ("KASIR: BUDI",), ("MEMBER: 12345",), ("STRUK: 7781",),
+        *items,
+        ("Total Item 110", "", "", "110,000"),
+        ("Tunai", "", "", "110,000"),
+        ("Tgl : 09/03/2026 10:57:16",),
+        ("TERIMA KASIH",), ("SELAMAT BELANJA KEMBALI",),
+    ]
+    section, stats = _section(rows, budget=800)
+    assert stats.over_budget
+    for name, *_ in items:
+        assert name in section
+    assert "Tgl : 09/03/2026" in section and "110,000" in section
+    assert "ALFAMART" in section
+    assert stats.header_dropped == 3
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _prompt_version() -> str:
+    env = {**os.environ, "LLM_CACHE_BACKEND": "off", "RECEIPT_CACHE_BACKEND": "off",
+           "MERCHANT_TEMPLATES": "false"}
+    env.pop("LLM_PROMPT_VERSION", None)
+    result = subprocess.run(
+        [sys.executable, "-c", "from app.services.ai_services import PROMPT_VERSION; print(PROMPT_VERSION)"],
+        cwd=SERVICE_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_prompt_version_is_stable_across_interpreters():
+    # The LLM cache is persistent; a per-process version would never hit after a restart
+    first, second = _prompt_version(), _prompt_version()
+    assert first == second
+    assert len(first) == 12
@@ -0,0 +1,91 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.cache import MemoryLRUCache, SQLiteCache
+from app.services.ocr_boxes import OCRBoxes
+from app.services.ocr_services import OCRResult
+from app.services.receipt_cache import ReceiptCache, fingerprint_image, with_fresh_receipt_id
+
+
+def _photo(seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    img = np.full((640, 360, 3), 235, np.uint8)
+    for _ in range(25):
+        y, x, w = int(rng.integers(20, 600)), int(rng.integers(10, 200)), int(rng.integers(40, 150))
+        cv2.rectangle(img, (x, y), (x + w, y + 8), (20, 20, 20), -1)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+OCR = OCRResult(
+    boxes=OCRBoxes.from_records([{"text": "INDOMARET", "confidence": 0.98, "x": 10, "y": 10, "width": 90, "height": 18}]),
+    raw_text="INDOMARET",
+)
+
+
+def _refined(status: str) -> dict:
+    return {"status": status, "receipt_data": {"receipt_id": "r1", "merchant_name": {"value": "INDOMARET"}}}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return ReceiptCache(MemoryLRUCache())
+    return ReceiptCache(SQLiteCache(str(tmp_path / "cache.sqlite3"), table="receipt_cache"))
+
+
+def test_fingerprint_is_stable_and_tells_receipts_apart():
+    a, again, b = fingerprint_image(_photo(1)), fingerprint_image(_photo(1)), fingerprint_image(_photo(2))
+    assert a.hash == again.hash
+    assert a.hash != b.hash
+    assert len(a.hash) == 64      # 256-bit dHash
+
+
+def test_lookup_by_file_unique_id_and_by_hash(cache):
+    fingerprint = fingerprint_image(_photo(1))
+    digest = asyncio.run(cache.store(fingerprint, OCR, file_unique_id="uid-1"))
+    by_uid = asyncio.run(cache.lookup(file_unique_id="uid-1"))
+    by_hash = asyncio.run(cache.lookup(fingerprint=fingerprint_image(_photo(1))))
+    assert by_uid.hash == by_hash.hash == digest
+    assert by_hash.ocr_result.raw_text == "INDOMARET"
+    assert asyncio.run(cache.lookup(file_unique_id="uid-2", fingerprint=fingerprint_image(_photo(2)))) is None
+
+
+def test_hash_collision_with_different_thumbnail_is_rejected(cache):
+    fingerprint = fingerprint_image(_photo(1))
+    asyncio.run(cache.store(fingerprint, OCR))
+    other = fingerprint_image(_photo(2))
+    other.hash = fingerprint.hash
+    assert asyncio.run(cache.lookup(fingerprint=other)) is None
+
+
+def test_only_verified_refinements_are_attached(cache):
+    fingerprint = fingerprint_image(_photo(1))
+    digest = asyncio.run(cache.store(fingerprint, OCR))
+
+    asyncio.run(cache.attach_refined(digest, _refined("ACTION_REQUIRED")))
+    assert asyncio.run(cache.lookup(fingerprint=fingerprint)).refined is None
+
+    asyncio.run(cache.attach_refined(digest, _refined("VERIFIED")))
+    assert asyncio.run(cache.lookup(fingerprint=fingerprint)).refined["status"] == "VERIFIED"
+
+
+def test_unverified_refinement_passed_to_store_is_dropped(cache):
+    fingerprint = fingerprint_image(_photo(1))
+    asyncio.run(cache.store(fingerprint, OCR, refined=_refined("ACTION_REQUIRED")))
+    assert asyncio.run(cache.lookup(fingerprint=fingerprint)).refined is None
+
+
+def test_disabled_cache():
+    cache = ReceiptCache(None)
+    assert asyncio.run(cache.store(fingerprint_image(_photo(1)), OCR)) is None
+    assert asyncio.run(cache.lookup(file_unique_id="uid-1")) is None
+
+
+def test_fresh_receipt_id_leaves_the_cached_copy_alone():
+    refined = _refined("VERIFIED")
+    fresh = with_fresh_receipt_id(refined)
+    assert fresh["receipt_data"]["receipt_id"] != "r1"
+    assert refined["receipt_data"]["receipt_id"] == "r1"
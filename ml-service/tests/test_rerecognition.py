@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.ocr_boxes import OCRBoxes
+from app.services.rerecognition import rerecognize_low_confidence
+
+# Working image is the source at half scale
+TO_SOURCE = np.array([[2.0, 0.0, 0.0], [0.0, 2.0, 0.0]])
+
+
+class FakeRec:
+    """Rec-only engine: answers each crop with the next scripted reading."""
+
+    def __init__(self, readings):
+        self.readings = list(readings)
+        self.calls = []
+        self.use_cls = True
+
+    def __call__(self, img, use_det=True, use_cls=True, use_rec=True):
+        self.calls.append({"shape": img.shape, "mean": float(img.mean()), "use_det": use_det, "use_cls": use_cls})
+        self.use_cls = use_cls
+        text, score = self.readings.pop(0) if self.readings else ("", 0.0)
+        return SimpleNamespace(txts=(text,) if text else (), scores=(score,) if text else ())
+
+
+def _source() -> np.ndarray:
+    source = np.zeros((400, 600, 3), dtype=np.uint8)
+    source[100:140, 200:300] = 255          # the low-confidence box, in source pixels
+    return source
+
+
+def _boxes() -> OCRBoxes:
+    return OCRBoxes(
+        [[100, 50, 50, 20], [10, 10, 60, 20], [10, 100, 40, 20]],
+        [0.55, 0.99, 0.70],
+        ["9,5O0", "INDOMARET", "AQUA"],
+    )
+
+
+def test_low_confidence_boxes_are_reread_from_the_source_crop():
+    boxes = _boxes()
+    engine = FakeRec([("9,500", 0.97), ("9,500", 0.93), ("AQUA", 0.72), ("AQUA", 0.71)])
+    improved = rerecognize_low_confidence(boxes, _source(), TO_SOURCE, engine, threshold=0.9)
+
+    assert improved == 1
+    assert boxes.texts == ["9,500", "INDOMARET", "AQUA"]
+    assert boxes.confidences.tolist() == [0.97, 0.99, 0.70]     # AQUA gained < OCR_REREC_MIN_GAIN
+    assert boxes.coords[0].tolist() == [100, 50, 50, 20]
+    assert len(engine.calls) == 4                             # two variants × two low boxes, lowest first
+    first = engine.calls[0]
+    assert first["use_det"] is False and first["use_cls"] is False
+    assert first["shape"][0] >= 48                            # upscaled to rec height
+    assert first["mean"] > 127                                # cropped where the box maps in the source
+    assert engine.use_cls is True                             # engine flags restored
+
+
+def test_implausible_readings_are_ignored():
+    boxes = _boxes()
+    engine = FakeRec([("9,500 AQUA 600ML 2 3,500 7,000", 0.99), ("", 0.0)])
+    assert rerecognize_low_confidence(boxes, _source(), TO_SOURCE, engine, threshold=0.6) == 0
+    assert boxes.texts[0] == "9,5O0"
+
+
+def test_max_boxes_and_undecided_orientation():
+    boxes = _boxes()
+    engine = FakeRec([])
+    rerecognize_low_confidence(boxes, _source(), TO_SOURCE, engine, threshold=0.9, max_boxes=1, page_rotation=None)
+    assert len(engine.calls) == 2
+    assert all(call["use_cls"] for call in engine.calls)
+
+
+def test_nothing_to_do_without_a_source_frame():
+    engine = FakeRec([])
+    assert rerecognize_low_confidence(_boxes(), None, TO_SOURCE, engine) == 0
+    assert engine.calls == []
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.resolution import estimate_text_height, normalize_resolution
+
+
+def _page(font_scale: float, width: int = 2000, height: int = 2400, thickness: int = 3) -> np.ndarray:
+    gray = np.full((height, width), 235, dtype=np.uint8)
+    step = int(font_scale * 40)
+    for y in range(step, height - 10, step):
+        cv2.putText(gray, "MHSUKA HOT LAVA 130 1 9500", (20, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, thickness)
+    return gray
+
+
+def test_text_height_tracks_the_font_size():
+    small, large = estimate_text_height(_page(1)), estimate_text_height(_page(3))
+    assert small == pytest.approx(22, rel=0.25)
+    assert large == pytest.approx(3 * small, rel=0.15)
+
+
+def test_large_text_is_downscaled_to_the_target_height():
+    gray = _page(3)
+    normalized = normalize_resolution(gray, target_text_height=32, min_width=640)
+    assert normalized.scale < 0.6
+    assert normalized.image.shape[1] == round(gray.shape[1] * normalized.scale)
+    assert estimate_text_height(normalized.image) == pytest.approx(32, rel=0.2)
+    assert normalized.to_original(100 * normalized.scale) == pytest.approx(100)
+
+
+def test_never_narrower_than_the_minimum_width():
+    normalized = normalize_resolution(_page(3), target_text_height=8, min_width=1500)
+    assert normalized.scale == pytest.approx(0.75)
+    assert normalized.image.shape[1] == 1500
+
+
+def test_small_text_is_never_upscaled():
+    gray = _page(0.6, width=800, height=1000, thickness=1)
+    normalized = normalize_resolution(gray, target_text_height=32)
+    assert normalized.scale == 1.0
+    assert normalized.image is gray
+
+
+def test_unknown_text_height_or_disabled_leaves_the_image_alone():
+    blank = np.full((1200, 900), 235, dtype=np.uint8)
+    assert estimate_text_height(blank) is None
+    assert normalize_resolution(blank).image is blank
+
+    gray = _page(3)
+    disabled = normalize_resolution(gray, target_text_height=0)
+    assert disabled.image is gray
+    assert disabled.text_height is None
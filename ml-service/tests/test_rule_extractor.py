@@ -0,0 +1,151 @@
+from app.services.rule_extractor import parse_amount, parse_minimarket
+
+HEADER = "INDOMARET\nJL. MAWAR NO 3\n26.03.26-12:09/4.1.10/F0IH-72314/AMEL1/02\n"
+FOOTER = "TOTAL BELANJA : {total}\nTUNAI : 50,000\nKEMBALI : {change}\n"
+
+ALFAMART_HEADER = "ALFAMART\nPT SUMBER ALFARIA TRIJAYA TBK\nALFAMART CILANDAK KKO\n"
+ALFAMART_FOOTER = "Total Item {count} : {total}\nTunai : 50,000\nKembalian : {change}\nTgl : 09/03/2026 10:57:16 V.2025.11.6\n"
+
+
+def _receipt(item_lines: str, total: int) -> str:
+    return HEADER + item_lines + FOOTER.format(total=f"{total:,}", change=f"{50_000 - total:,}")
+
+
+def _alfamart(item_lines: str, total: int, count: int = 2) -> str:
+    return ALFAMART_HEADER + item_lines + ALFAMART_FOOTER.format(
+        count=count, total=f"{total:,}", change=f"{50_000 - total:,}"
+    )
+
+
+def _items(receipt_data: dict) -> list[tuple]:
+    return [
+        (item["name"]["value"], item["qty"]["value"], item["price"]["value"], item["total_price"]["value"])
+        for item in receipt_data["items"]
+    ]
+
+
+def test_parse_amount():
+    assert parse_amount("9,500") == 9500
+    assert parse_amount("24.000=") == 24000
+    assert parse_amount("(4,700)") == -4700
+    assert parse_amount("-5,000") == -5000
+    assert parse_amount("9,50") is None
+
+
+def test_date_above_items():
+    text = _receipt("MHSUKA HOT LAVA 130 1 9,500 9,500\nAQUA 600ML 2 3,500 7,000\n", total=16_500)
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    assert receipt_data["merchant_name"]["value"] == "INDOMARET"
+    assert receipt_data["date"]["value"] == "2026-03-26"
+    assert receipt_data["time"]["value"] == "12:09"
+    assert _items(receipt_data) == [("MHSUKA HOT LAVA 130", 1, 9500, 9500), ("AQUA 600ML", 2, 3500, 7000)]
+
+
+def test_date_under_the_totals():
+    text = _alfamart("SARANG BURUNG WALET 1 12,500 12,500\nAQUA 600ML 2 3,500 7,000\n", total=19_500)
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    assert receipt_data["merchant_name"]["value"] == "ALFAMART"
+    assert receipt_data["date"]["value"] == "2026-03-09"
+    assert receipt_data["time"]["value"] == "10:57"
+    assert _items(receipt_data) == [("SARANG BURUNG WALET", 1, 12500, 12500), ("AQUA 600ML", 2, 3500, 7000)]
+    assert receipt_data["total_amount"]["value"] == 19_500
+
+
+def test_no_date_anywhere_is_rejected():
+    text = "INDOMARET\nMHSUKA HOT LAVA 130 1 9,500 9,500\nTOTAL BELANJA : 9,500\n"
+    assert parse_minimarket(text) == (None, "no_date_line")
+
+
+def test_pcs_qty_column():
+    text = _receipt("RINSO ANTINODA ROSE FRESH 700\n1PCSx 24.000= 24.000\n", total=24_000)
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    assert _items(receipt_data) == [("RINSO ANTINODA ROSE FRESH 700", 1, 24000, 24000)]
+
+
+def test_voucher_and_discount_apply_to_the_item_above():
+    text = _receipt(
+        "MHSUKA HOT LAVA 130 1 9,500 9,500\n"
+        "VOUCHER : (4,700)\n"
+        "AQUA 600ML 2 3,500 7,000\n"
+        "DISKON (1,000)\n",
+        total=10_800,
+    )
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    lava, aqua = receipt_data["items"]
+    assert lava["voucher_amount"]["value"] == 4700
+    assert lava["total_price"]["value"] == 4800
+    assert aqua["discount_type"]["value"] == "nominal"
+    assert aqua["discount_value"]["value"] == 1000
+    assert aqua["total_price"]["value"] == 6000
+
+
+def test_discount_above_the_first_item_is_not_applied():
+    text = HEADER + "DISKON (500)\nMHSUKA HOT LAVA 130 1 9,500 9,500\n" + FOOTER.format(total="9,000", change="41,000")
+    receipt_data, _ = parse_minimarket(text)
+    assert receipt_data is None
+
+
+def test_void_cancels_the_earlier_item():
+    text = _receipt(
+        "RINSO ANTINODA 1 5,000 5,000\n"
+        "MHSUKA HOT LAVA 130 1 9,500 9,500\n"
+        "RINSO ANTINODA -1 5,000 -5,000\n",
+        total=9_500,
+    )
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    assert _items(receipt_data) == [("MHSUKA HOT LAVA 130", 1, 9500, 9500)]
+
+
+def test_partial_void_reduces_the_quantity():
+    text = _receipt("AQUA 600ML 3 3,500 10,500\nAQUA 600ML -1 3,500 -3,500\n", total=7_000)
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    assert _items(receipt_data) == [("AQUA 600ML", 2, 3500, 7000)]
+
+
+def test_item_arithmetic_mismatch_is_rejected():
+    text = _receipt("AQUA 600ML 2 3,500 7,500\n", total=7_500)
+    assert parse_minimarket(text) == (None, "item_arithmetic")
+
+
+def test_total_mismatch_is_rejected():
+    text = _receipt("AQUA 600ML 2 3,500 7,000\n", total=8_000)
+    receipt_data, reason = parse_minimarket(text)
+    assert receipt_data is None
+    assert reason in {"cross_check", "sum_mismatch"}
+
+
+def test_not_a_minimarket():
+    assert parse_minimarket("WARUNG BU TINI\nNASI 1 10,000 10,000\nTOTAL 10,000\n") == (None, "not_minimarket")
+
+
+def test_wrapped_name_with_number_joins_the_amount_line():
+    text = _receipt(
+        "RINSO ANTI NODA 700\n"
+        "1 24,000 24,000\n"
+        "AQUA 600ML\n"
+        "2 3,500 7,000\n",
+        total=31_000,
+    )
+    receipt_data, reason = parse_minimarket(text)
+    assert reason == "ok"
+    names = [item["name"]["value"] for item in receipt_data["items"]]
+    assert names == ["RINSO ANTI NODA 700", "AQUA 600ML"]
+    assert receipt_data["total_amount"]["value"] == 31_000
+
+
+def test_name_with_number_not_followed_by_amounts_is_rejected():
+    text = _receipt(
+        "MHSUKA HOT LAVA 130 1 9,500 9,500\nAQUA 600ML\nKOPI KAPAL API 1 2,000 2,000\n", total=11_500
+    )
+    assert parse_minimarket(text) == (None, "unparsed_amount_line")
+
+
+def test_unparsed_amount_columns_are_rejected():
+    text = _receipt("MHSUKA HOT LAVA 130 1 9,500 9,500\nKOPI 9,500 x\n", total=9_500)
+    assert parse_minimarket(text) == (None, "unparsed_amount_line")
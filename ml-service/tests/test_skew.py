@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.ocr_services import deskew_with_matrix
+from app.services.skew import estimate_skew_angle
+
+CENTER = (500, 800)
+
+
+def _page() -> np.ndarray:
+    gray = np.full((1600, 1000), 235, dtype=np.uint8)
+    for y in range(60, 1560, 45):
+        cv2.putText(gray, "MHSUKA HOT LAVA 130  1  9,500", (40, y), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return gray
+
+
+def _tilt(gray: np.ndarray, degrees: float) -> np.ndarray:
+    M = cv2.getRotationMatrix2D(CENTER, degrees, 1.0)
+    return cv2.warpAffine(gray, M, (gray.shape[1], gray.shape[0]), borderValue=235)
+
+
+@pytest.mark.parametrize("tilt", [-7.0, -2.0, 3.0, 10.0])
+def test_estimate_undoes_the_tilt(tilt):
+    assert estimate_skew_angle(_tilt(_page(), tilt)) == pytest.approx(-tilt, abs=0.3)
+
+
+def test_level_and_blank_pages_are_not_rotated():
+    level = _page()
+    assert estimate_skew_angle(level) == pytest.approx(0.0, abs=0.3)
+    image, matrix = deskew_with_matrix(level)
+    assert image is level and matrix is None
+    assert estimate_skew_angle(np.full((500, 400), 235, dtype=np.uint8)) == 0.0
+
+
+def test_deskew_levels_the_lines_with_one_rotation():
+    tilted = _tilt(_page(), 5.0)
+    levelled, matrix = deskew_with_matrix(tilted)
+    assert matrix is not None
+    assert levelled.shape == tilted.shape
+    assert estimate_skew_angle(levelled) == pytest.approx(0.0, abs=0.3)
+
+
+def test_angles_beyond_the_search_range_are_clamped():
+    assert abs(estimate_skew_angle(_tilt(_page(), 10.0), max_angle=4)) <= 5.0
@@ -0,0 +1,67 @@
+import numpy as np
+
+from app.services.ocr_boxes import OCRBoxes
+from app.services.tiling import merge_tile_boxes, needs_tiling, plan_tiles
+
+
+def _boxes(rows) -> OCRBoxes:
+    """rows: (text, x, y, width, height, confidence)"""
+    return OCRBoxes(
+        np.array([[x, y, w, h] for _, x, y, w, h, _ in rows], dtype=np.float64).reshape(-1, 4),
+        np.array([c for *_, c in rows], dtype=np.float64),
+        [t for t, *_ in rows],
+    )
+
+
+def test_only_tall_receipts_are_tiled():
+    assert needs_tiling(3000, 1000)
+    assert not needs_tiling(2000, 1000)
+    assert not needs_tiling(100, 0)
+
+
+def test_tiles_cover_the_image_with_the_configured_overlap():
+    tiles = plan_tiles(5000, 800, height_ratio=1.5, overlap=96, max_tiles=8)
+    assert tiles[0][0] == 0
+    assert tiles[-1][1] == 5000
+    assert len(tiles) > 1
+    for (top, bottom), (next_top, _) in zip(tiles, tiles[1:]):
+        assert bottom - next_top == 96
+        assert bottom - top <= 1200
+
+
+def test_tile_count_is_capped_by_growing_the_strips():
+    tiles = plan_tiles(20_000, 500, height_ratio=1.5, overlap=96, max_tiles=4)
+    assert len(tiles) == 4
+    assert tiles[-1][1] == 20_000
+    assert all(bottom - next_top >= 96 for (_, bottom), (next_top, _) in zip(tiles, tiles[1:]))
+
+
+def test_a_short_image_is_a_single_tile():
+    assert plan_tiles(300, 800, overlap=96) == [(0, 300)]
+
+
+def test_seam_lines_are_kept_once_from_the_strip_that_saw_them_whole():
+    # Strips (0, 1000) and (904, 2000), overlap 96 → seam band ownership split at 952
+    upper = _boxes([
+        ("AQUA 600ML", 10, 500, 200, 30, 0.95),
+        ("KOPI", 10, 930, 80, 30, 0.90),          # in the overlap, seen whole by both
+        ("ROTI", 10, 985, 80, 15, 0.40),          # cut by the upper strip's bottom edge
+    ])
+    lower = _boxes([
+        ("KOPI", 11, 931, 80, 30, 0.92),
+        ("ROTI", 10, 985, 80, 30, 0.97),
+        ("TOTAL", 10, 1500, 120, 30, 0.99),
+    ])
+    merged = merge_tile_boxes([((0, 1000), upper), ((904, 2000), lower)], overlap=96)
+    assert merged.texts == ["AQUA 600ML", "KOPI", "ROTI", "TOTAL"]
+    roti = merged[2]
+    assert roti.height == 30
+    assert roti.confidence == 0.97
+
+
+def test_near_duplicates_keep_the_more_confident_box():
+    # No overlap band, so both strips claim their copy of the line
+    first = _boxes([("KOPI", 10, 950, 80, 30, 0.60)])
+    second = _boxes([("K0PI", 12, 951, 80, 30, 0.90)])
+    merged = merge_tile_boxes([((0, 1000), first), ((904, 2000), second)], overlap=0)
+    assert merged.texts == ["K0PI"]
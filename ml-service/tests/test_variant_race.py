@@ -0,0 +1,109 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ocr_services, variant_race
+from app.services.ocr_boxes import OCRBoxes
+from app.services.ocr_services import OCRResult, _race_variants
+from app.services.variant_race import VariantScore, is_decisive, pick_winner, record_outcome, score_variant
+
+
+def _result(confidences: list[float]) -> OCRResult:
+    n = len(confidences)
+    boxes = OCRBoxes([[0, 20 * i, 50, 18] for i in range(n)], confidences, [f"T{i}" for i in range(n)])
+    return OCRResult(boxes, "", quality={"blur_score": 150.0, "brightness": 180.0, "contrast": 50.0})
+
+
+def test_score_counts_only_confident_boxes():
+    score = score_variant(_result([0.9, 0.8, 0.2]).boxes)
+    assert score.boxes == 2
+    assert score.mean_confidence == pytest.approx(0.85)
+    assert score.score == pytest.approx(1.7)
+    assert not is_decisive(score)
+    assert is_decisive(score_variant(_result([0.97] * 12).boxes))
+
+
+def test_ties_go_to_the_preprocessed_path():
+    same = VariantScore(5, 0.9, 4.5)
+    assert pick_winner({"raw": same, "preprocessed": same}) == "preprocessed"
+    assert pick_winner({"raw": VariantScore(6, 0.9, 5.4), "preprocessed": same}) == "raw"
+
+
+def test_outcomes_are_appended_as_jsonl(tmp_path, monkeypatch):
+    log = tmp_path / "logs" / "race.jsonl"
+    monkeypatch.setattr(variant_race, "OCR_RACE_LOG", str(log))
+    scores = {"raw": VariantScore(5, 0.9, 4.5)}
+    record_outcome("<10 bytes>", {"blur_score": 1.0}, "raw", "raw", scores, early=True)
+    record_outcome("<10 bytes>", None, None, "raw", scores, early=False)
+    entries = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [e["early"] for e in entries] == [True, False]
+    assert entries[0]["scores"]["raw"]["score"] == 4.5
+
+
+@pytest.fixture
+def race(monkeypatch):
+    """Scripted variants: name → (delay, result or exception)."""
+    script = {}
+    finished = []
+
+    async def fake_variant(pool, image, source_label, preprocess=None, stop=None, use_cls=None):
+        name = "preprocessed" if preprocess else "raw"
+        delay, outcome = script[name]
+        await asyncio.sleep(delay)
+        finished.append(name)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(ocr_services, "_ocr_variant", fake_variant)
+    monkeypatch.setattr(ocr_services, "record_outcome", lambda *args: None)
+    return script, finished
+
+
+def _run(pool_mode="process"):
+    pool = SimpleNamespace(mode=pool_mode)
+    return asyncio.run(_race_variants(pool, b"jpeg", "<4 bytes>"))
+
+
+def test_a_decisive_first_finisher_wins_without_waiting(race):
+    script, finished = race
+    decisive = _result([0.97] * 12)
+    script.update(raw=(0.0, decisive), preprocessed=(5.0, _result([0.99] * 30)))
+    assert _run() is decisive
+    assert finished == ["raw"]
+
+
+def test_an_indecisive_first_finisher_waits_for_the_better_variant(race):
+    script, finished = race
+    better = _result([0.9] * 8)
+    script.update(raw=(0.0, _result([0.6] * 3)), preprocessed=(0.05, better))
+    assert _run() is better
+    assert finished == ["raw", "preprocessed"]
+
+
+def test_a_failed_variant_leaves_the_other(race):
+    script, _ = race
+    survivor = _result([0.6] * 3)
+    script.update(raw=(0.0, RuntimeError("worker died")), preprocessed=(0.01, survivor))
+    assert _run() is survivor
+
+    script.update(raw=(0.0, RuntimeError("a")), preprocessed=(0.01, RuntimeError("b")))
+    with pytest.raises(RuntimeError, match="a"):
+        _run()
+
+
+def test_a_thread_mode_loser_is_left_to_finish(race):
+    script, finished = race
+    decisive = _result([0.97] * 12)
+    script.update(raw=(0.0, decisive), preprocessed=(0.05, _result([0.5] * 3)))
+
+    async def run():
+        result = await _race_variants(SimpleNamespace(mode="thread"), b"jpeg", "<4 bytes>")
+        assert finished == ["raw"]
+        await asyncio.sleep(0.1)
+        return result
+
+    assert asyncio.run(run()) is decisive
+    assert finished == ["raw", "preprocessed"]